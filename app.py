@@ -1,4 +1,5 @@
-from flask import Flask, render_template, jsonify
+import os
+from flask import Flask, jsonify
 from blueprints.basic_pattern import basic_pattern_bp
 from blueprints.circular_pattern import circular_pattern_bp
 from blueprints.vine_pattern import vine_pattern_bp
@@ -6,10 +7,46 @@ from blueprints.tessellation_pattern import tessellation_pattern_bp
 from blueprints.geometric_pattern import geometric_pattern_bp
 from blueprints.three_d_pattern import three_d_pattern_bp
 from blueprints.physics_pattern import physics_pattern_bp
+from blueprints.composite_pattern import composite_pattern_bp
 # ... future imports for other pattern blueprints ...
 
+from blueprints.core import assets, pattern_store, pipeline, profiling, raster, scheduler, sharding
+from blueprints.core.assets import assets_bp, render_page
+from blueprints.patterns import pattern_edits, vine_session
+
 app = Flask(__name__)
 
+# Defaults; any of these can be overridden with FLASK_<NAME> environment variables
+app.config.update(
+    PATTERN_STORE_PATH=os.path.join(app.root_path, 'data', 'pattern_store.bin'),
+    VINE_SESSION_DIR=None,  # shared directory for vine sessions; in-memory when unset
+    VINE_CHECKPOINT_INTERVAL=32,
+    VINE_MAX_CHECKPOINTS=64,  # per session; beyond this the checkpoints are thinned out
+    VINE_MAX_STEPS=100000,  # highest ?step= /vine/grow replays to
+    VINE_COMPLETED_TTL=3600,  # seconds a fully grown vine stays available to /vine/view
+    EDIT_SESSION_TTL=1800,  # seconds a circular/geometric edit session is kept after its last edit
+    NODE_ID='local',  # prefix of the vine IDs this node issues; nginx routes on it
+    NODE_DRAIN_FILE=None,  # while this file exists the node hands vine traffic to other nodes
+    ASSET_DIST_DIR=os.path.join(app.root_path, 'static', 'dist'),
+    ASSET_TEMPLATE_DIR=os.path.join(app.root_path, 'build', 'templates'),
+    PAGE_CACHE_MAX_AGE=300,
+    # Per-client token bucket in estimated-cost units (a default /circular/generate costs 1)
+    SCHEDULER_ENABLED=True,
+    SCHEDULER_RATE=20.0,
+    SCHEDULER_BURST=60.0,
+    SCHEDULER_LANES=scheduler.DEFAULT_LANES,
+    # Requests with an X-Profile: <token> header are profiled (see blueprints/core/profiling.py)
+    PROFILING_ENABLED=False,
+    PROFILING_TOKEN=None,
+    PROFILING_MODE='sampling',  # or 'cprofile'; X-Profile-Mode overrides per request
+    PROFILING_SAMPLE_INTERVAL=0.001,
+    PROFILING_DIR=os.path.join(app.root_path, 'data', 'profiles'),
+    PIPELINE_CACHE_SIZE=256,  # memoized composite stage outputs per worker
+    THUMBNAIL_CACHE_SIZE=512,  # rendered /thumb.png previews per worker
+    THUMBNAIL_MAX_AGE=86400,  # browser cache lifetime of seeded thumbnails, in seconds
+)
+app.config.from_prefixed_env()
+
 # Register blueprints
 app.register_blueprint(basic_pattern_bp, url_prefix='/basic')
 app.register_blueprint(circular_pattern_bp, url_prefix='/circular')
@@ -18,15 +55,39 @@ app.register_blueprint(tessellation_pattern_bp, url_prefix='/tessellation')
 app.register_blueprint(geometric_pattern_bp, url_prefix='/geometric')
 app.register_blueprint(three_d_pattern_bp, url_prefix='/three_d')
 app.register_blueprint(physics_pattern_bp, url_prefix='/physics')
+app.register_blueprint(composite_pattern_bp, url_prefix='/composite')
+app.register_blueprint(assets_bp, url_prefix='/assets')
 # ... register other pattern blueprints as needed ...
 
+# Map the precomputed pattern store and built assets (if present), set up vine session
+# and edit session storage and install the request scheduler
+pattern_store.init_app(app)
+vine_session.init_app(app)
+assets.init_app(app)
+sharding.init_app(app)
+scheduler.init_app(app)
+profiling.init_app(app)
+pipeline.init_app(app)
+pattern_edits.init_app(app)
+raster.init_app(app)
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_page('index.html')
 
 @app.route('/health')
 def health_check():
-    return jsonify({'status': 'healthy'}), 200
+    return jsonify({'status': 'healthy', 'node': app.config['NODE_ID'], 'draining': sharding.is_draining()}), 200
+
+@app.route('/metrics')
+def metrics():
+    # Queue depths, rejection counts and stage and thumbnail cache hits for the worker that answers
+    return jsonify({
+        'pid': os.getpid(),
+        'scheduler': app.extensions['scheduler'].stats(),
+        'pipeline_cache': app.extensions['pipeline_cache'].stats(),
+        'thumbnail_cache': app.extensions['thumbnail_cache'].stats()
+    })
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,14 +1,18 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, request
 from pattern_generator import generate_pattern
+from blueprints.core.json_stream import stream_json
+from blueprints.core.assets import render_page
+from blueprints.core.scheduler import scheduled
 
 basic_pattern_bp = Blueprint('basic_pattern', __name__)
 
 @basic_pattern_bp.route('/')
 def basic_pattern_index():
-    return render_template('basic_pattern/index.html')
+    return render_page('basic_pattern/index.html')
 
 @basic_pattern_bp.route('/generate')
+@scheduled('bulk')
 def get_pattern():
     shuffle = request.args.get('shuffle', False)
     pattern_data = generate_pattern(shuffle=shuffle)
-    return jsonify(pattern_data) 
\ No newline at end of file
+    return stream_json(pattern_data) 
\ No newline at end of file
@@ -1,7 +1,13 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 import math
 import random
 import colorsys
+import json
+from blueprints.core import animation, compact_encoding, pattern_store, raster, sharding
+from blueprints.core.json_stream import stream_json
+from blueprints.core.assets import render_page
+from blueprints.core.scheduler import scheduled
+from blueprints.patterns import pattern_edits
 
 circular_pattern_bp = Blueprint('circular_pattern', __name__)
 
@@ -42,21 +48,40 @@ def generate_circular_pattern(
     symmetry=1,
     color_palette=None,
     base_hue=0.5,
-    palette_type="complementary"
+    palette_type="complementary",
+    seed=None
 ):
+    # Seeding the generator makes the output reproducible
+    rng = random.Random(seed)
+
     if color_palette is None:
         color_palette = generate_color_palette(base_hue, palette_type)
     
     pattern = {
         'circles': [],
         'connections': [],
-        'rotationSpeed': random.uniform(0.1, 0.5)
+        'rotationSpeed': rng.uniform(0.1, 0.5)
     }
     
-    # Generate points for each circle with symmetry
-    for circle_idx in range(num_circles):
+    rings = generate_circular_rings(rng, 0, num_circles, num_points, connection_density, symmetry, len(color_palette))
+    for circle, connections in rings:
+        pattern['circles'].append(apply_circular_palette(circle, color_palette))
+        pattern['connections'].extend(apply_circular_palette(c, color_palette) for c in connections)
+    
+    return pattern
+
+def generate_circular_rings(rng, start, stop, num_points, connection_density, symmetry, palette_size):
+    """Yield (circle, connections) for circles start..stop-1, with palette indices as colors.
+
+    Circle i only draws from `rng` after circles 0..i-1 did, so a pattern can
+    be extended one ring at a time from a saved rng state.
+    """
+    # choice() over indices draws exactly like choice() over the palette itself
+    colors = range(palette_size)
+    for circle_idx in range(start, stop):
         radius = 50 + (circle_idx * 30)
         circle_points = []
+        connections = []
         
         # Generate base points for one segment
         points_per_segment = num_points // symmetry
@@ -72,25 +97,25 @@ def generate_circular_pattern(
                 circle_points.append({
                     'x': x,
                     'y': y,
-                    'color': random.choice(color_palette)
+                    'color': rng.choice(colors)
                 })
         
-        pattern['circles'].append({
+        circle = {
             'radius': radius,
             'points': circle_points,
-            'color': random.choice(color_palette)
-        })
+            'color': rng.choice(colors)
+        }
         
         # Generate connections between points
         if circle_idx > 0:
             for i in range(len(circle_points)):
-                if random.random() < connection_density:
+                if rng.random() < connection_density:
                     # Maintain symmetry in connections
                     for sym in range(symmetry):
                         from_idx = (i + (sym * points_per_segment)) % len(circle_points)
-                        to_idx = ((i + random.randint(0, 2)) + (sym * points_per_segment)) % len(circle_points)
+                        to_idx = ((i + rng.randint(0, 2)) + (sym * points_per_segment)) % len(circle_points)
                         
-                        pattern['connections'].append({
+                        connections.append({
                             'from': {
                                 'circle': circle_idx - 1,
                                 'point': from_idx
@@ -99,30 +124,128 @@ def generate_circular_pattern(
                                 'circle': circle_idx,
                                 'point': to_idx
                             },
-                            'color': random.choice(color_palette)
+                            'color': rng.choice(colors)
                         })
-    
-    return pattern
+        
+        yield circle, connections
+
+def apply_circular_palette(element, palette):
+    """Copy of a circle or connection from generate_circular_rings with colors looked up in `palette`"""
+    element = dict(element, color=palette[element['color']])
+    if 'points' in element:
+        element['points'] = [dict(point, color=palette[point['color']]) for point in element['points']]
+    return element
 
 @circular_pattern_bp.route('/')
 def circular_pattern_index():
-    return render_template('circular_pattern/index.html')
+    return render_page('circular_pattern/index.html')
+
+def _estimated_cost():
+    # Work grows with the number of points; the defaults cost 1
+    return max(1, int(request.args.get('circles', 8)) * int(request.args.get('points', 12)) / 96)
+
+def _pattern_params():
+    return {
+        'num_circles': int(request.args.get('circles', 8)),
+        'num_points': int(request.args.get('points', 12)),
+        'connection_density': float(request.args.get('density', 0.7)),
+        'symmetry': int(request.args.get('symmetry', 1)),
+        'base_hue': float(request.args.get('hue', 0.5)),
+        'palette_type': request.args.get('palette', 'complementary')
+    }
 
 @circular_pattern_bp.route('/generate')
+@scheduled('bulk', cost=_estimated_cost)
 def get_pattern():
-    num_circles = int(request.args.get('circles', 8))
-    num_points = int(request.args.get('points', 12))
-    connection_density = float(request.args.get('density', 0.7))
-    symmetry = int(request.args.get('symmetry', 1))
-    base_hue = float(request.args.get('hue', 0.5))
-    palette_type = request.args.get('palette', 'complementary')
-    
-    pattern_data = generate_circular_pattern(
-        num_circles=num_circles,
-        num_points=num_points,
-        connection_density=connection_density,
-        symmetry=symmetry,
-        base_hue=base_hue,
-        palette_type=palette_type
-    )
-    return jsonify(pattern_data) 
\ No newline at end of file
+    params = _pattern_params()
+    seed = request.args.get('seed', type=int)
+    compact = request.args.get('encoding') == 'compact'
+
+    cached = pattern_store.lookup('circular', params, seed)
+    if cached is not None:
+        if not compact:
+            return current_app.response_class(cached, mimetype='application/json')
+        pattern_data = json.loads(cached)
+    else:
+        pattern_data = generate_circular_pattern(seed=seed, **params)
+
+    if compact:
+        pattern_data = compact_encoding.encode(pattern_data, compact_encoding.CIRCULAR_TABLES)
+    return stream_json(pattern_data)
+
+@circular_pattern_bp.route('/animate')
+@scheduled('bulk', cost=lambda: _estimated_cost() + animation.estimated_cost())
+def animate_pattern():
+    """Stream the rotation as NDJSON: a keyframe, then batches of per-frame deltas"""
+    params = _pattern_params()
+    seed = request.args.get('seed', type=int)
+    compact = request.args.get('encoding') == 'compact'
+    try:
+        fps, frames = animation.requested_sequence()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cached = pattern_store.lookup('circular', params, seed)
+    pattern_data = json.loads(cached) if cached is not None else generate_circular_pattern(seed=seed, **params)
+    speed = pattern_data['rotationSpeed']
+    if compact:
+        pattern_data = compact_encoding.encode(pattern_data, compact_encoding.CIRCULAR_TABLES)
+
+    keyframe = {'fps': fps, 'frames': frames, 'transform': {'rotate': 0.0}, 'pattern': pattern_data}
+    return animation.stream_frames(keyframe, animation.rotation_frames(speed, fps, frames, compact))
+
+@circular_pattern_bp.route('/thumb.png')
+@scheduled('bulk', cost=_estimated_cost)
+def thumbnail():
+    """A PNG preview of the pattern; ?size= is 64, 128 or 256 pixels"""
+    return raster.thumbnail_response('circular', _pattern_params(), request.args.get('seed', type=int),
+                                     generate_circular_pattern)
+
+@circular_pattern_bp.route('/edit')
+@scheduled('interactive', cost=_estimated_cost)
+@sharding.refuses_while_draining
+def start_edit():
+    """Start an edit session; later edits to it return patches instead of whole patterns"""
+    params = _pattern_params()
+    seed = request.args.get('seed', type=int)
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    session_id = sharding.new_session_id()
+    session = pattern_edits.EditSession('circular', params, seed)
+    session.touch(current_app.config['EDIT_SESSION_TTL'])
+    pattern_data = current_app.extensions['edit_states'].start(session_id, session)
+    current_app.extensions['edit_sessions'].put(session_id, session)
+    reply = {'id': session_id, 'revision': session.revision, 'seed': seed, 'pattern': pattern_data}
+    if request.args.get('encoding') == 'compact':
+        reply = pattern_edits.encode_compact('circular', reply)
+    return stream_json(reply)
+
+def _edit_cost():
+    """Patches are cheap; an edit that rebuilds or grows the pattern costs what generating it does"""
+    session_id = request.view_args['session_id']
+    return current_app.extensions['edit_states'].edit_cost(
+        session_id, current_app.extensions['edit_sessions'].get(session_id), 'circular', _pattern_params(),
+        request.args.get('revision', type=int), _estimated_cost())
+
+@circular_pattern_bp.route('/edit/<session_id>')
+@scheduled('interactive', cost=_edit_cost)
+@sharding.refuses_while_draining
+def edit_pattern(session_id):
+    """Apply the request's params to an edit session and return the ops that patch ?revision=N"""
+    sessions = current_app.extensions['edit_sessions']
+    session = sessions.get(session_id)
+    if session is None or session.kind != 'circular':
+        return jsonify({'error': 'Edit session not found'}), 404
+
+    params = _pattern_params()
+    base = request.args.get('revision', type=int)
+    ops = current_app.extensions['edit_states'].edit(session_id, session, params, base)
+    session.params = params
+    session.revision += 1
+    session.touch(current_app.config['EDIT_SESSION_TTL'])
+    sessions.put(session_id, session)
+    reply = {'revision': session.revision, 'base': base, 'ops': ops}
+    if request.args.get('encoding') == 'compact':
+        reply = pattern_edits.encode_compact('circular', reply)
+    return stream_json(reply)
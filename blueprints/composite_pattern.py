@@ -0,0 +1,108 @@
+from flask import Blueprint, jsonify, request, current_app
+import random
+from blueprints.core.json_stream import stream_json
+from blueprints.core.pipeline import Pipeline
+from blueprints.core.scheduler import scheduled
+from blueprints.patterns.composite import (
+    MAX_SPRIG_LENGTH, CircularMotif, GeometricOutline, Layers, MotifFill, PaletteStage, TessellationCells,
+    VinesAlongOutline
+)
+
+composite_pattern_bp = Blueprint('composite_pattern', __name__)
+MAX_BATCH_SEEDS = 32
+# Requests estimated to cost more than this many default renders are refused
+MAX_COST = 200
+# Sprig growth per step of max_length, measured on VinesAlongOutline
+SPRIG_GROWTH = 1.34
+
+def _palette():
+    return PaletteStage({
+        'base_hue': float(request.args.get('hue', 0.5)),
+        'palette_type': request.args.get('palette', 'complementary')
+    })
+
+def _tiled_motifs(seed):
+    """Circular motifs in the cells of a tessellation, sharing one palette"""
+    cells = TessellationCells({
+        'pattern_type': request.args.get('tiling', 'hexagonal'),
+        'cell_size': float(request.args.get('cell_size', 80)),
+        'width': float(request.args.get('width', 800)),
+        'height': float(request.args.get('height', 800))
+    })
+    motif = CircularMotif({
+        'num_circles': int(request.args.get('circles', 4)),
+        'num_points': int(request.args.get('points', 12)),
+        'symmetry': int(request.args.get('symmetry', 1)),
+        'seed': seed
+    }, palette=_palette())
+    return MotifFill({'fill': float(request.args.get('fill', 0.9))}, cells=cells, motif=motif)
+
+def _vine_outline(seed):
+    """Vines grown along the outline of a geometric pattern in the same palette"""
+    outline = GeometricOutline({
+        'symmetry': int(request.args.get('symmetry', 6)),
+        'layers': int(request.args.get('layers', 3)),
+        'complexity': float(request.args.get('complexity', 1.0)),
+        'seed': seed
+    }, palette=_palette())
+    vines = VinesAlongOutline({
+        'max_length': int(request.args.get('max_length', 4)),
+        'growth_pattern': request.args.get('growth_pattern', 'spreading'),
+        'seed': seed
+    }, outline=outline)
+    return Layers(outline=outline, vines=vines)
+
+RECIPES = {
+    'tiled_motifs': _tiled_motifs,
+    'vine_outline': _vine_outline,
+}
+
+def _requested_seeds():
+    """?seeds=1,2,3 renders a batch; otherwise ?seed=, or a random one"""
+    if 'seeds' in request.args:
+        return [int(s) for s in request.args['seeds'].split(',')][:MAX_BATCH_SEEDS]
+    seed = request.args.get('seed', type=int)
+    return [seed if seed is not None else random.getrandbits(32)]
+
+def _estimated_cost():
+    """Cost in default renders (a default single seed costs 1) of the requested seeds"""
+    seeds = len(_requested_seeds())
+    if request.args.get('recipe', 'tiled_motifs') == 'vine_outline':
+        # As /geometric/generate, with sprigs that grow exponentially in max_length
+        symmetry = int(request.args.get('symmetry', 6))
+        layers = int(request.args.get('layers', 3))
+        outline = symmetry * layers * (layers + 3) / 108
+        # Deeper sprigs are refused by VinesAlongOutline; keep the power finite for them
+        max_length = min(int(request.args.get('max_length', 4)), MAX_SPRIG_LENGTH + 1)
+        return seeds * outline * SPRIG_GROWTH ** (max_length - 4)
+    cell_size = float(request.args.get('cell_size', 80))
+    if not cell_size > 0:
+        raise ValueError('cell_size must be positive')
+    # Every seed's payload holds the motif and one placement per cell
+    cells = float(request.args.get('width', 800)) * float(request.args.get('height', 800)) / cell_size ** 2
+    motif = int(request.args.get('circles', 4)) * int(request.args.get('points', 12)) / 48
+    return seeds * (motif + cells / 100) / 2
+
+@composite_pattern_bp.route('/generate')
+@scheduled('bulk', cost=lambda: max(1, _estimated_cost()))
+def generate_composite():
+    """Run a composite recipe for one seed or a batch of seeds through the shared stage cache"""
+    recipe = request.args.get('recipe', 'tiled_motifs')
+    if recipe not in RECIPES:
+        return jsonify({'error': f'Unknown recipe: {recipe}', 'recipes': list(RECIPES)}), 400
+    try:
+        cost = _estimated_cost()
+        if not cost <= MAX_COST:
+            raise ValueError(f'This request would cost about {cost:.0f} default renders; at most {MAX_COST} are allowed')
+        seeds = _requested_seeds()
+        stages = [RECIPES[recipe](seed) for seed in seeds]
+        pipeline = Pipeline(current_app.extensions['pipeline_cache'])
+        outputs = pipeline.evaluate_many(stages)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return stream_json({
+        'recipe': recipe,
+        'patterns': [dict(output, seed=seed, key=stage.key) for seed, stage, output in zip(seeds, stages, outputs)],
+        'stagesRun': pipeline.runs
+    })
@@ -0,0 +1,142 @@
+"""Server-side frame sequences for pattern animations (``/<pattern>/animate``).
+
+The pages animate in the browser: circular and geometric patterns rotate by
+``rotationSpeed`` degrees per ``requestAnimationFrame`` tick, and vines grow
+one step per 100 ms poll. The animate routes produce the same animation as
+a sequence of frames at a requested frame rate, for video or GIF export.
+
+A sequence is streamed as newline-delimited JSON:
+
+* a ``keyframe`` line with the pattern at frame 0 and the sequence metadata;
+* ``frames`` lines, each covering a batch of up to ``BATCH_FRAMES``
+  consecutive frames with that batch's per-frame transform deltas.
+
+Rotations are quantized to ``1 / ROTATION_SCALE`` degrees before they are
+differenced, so summing the deltas reproduces every frame's angle exactly
+and long sequences do not drift. Each batch also carries the absolute angle
+before its first frame, so a player can start from any batch.
+
+Frame times, angles and growth schedules are computed with NumPy a batch at
+a time and written out as each batch is ready, so memory stays flat however
+long the sequence is.
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+from flask import current_app, request
+
+from blueprints.core import compact_encoding
+from blueprints.core.json_stream import iter_json
+
+BATCH_FRAMES = 120
+DEFAULT_FPS = 30
+DEFAULT_DURATION = 5
+MAX_FPS = 120
+MAX_DURATION = 600
+# Frames per unit of scheduler cost: 30 seconds at 60 fps
+FRAMES_PER_COST = 1800
+# requestAnimationFrame rate the browser animations are tuned for
+BROWSER_FPS = 60
+ROTATION_SCALE = 10000
+
+
+def frame_count(duration: float, fps: float) -> int:
+    """Validate the sequence length and return its number of frames."""
+    if not (0 < fps <= MAX_FPS):
+        raise ValueError(f'fps must be in (0, {MAX_FPS}]')
+    if not (0 < duration <= MAX_DURATION):
+        raise ValueError(f'duration must be in (0, {MAX_DURATION}] seconds')
+    return max(1, int(round(duration * fps)))
+
+
+def requested_sequence() -> Tuple[float, int]:
+    """Read ?fps= and ?duration= (seconds) from the request; returns (fps, frames)."""
+    fps = request.args.get('fps', DEFAULT_FPS, type=float)
+    duration = request.args.get('duration', DEFAULT_DURATION, type=float)
+    return fps, frame_count(duration, fps)
+
+
+def estimated_cost() -> float:
+    """Scheduler cost of the requested frames, on top of generating the keyframe."""
+    try:
+        _, frames = requested_sequence()
+    except ValueError:
+        return 0  # rejected with a 400 by the route
+    return frames / FRAMES_PER_COST
+
+
+def frame_batches(frames: int, batch: int = BATCH_FRAMES) -> Iterator[np.ndarray]:
+    """Frame indices 1..frames-1 (frame 0 is the keyframe) in batches."""
+    for start in range(1, frames, batch):
+        yield np.arange(start, min(start + batch, frames))
+
+
+def _pack(values: np.ndarray, compact: bool, scale: int = 1) -> Any:
+    if compact:
+        return {'scale': scale, 'data': compact_encoding.pack_ints(values)}
+    return (values / scale).tolist() if scale != 1 else values.tolist()
+
+
+def rotation_frames(speed: float, fps: float, frames: int, compact: bool = False) -> Iterator[Dict[str, Any]]:
+    """Batches of per-frame rotation deltas for a pattern turning `speed` degrees per browser frame."""
+    degrees_per_frame = speed * BROWSER_FPS / fps
+    for indices in frame_batches(frames):
+        # Quantized absolute angles, including the frame before the batch
+        angles = np.rint(np.arange(indices[0] - 1, indices[-1] + 1) * degrees_per_frame * ROTATION_SCALE).astype(np.int64)
+        yield {
+            'type': 'frames',
+            'start': int(indices[0]),
+            'count': len(indices),
+            'base': {'rotate': float(angles[0] % (360 * ROTATION_SCALE)) / ROTATION_SCALE},
+            'deltas': {'rotate': _pack(np.diff(angles), compact, ROTATION_SCALE)},
+        }
+
+
+def step_schedule(indices: np.ndarray, fps: float, steps_per_second: float) -> np.ndarray:
+    """Number of growth steps completed by each frame in `indices`."""
+    return np.floor(indices * steps_per_second / fps + 1e-9).astype(np.int64)
+
+
+def growth_frames(grow_to: Callable[[int], Dict[str, list]], fps: float, frames: int, steps_per_second: float,
+                  render: Callable[[Dict[str, list]], Any] = lambda added: added,
+                  compact: bool = False) -> Iterator[Dict[str, Any]]:
+    """Batches of elements added per frame by a pattern that grows in steps.
+
+    `grow_to(step)` advances the pattern to `step` and returns its element
+    lists, which only ever grow. Each batch lists the elements added during
+    the batch once, converted by `render`, plus how many of each kind every
+    frame adds.
+    """
+    seen = {name: len(elements) for name, elements in grow_to(0).items()}
+    for indices in frame_batches(frames):
+        counts = {name: np.zeros(len(indices), dtype=np.int64) for name in seen}
+        added = {name: [] for name in seen}
+        for i, step in enumerate(step_schedule(indices, fps, steps_per_second).tolist()):
+            for name, elements in grow_to(step).items():
+                counts[name][i] = len(elements) - seen[name]
+                added[name].extend(elements[seen[name]:])
+                seen[name] = len(elements)
+        yield {
+            'type': 'frames',
+            'start': int(indices[0]),
+            'count': len(indices),
+            'added': render(added),
+            'deltas': {name: _pack(values, compact) for name, values in counts.items()},
+        }
+
+
+def _iter_lines(lines: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for line in lines:
+        yield from iter_json(line)
+        yield '\n'
+
+
+def stream_frames(keyframe: Dict[str, Any], batches: Iterable[Dict[str, Any]]):
+    """Return a streamed NDJSON response: the keyframe line, then the frame batches."""
+    keyframe = dict(keyframe, type='keyframe', frame=0)
+
+    def lines():
+        yield keyframe
+        yield from batches
+
+    return current_app.response_class(_iter_lines(lines()), mimetype='application/x-ndjson')
@@ -0,0 +1,120 @@
+"""Fingerprinted static assets and cached page rendering.
+
+``scripts/build_assets.py`` moves the inline ``<style>`` and ``<script>``
+blocks of every template into content-hashed bundles under
+``ASSET_DIST_DIR``, writes gzip (and, when available, brotli) copies next to
+them, and writes rewritten templates to ``ASSET_TEMPLATE_DIR``. When those
+exist, this module:
+
+* serves the bundles under ``/assets/`` with immutable, year-long caching,
+  picking the precompressed copy the client accepts;
+* makes the rewritten templates take precedence over the originals;
+* exposes ``asset_url()`` to templates.
+
+A build is ignored in debug mode, and whenever a template or static file is
+newer than its manifest, so a leftover build never hides edited sources.
+
+``render_page`` renders a template once per process and answers with an
+ETag and a short public max-age, so browsers and nginx can revalidate or
+reuse the page without a full render.
+"""
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import Blueprint, abort, current_app, render_template, request, send_file, url_for
+from jinja2 import ChoiceLoader, FileSystemLoader
+from werkzeug.security import safe_join
+
+assets_bp = Blueprint('assets', __name__)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MANIFEST_NAME = 'manifest.json'
+
+# Precompressed variants, in order of preference
+_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+@assets_bp.route('/<path:filename>')
+def serve_asset(filename):
+    path = safe_join(current_app.config['ASSET_DIST_DIR'], filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for name, suffix in _ENCODINGS:
+        if request.accept_encodings[name] and os.path.isfile(path + suffix):
+            path, encoding = path + suffix, name
+            break
+
+    response = send_file(path, mimetype=mimetype, download_name=os.path.basename(filename),
+                         max_age=IMMUTABLE_MAX_AGE, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def asset_url(name: str) -> str:
+    """URL of a static asset, using its fingerprinted bundle when one was built."""
+    hashed = current_app.extensions.get('asset_manifest', {}).get(name)
+    if hashed:
+        return url_for('assets.serve_asset', filename=hashed)
+    return url_for('static', filename=name)
+
+
+def render_page(template_name: str):
+    """Render a mostly static page once per process and serve it with an ETag."""
+    cache = current_app.extensions['page_cache']
+    entry = cache.get(template_name)
+    if entry is None or current_app.debug:
+        body = render_template(template_name).encode('utf-8')
+        entry = (body, hashlib.sha1(body).hexdigest())
+        cache[template_name] = entry
+
+    body, etag = entry
+    response = current_app.response_class(body, mimetype='text/html')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['PAGE_CACHE_MAX_AGE']
+    return response.make_conditional(request)
+
+
+def _newest_source(app) -> float:
+    """Modification time of the newest template or static file the build reads."""
+    dist_dir = os.path.abspath(app.config['ASSET_DIST_DIR'])
+    newest = 0.0
+    for directory in (app.template_folder, app.static_folder):
+        directory = os.path.join(app.root_path, directory) if directory else None
+        if not directory or not os.path.isdir(directory):
+            continue
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != dist_dir]
+            for filename in files:
+                newest = max(newest, os.path.getmtime(os.path.join(root, filename)))
+    return newest
+
+
+def init_app(app) -> None:
+    """Load the asset manifest and built templates, if ``build_assets.py`` has run since the sources changed."""
+    app.extensions['page_cache'] = {}
+    app.extensions['asset_manifest'] = {}
+    app.jinja_env.globals['asset_url'] = asset_url
+
+    manifest_path = os.path.join(app.config['ASSET_DIST_DIR'], MANIFEST_NAME)
+    if app.debug or not os.path.isfile(manifest_path):
+        return
+    if os.path.getmtime(manifest_path) < _newest_source(app):
+        app.logger.warning('Ignoring the asset build in %s: sources changed since; rerun scripts/build_assets.py',
+                           app.config['ASSET_DIST_DIR'])
+        return
+
+    with open(manifest_path) as f:
+        app.extensions['asset_manifest'] = json.load(f)
+    template_dir = app.config['ASSET_TEMPLATE_DIR']
+    if os.path.isdir(template_dir):
+        app.jinja_env.loader = ChoiceLoader([FileSystemLoader(template_dir), app.jinja_env.loader])
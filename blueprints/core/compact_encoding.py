@@ -0,0 +1,301 @@
+"""Opt-in compact encoding for 2D pattern payloads (``?encoding=compact``).
+
+The verbose payloads spell out every element as a JSON object with
+full-precision floats and hex colour strings. The compact form keeps the
+same JSON envelope, but each list of elements (a *table*) becomes columns:
+
+* numbers and coordinates are quantized to a per-field grid (``scale``
+  steps per unit), so an SVG canvas gets quarter- or tenth-pixel precision
+  instead of 17 significant digits;
+* colours become indices into a payload-wide ``palette``, and enum-like
+  strings become indices into a per-field ``values`` list;
+* every column of integers is delta-encoded, zigzag-mapped and written as
+  LEB128 varints, then base64-encoded, so neighbouring points cost one or
+  two bytes each.
+
+A field that only some records carry (a polygon's ``points`` versus a
+line's ``start`` and ``end``) gets a presence ``mask`` column. Dotted field
+names address nested objects (``from.circle``), and ``records`` fields hold
+a nested table, such as the points of each circle.
+
+The payload is self-describing: ``static/js/compact_decoder.js`` rebuilds
+the verbose structure from it without knowing which endpoint produced it,
+and ``decode`` does the same in Python.
+"""
+import base64
+from dataclasses import dataclass, replace
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ENCODING = 'compact-v1'
+
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class Field:
+    """One column of a table.
+
+    `kind` is one of ``number`` (quantized by `scale`), ``int``, ``color``,
+    ``enum``, ``point`` (an [x, y] pair), ``points`` (a list of pairs) or
+    ``records`` (a nested table described by `fields`).
+    """
+    name: str
+    kind: str
+    scale: float = 1
+    fields: Tuple['Field', ...] = ()
+
+
+def pack_ints(values: Sequence[int]) -> str:
+    """Delta-, zigzag- and varint-encode integers into a base64 string."""
+    values = np.asarray(values, dtype=np.int64)
+    if not len(values):
+        return ''
+    deltas = np.diff(values, prepend=np.int64(0))
+    zigzag = ((deltas << 1) ^ (deltas >> 63)).view(np.uint64)
+
+    groups = []
+    remaining = zigzag
+    while True:
+        rest = remaining >> np.uint64(7)
+        groups.append((remaining & np.uint64(0x7f)).astype(np.uint8) | np.where(rest != 0, 0x80, 0).astype(np.uint8))
+        if not rest.any():
+            break
+        remaining = rest
+    # A value needs group k only while higher groups still have bits set
+    columns = np.stack(groups, axis=1)
+    needed = np.ones(columns.shape, dtype=bool)
+    needed[:, 1:] = (columns[:, :-1] & 0x80) != 0
+    return base64.b64encode(columns[needed].tobytes()).decode('ascii')
+
+
+def unpack_ints(packed: str) -> np.ndarray:
+    """Inverse of pack_ints."""
+    data = base64.b64decode(packed)
+    values = []
+    current = shift = 0
+    for byte in data:
+        current |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append((current >> 1) ^ -(current & 1))
+            current = shift = 0
+    return np.cumsum(np.array(values, dtype=np.int64))
+
+
+class Palette:
+    """Assigns each distinct value (a colour, an enum name) an index in first-seen order."""
+
+    def __init__(self, values: Iterable[Any] = ()):
+        self.values: List[Any] = []
+        self._index: Dict[Any, int] = {}
+        for value in values:
+            self.index(value)
+
+    def index(self, value: Any) -> int:
+        if isinstance(value, Enum):
+            value = value.value
+        i = self._index.get(value)
+        if i is None:
+            i = self._index[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+
+def _get(record: Dict[str, Any], name: str) -> Any:
+    for part in name.split('.'):
+        if not isinstance(record, dict) or part not in record:
+            return _MISSING
+        record = record[part]
+    return record
+
+
+def _quantize(values, scale: float) -> np.ndarray:
+    return np.rint(np.asarray(values, dtype=float) * scale).astype(np.int64)
+
+
+def _encode_column(field: Field, values: List[Any], palette: Palette) -> Dict[str, Any]:
+    column: Dict[str, Any] = {'name': field.name, 'kind': field.kind}
+    if field.kind == 'number':
+        column['scale'] = field.scale
+        column['data'] = pack_ints(_quantize(values, field.scale))
+    elif field.kind == 'int':
+        column['data'] = pack_ints(values)
+    elif field.kind == 'color':
+        column['data'] = pack_ints([palette.index(v) for v in values])
+    elif field.kind == 'enum':
+        table = Palette()
+        column['data'] = pack_ints([table.index(v) for v in values])
+        column['values'] = table.values
+    elif field.kind == 'point':
+        points = _quantize(values, field.scale).reshape(-1, 2)
+        column['scale'] = field.scale
+        column['x'] = pack_ints(points[:, 0])
+        column['y'] = pack_ints(points[:, 1])
+    elif field.kind == 'points':
+        column['scale'] = field.scale
+        column['count'] = pack_ints([len(v) for v in values])
+        flat = [np.asarray(v, dtype=float).reshape(-1, 2) for v in values]
+        points = _quantize(np.concatenate(flat) if flat else np.empty((0, 2)), field.scale)
+        column['x'] = pack_ints(points[:, 0])
+        column['y'] = pack_ints(points[:, 1])
+    elif field.kind == 'records':
+        column['count'] = pack_ints([len(v) for v in values])
+        column['table'] = _encode_table((r for v in values for r in v), field.fields, palette)
+    else:
+        raise ValueError(f'Unknown field kind: {field.kind}')
+    return column
+
+
+def _encode_table(records: Iterable[Dict[str, Any]], fields: Sequence[Field], palette: Palette) -> Dict[str, Any]:
+    columns: List[List[Any]] = [[] for _ in fields]
+    present: List[List[int]] = [[] for _ in fields]
+    count = 0
+    for record in records:
+        count += 1
+        for field, values, mask in zip(fields, columns, present):
+            value = _get(record, field.name)
+            mask.append(value is not _MISSING)
+            if value is not _MISSING:
+                values.append(value)
+
+    encoded = []
+    for field, values, mask in zip(fields, columns, present):
+        if not values:
+            continue
+        column = _encode_column(field, values, palette)
+        if len(values) < count:
+            column['mask'] = pack_ints(mask)
+        encoded.append(column)
+    return {'count': count, 'fields': encoded}
+
+
+def encode(payload: Dict[str, Any], tables: Dict[str, Sequence[Field]],
+           palette: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Encode the lists under `tables` keys of `payload`; other keys are copied."""
+    colors = Palette(palette or ())
+    encoded = {'encoding': ENCODING}
+    for key, value in payload.items():
+        encoded[key] = _encode_table(value, tables[key], colors) if key in tables else value
+    encoded['palette'] = colors.values
+    return encoded
+
+
+def _decode_column(column: Dict[str, Any], palette: List[str]) -> List[Any]:
+    kind = column['kind']
+    if kind == 'number':
+        return (unpack_ints(column['data']) / column['scale']).tolist()
+    if kind == 'int':
+        return unpack_ints(column['data']).tolist()
+    if kind == 'color':
+        return [palette[i] for i in unpack_ints(column['data'])]
+    if kind == 'enum':
+        return [column['values'][i] for i in unpack_ints(column['data'])]
+    if kind == 'records':
+        records = _decode_table(column['table'], palette)
+        bounds = np.concatenate(([0], np.cumsum(unpack_ints(column['count'])))).tolist()
+        return [records[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+    points = np.column_stack((unpack_ints(column['x']), unpack_ints(column['y']))) / column['scale']
+    if kind == 'point':
+        return points.tolist()
+    if kind == 'points':
+        bounds = np.cumsum(unpack_ints(column['count']))[:-1]
+        return [p.tolist() for p in np.split(points, bounds)]
+    raise ValueError(f'Unknown field kind: {kind}')
+
+
+def _decode_table(table: Dict[str, Any], palette: List[str]) -> List[Dict[str, Any]]:
+    records: List[Dict[str, Any]] = [{} for _ in range(table['count'])]
+    for column in table['fields']:
+        values = iter(_decode_column(column, palette))
+        targets = records
+        if 'mask' in column:
+            targets = [r for r, keep in zip(records, unpack_ints(column['mask'])) if keep]
+        *parents, leaf = column['name'].split('.')
+        for record, value in zip(targets, values):
+            for part in parents:
+                record = record.setdefault(part, {})
+            record[leaf] = value
+    return records
+
+
+def decode(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild the verbose payload from an encoded one."""
+    palette = payload['palette']
+    return {
+        key: _decode_table(value, palette) if isinstance(value, dict) and 'fields' in value else value
+        for key, value in payload.items() if key not in ('encoding', 'palette')
+    }
+
+
+def indexed(tables: Dict[str, Sequence[Field]]) -> Dict[str, Tuple[Field, ...]]:
+    """`tables` for payloads whose colours are already indices into a palette of their own.
+
+    Their colour columns are sent as plain ints, and the decoders leave them as indices.
+    """
+    def field(f: Field) -> Field:
+        if f.kind == 'color':
+            return replace(f, kind='int')
+        return replace(f, fields=tuple(field(child) for child in f.fields))
+    return {name: tuple(field(f) for f in fields) for name, fields in tables.items()}
+
+
+CIRCULAR_TABLES = {
+    'circles': (
+        Field('radius', 'number', 4),
+        Field('color', 'color'),
+        Field('points', 'records', fields=(
+            Field('x', 'number', 4),
+            Field('y', 'number', 4),
+            Field('color', 'color'),
+        )),
+    ),
+    'connections': (
+        Field('from.circle', 'int'),
+        Field('from.point', 'int'),
+        Field('to.circle', 'int'),
+        Field('to.point', 'int'),
+        Field('color', 'color'),
+    ),
+}
+
+GEOMETRIC_TABLES = {
+    'shapes': (
+        Field('type', 'enum'),
+        Field('layer', 'int'),
+        Field('color', 'color'),
+        Field('points', 'points', 4),
+        Field('start', 'point', 4),
+        Field('end', 'point', 4),
+    ),
+}
+
+# Vine elements are small (leaf outlines are a few pixels), so they get a finer grid
+VINE_TABLES = {
+    'segments': (
+        Field('start', 'point', 10),
+        Field('end', 'point', 10),
+        Field('thickness', 'number', 10),
+        Field('color', 'color'),
+        Field('vine', 'int'),
+    ),
+    'leaves': (
+        Field('pos', 'point', 10),
+        Field('angle', 'number', 10),
+        Field('size', 'number', 10),
+        Field('type', 'enum'),
+        Field('color', 'color'),
+        Field('shape', 'points', 10),
+        Field('vine', 'int'),
+    ),
+    'flowers': (
+        Field('pos', 'point', 10),
+        Field('size', 'number', 10),
+        Field('type', 'enum'),
+        Field('color', 'color'),
+        Field('rotation', 'number', 10),
+        Field('vine', 'int'),
+    ),
+}
@@ -0,0 +1,131 @@
+"""Streaming JSON responses for large pattern payloads.
+
+``jsonify`` needs the whole payload as nested dicts and lists, and then builds
+the whole response body before sending the first byte. ``stream_json``
+encodes generator output directly instead:
+
+* dicts are walked key by key, and lists, tuples, generators and NumPy
+  arrays are emitted in batches, so lazily produced elements are encoded as
+  they are produced and never collected into an intermediate list;
+* each batch goes through the C-accelerated ``json`` encoder, so the
+  per-element cost stays close to ``json.dumps``;
+* NumPy arrays and scalars and ``Enum`` members are encoded natively.
+
+The body is handed to the WSGI server in chunks of about ``chunk_size``
+characters.
+"""
+import json
+from enum import Enum
+from types import GeneratorType
+from typing import Any, Iterator
+
+import numpy as np
+from flask import current_app
+
+# Number of list elements encoded per call into the C encoder
+BATCH_SIZE = 256
+# Rows of a NumPy array converted to Python lists at a time
+ARRAY_BLOCK_ROWS = 4096
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (GeneratorType, map, filter, zip)):
+        return list(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+_encoder = json.JSONEncoder(separators=(',', ':'), default=_default)
+_encode = _encoder.encode
+
+
+def _is_stream(value: Any) -> bool:
+    return isinstance(value, (list, tuple, GeneratorType, map, filter, zip)) or (
+        isinstance(value, np.ndarray) and value.ndim > 0
+    )
+
+
+def _iter_array(array: np.ndarray) -> Iterator[str]:
+    yield '['
+    for start in range(0, len(array), ARRAY_BLOCK_ROWS):
+        if start:
+            yield ','
+        yield _encode(array[start:start + ARRAY_BLOCK_ROWS].tolist())[1:-1]
+    yield ']'
+
+
+def _is_large(item: Any) -> bool:
+    """Whether a list element holds enough data to be streamed on its own."""
+    if not isinstance(item, dict):
+        return False
+    for value in item.values():
+        if isinstance(value, (GeneratorType, map, filter, zip)):
+            return True
+        if isinstance(value, (list, tuple, np.ndarray)) and len(value) > BATCH_SIZE:
+            return True
+    return False
+
+
+def _iter_items(items) -> Iterator[str]:
+    yield '['
+    batch = []
+    first = True
+    for item in items:
+        if _is_large(item):
+            if batch:
+                yield ('' if first else ',') + _encode(batch)[1:-1]
+                first = False
+                batch = []
+            if not first:
+                yield ','
+            first = False
+            yield from _iter_value(item)
+            continue
+        batch.append(item)
+        if len(batch) == BATCH_SIZE:
+            yield ('' if first else ',') + _encode(batch)[1:-1]
+            first = False
+            batch = []
+    if batch:
+        yield ('' if first else ',') + _encode(batch)[1:-1]
+    yield ']'
+
+
+def _iter_value(value: Any) -> Iterator[str]:
+    if isinstance(value, dict):
+        yield '{'
+        for i, (key, item) in enumerate(value.items()):
+            yield (',' if i else '') + _encode(str(key)) + ':'
+            yield from _iter_value(item)
+        yield '}'
+    elif isinstance(value, np.ndarray) and value.ndim > 0:
+        yield from _iter_array(value)
+    elif _is_stream(value):
+        yield from _iter_items(value)
+    else:
+        yield _encode(value)
+
+
+def iter_json(value: Any, chunk_size: int = 32 * 1024) -> Iterator[str]:
+    """Encode `value` as compact JSON, yielding chunks of roughly `chunk_size` characters."""
+    buffer = []
+    size = 0
+    for fragment in _iter_value(value):
+        buffer.append(fragment)
+        size += len(fragment)
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_json(value: Any, status: int = 200):
+    """Return a streamed ``application/json`` response for `value`."""
+    return current_app.response_class(iter_json(value), status=status, mimetype='application/json')
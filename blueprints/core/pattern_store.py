@@ -0,0 +1,135 @@
+"""Read-only, memory-mapped store of precomputed pattern payloads.
+
+The store is built offline by ``scripts/build_pattern_store.py`` and opened
+read-only by every worker. Because the payloads are mapped rather than read,
+all gunicorn workers share the same page-cache pages, and a hit costs a
+slice of the mapping instead of a call into the generator.
+
+File layout::
+
+    MAGIC (8 bytes) | index length (uint64, little endian) | index JSON | payloads
+
+The index maps ``make_key(pattern_name, params)`` to ``{seed: [offset, length]}``
+where offsets are relative to the start of the payload section.
+"""
+import json
+import mmap
+import os
+import random
+import struct
+import uuid
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from flask import current_app
+
+MAGIC = b'PGSTORE1'
+_HEADER = struct.Struct('<8sQ')
+
+
+def make_key(pattern_name: str, params: Dict[str, Any]) -> str:
+    """Build the canonical lookup key for a generator call.
+
+    Numbers are normalised to floats so that ``circles=8`` parsed from a
+    query string and ``circles: 8.0`` in a grid file map to the same entry.
+    """
+    canonical = {}
+    for name, value in params.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        canonical[name] = value
+    return pattern_name + '?' + json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+
+
+def build_store(path: str, entries: Iterable[Tuple[str, Dict[str, Any], int, Any]]) -> int:
+    """Write a store file from ``(pattern_name, params, seed, payload)`` entries.
+
+    The file is written next to ``path`` and moved into place atomically, so
+    running workers keep their existing mapping until they restart.
+    Returns the number of payloads written.
+    """
+    index: Dict[str, Dict[str, list]] = {}
+    chunks = []
+    offset = 0
+    for pattern_name, params, seed, payload in entries:
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        index.setdefault(make_key(pattern_name, params), {})[str(seed)] = [offset, len(data)]
+        chunks.append(data)
+        offset += len(data)
+
+    index_data = json.dumps(index, separators=(',', ':')).encode('utf-8')
+    # A name of its own, so concurrent builds never move each other's file
+    tmp_path = f'{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(index_data)))
+        f.write(index_data)
+        for data in chunks:
+            f.write(data)
+    os.replace(tmp_path, path)
+    return len(chunks)
+
+
+class PatternStore:
+    """A memory-mapped view over a store file built by ``build_store``."""
+
+    def __init__(self, path: str, prewarm: bool = True):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, index_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f'{path} is not a pattern store')
+
+        index_start = _HEADER.size
+        self._payload_start = index_start + index_length
+        self._index = json.loads(self._mmap[index_start:self._payload_start])
+
+        if prewarm and hasattr(self._mmap, 'madvise') and hasattr(mmap, 'MADV_WILLNEED'):
+            # Ask the kernel to start paging the payloads in now rather than
+            # on the first request that touches them.
+            self._mmap.madvise(mmap.MADV_WILLNEED)
+
+    def __len__(self) -> int:
+        return sum(len(variants) for variants in self._index.values())
+
+    def lookup(self, pattern_name: str, params: Dict[str, Any], seed: Optional[int] = None) -> Optional[bytes]:
+        """Return the encoded payload for a call, or None on a miss.
+
+        Without a seed one of the stored variants is picked at random, so
+        repeated default requests still see different patterns.
+        """
+        variants = self._index.get(make_key(pattern_name, params))
+        if not variants:
+            return None
+        if seed is None:
+            offset, length = random.choice(list(variants.values()))
+        elif str(seed) in variants:
+            offset, length = variants[str(seed)]
+        else:
+            return None
+        start = self._payload_start + offset
+        return self._mmap[start:start + length]
+
+    def close(self) -> None:
+        self._mmap.close()
+
+
+def init_app(app) -> None:
+    """Open the store configured by ``PATTERN_STORE_PATH``, if it exists."""
+    path = app.config.get('PATTERN_STORE_PATH')
+    store = None
+    if path and os.path.exists(path):
+        try:
+            store = PatternStore(path)
+        except (OSError, ValueError) as e:
+            app.logger.warning('Pattern store %s not loaded: %s', path, e)
+    app.extensions['pattern_store'] = store
+
+
+def lookup(pattern_name: str, params: Dict[str, Any], seed: Optional[int] = None) -> Optional[bytes]:
+    """Look up a precomputed payload for the current app, or return None."""
+    store = current_app.extensions.get('pattern_store')
+    if store is None:
+        return None
+    return store.lookup(pattern_name, params, seed)
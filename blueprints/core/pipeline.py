@@ -0,0 +1,149 @@
+"""Composable pattern pipelines built from memoized stages.
+
+A ``Stage`` is a ``Pattern`` that may take other stages as named inputs, so
+stages chain into a DAG: a palette stage can feed both a motif and an
+outline stage, and their outputs can feed a stage that combines them.
+
+Every stage has a ``key``: a hash of its type, version and config and of
+the keys of its inputs. Two stages with equal keys produce equal output,
+so a ``Pipeline`` computes each key once and looks it up in a shared
+``StageCache`` afterwards. Changing a stage's config changes its key and
+the keys of everything downstream of it, but not the keys upstream, so
+only the changed part of the graph is recomputed. Evaluating several
+pipelines in one ``evaluate_many`` call runs their shared subgraphs once.
+
+Stage outputs are shared between callers through the cache, so a stage
+must treat its inputs as read-only and build a new output instead.
+Randomized stages take an explicit ``seed`` in their config; without one
+their output could not be memoized.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from blueprints.core.pattern import Pattern
+
+DEFAULT_CACHE_SIZE = 256
+
+_JSON_TYPES = ((bool, 'boolean'), (int, 'integer'), (float, 'number'), (str, 'string'), ((list, tuple), 'array'))
+
+
+class Stage(Pattern):
+    """One node of a pipeline: a config plus named input stages."""
+
+    pattern_type = "stage"
+    # Bump when a stage's output changes for the same config, to invalidate cached results
+    version = 1
+    defaults: Dict[str, Any] = {}
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, **inputs: 'Stage'):
+        super().__init__(dict(self.defaults))
+        if config:
+            unknown = set(config) - set(self.defaults)
+            if unknown:
+                raise ValueError(f'Unknown {self.pattern_type} options: {", ".join(sorted(unknown))}')
+            self.config.update(config)
+        self.inputs = inputs
+        self._key: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        if self._key is None:
+            description = {
+                'type': self.pattern_type,
+                'version': self.version,
+                'config': self.config,
+                'inputs': {name: stage.key for name, stage in self.inputs.items()},
+            }
+            encoded = json.dumps(description, sort_keys=True, separators=(',', ':'), default=str)
+            self._key = hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+        return self._key
+
+    def run(self, **inputs: Any) -> Dict[str, Any]:
+        """Compute this stage's output from its inputs' outputs. Must be implemented by subclasses."""
+        raise NotImplementedError
+
+    def generate(self) -> Dict[str, Any]:
+        return Pipeline().evaluate(self)
+
+    @classmethod
+    def get_config_schema(cls) -> Dict[str, Any]:
+        """Return the configuration schema, derived from the defaults."""
+        properties = {}
+        for name, default in cls.defaults.items():
+            schema = {"default": default}
+            for types, json_type in _JSON_TYPES:
+                if isinstance(default, types):
+                    schema["type"] = json_type
+                    break
+            properties[name] = schema
+        return {"type": "object", "properties": properties}
+
+
+class StageCache:
+    """Thread-safe LRU map of stage key -> output."""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            output = self._entries.get(key)
+            if output is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return output
+
+    def put(self, key: str, output: Any) -> None:
+        with self._lock:
+            self._entries[key] = output
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class Pipeline:
+    """Evaluates stage graphs, running each distinct stage key at most once."""
+
+    def __init__(self, cache: Optional[StageCache] = None):
+        self.cache = cache if cache is not None else StageCache()
+        self.runs: List[str] = []  # pattern_type of every stage actually run, in order
+
+    def evaluate(self, stage: Stage) -> Dict[str, Any]:
+        return self._evaluate(stage, {})
+
+    def evaluate_many(self, stages: Iterable[Stage]) -> List[Dict[str, Any]]:
+        """Evaluate several graphs together; subgraphs they share are computed once."""
+        outputs: Dict[str, Any] = {}
+        return [self._evaluate(stage, outputs) for stage in stages]
+
+    def _evaluate(self, stage: Stage, outputs: Dict[str, Any]) -> Dict[str, Any]:
+        key = stage.key
+        if key in outputs:
+            return outputs[key]
+
+        output = self.cache.get(key)
+        if output is None:
+            inputs = {name: self._evaluate(upstream, outputs)
+                      for name, upstream in stage.inputs.items()}
+            output = stage.run(**inputs)
+            self.runs.append(stage.pattern_type)
+            self.cache.put(key, output)
+        outputs[key] = output
+        return output
+
+
+def init_app(app) -> None:
+    app.extensions['pipeline_cache'] = StageCache(app.config['PIPELINE_CACHE_SIZE'])
@@ -0,0 +1,201 @@
+"""Opt-in profiling of single requests in production.
+
+With ``PROFILING_ENABLED`` set and a ``PROFILING_TOKEN`` configured, a
+request carrying ``X-Profile: <token>`` runs under a profiler and
+``tracemalloc``. The report files go to ``PROFILING_DIR``, and their common
+name comes back in the ``X-Profile-Report`` response header:
+
+* ``<name>.collapsed``: collapsed stacks (``a;b;c <samples>``) from the
+  sampling profiler, ready for flamegraph.pl or speedscope;
+* ``<name>.prof`` and ``<name>.top.txt``: cProfile stats and the 40
+  functions with the highest cumulative time (``X-Profile-Mode: cprofile``);
+* ``<name>.alloc.txt``: peak traced memory and the top allocation sites.
+
+The profiler wraps the WSGI app rather than the view, so the report also
+covers encoding the streamed response body, which is where the lazy
+element generators (``_transform_pattern_data``, ``VineGarden.get_state``)
+run. A profiled response is buffered in full before it is sent.
+
+When profiling is off, each request costs one config lookup. Only one
+request per process is profiled at a time, and ``tracemalloc`` traces all
+threads, so allocations from concurrent requests can appear in the report.
+"""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+MODE_HEADER = 'HTTP_X_PROFILE_MODE'
+MODES = ('sampling', 'cprofile')
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 30
+ALLOCATION_FRAMES = 10
+
+
+def _frame_label(code) -> str:
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval from a helper thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self) -> None:
+        # The sampler can only run when the profiled thread releases the GIL, so
+        # shorten the switch interval to sample close to the requested rate
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class ProfilingMiddleware:
+    """WSGI middleware that profiles requests carrying the admin profiling header."""
+
+    def __init__(self, wsgi_app: Callable, app):
+        self.wsgi_app = wsgi_app
+        self.app = app
+        self._busy = threading.Lock()
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        config = self.app.config
+        if not config['PROFILING_ENABLED'] or not self._authorized(environ):
+            return self.wsgi_app(environ, start_response)
+        if not self._busy.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+        try:
+            return self._profile(environ, start_response)
+        finally:
+            self._busy.release()
+
+    def _authorized(self, environ: Dict[str, Any]) -> bool:
+        token = self.app.config['PROFILING_TOKEN']
+        supplied = environ.get(PROFILE_HEADER)
+        return bool(token) and supplied is not None and hmac.compare_digest(supplied, token)
+
+    def _profile(self, environ: Dict[str, Any], start_response: Callable) -> List[bytes]:
+        config = self.app.config
+        mode = environ.get(MODE_HEADER, config['PROFILING_MODE'])
+        if mode not in MODES:
+            mode = config['PROFILING_MODE']
+
+        name = self._report_name(environ)
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers + [('X-Profile-Report', name)]
+            captured['exc_info'] = exc_info
+            return lambda data: None  # the body is buffered, so write() is never needed
+
+        profiler: Optional[cProfile.Profile] = None
+        sampler: Optional[StackSampler] = None
+        # Leave tracing alone if the process already runs with PYTHONTRACEMALLOC
+        owns_tracing = not tracemalloc.is_tracing()
+        if owns_tracing:
+            tracemalloc.start(ALLOCATION_FRAMES)
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            sampler = StackSampler(threading.get_ident(), config['PROFILING_SAMPLE_INTERVAL'])
+            sampler.start()
+
+        started = time.perf_counter()
+        try:
+            result = self.wsgi_app(environ, capture_start_response)
+            try:
+                body = list(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if owns_tracing:
+                tracemalloc.stop()
+
+        directory = config['PROFILING_DIR']
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name)
+        if profiler is not None:
+            self._write_cprofile(profiler, base)
+        if sampler is not None:
+            sampler.write_collapsed(base + '.collapsed')
+        self._write_allocations(snapshot, peak, elapsed, environ, base + '.alloc.txt')
+
+        start_response(captured['status'], captured['headers'], captured['exc_info'])
+        return body
+
+    @staticmethod
+    def _report_name(environ: Dict[str, Any]) -> str:
+        path = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '')).strip('_') or 'root'
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{path[:60]}-{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def _write_cprofile(profiler: cProfile.Profile, base: str) -> None:
+        profiler.dump_stats(base + '.prof')
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        with open(base + '.top.txt', 'w') as f:
+            f.write(out.getvalue())
+
+    @staticmethod
+    def _write_allocations(snapshot, peak: int, elapsed: float, environ: Dict[str, Any], path: str) -> None:
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        with open(path, 'w') as f:
+            query = environ.get('QUERY_STRING')
+            f.write(f"{environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')}{'?' + query if query else ''}\n")
+            f.write(f'elapsed: {elapsed * 1000:.1f} ms, peak traced memory: {peak / 1024:.1f} KiB\n\n')
+            f.write(f'Top {TOP_ALLOCATIONS} allocation sites still alive at the end of the request:\n')
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                f.write(f'{stat}\n')
+
+
+def init_app(app) -> None:
+    """Wrap the WSGI app; profiling stays inert unless enabled and a token is set."""
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, app)
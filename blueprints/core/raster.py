@@ -0,0 +1,481 @@
+"""Server-side PNG thumbnails of generated pattern payloads.
+
+A small NumPy rasterizer draws the same payloads as ``blueprints/core/svg.py``
+into a square RGB canvas, framed the same way, and ``encode_png`` writes the
+result with ``zlib``, so previews need no imaging library. Edges are
+anti-aliased: lines and circles by their distance from each pixel centre,
+polygons and the periodic tessellation fills by 4x4 supersampling.
+
+Shapes are drawn in batches. Each shape in a batch gets a window of pixels
+around its bounding box. Its coverage of that window is computed for the
+whole batch in one set of array operations. The windows are then blended
+into the canvas in drawing order. A thumbnail of a thousand-tile tiling
+costs a few dozen array operations, not a few per tile.
+
+Rendered thumbnails are kept per worker in an LRU keyed by pattern,
+parameters, seed and size (``thumbnail_response``).
+"""
+import functools
+import hashlib
+import itertools
+import json
+import math
+import struct
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from flask import current_app, jsonify, request
+
+from blueprints.core import pattern_store
+from blueprints.core.pipeline import StageCache
+from blueprints.core.svg import PADDING
+
+THUMBNAIL_SIZES = (64, 128, 256)
+DEFAULT_THUMBNAIL_SIZE = 128
+SUPERSAMPLE = 4
+# Line segments used to draw each quadratic vine segment and petal edge
+CURVE_STEPS = 4
+# Pixels in the windows of one batch, which bounds a batch's memory
+BATCH_PIXELS = 1 << 16
+
+Point = Sequence[float]
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_color(color: str) -> np.ndarray:
+    """'#rrggbb' (or 'white') as a read-only RGB float array in [0, 1]."""
+    if color == 'white':
+        rgb = np.ones(3)
+    else:
+        value = int(color.lstrip('#'), 16)
+        rgb = np.array([(value >> 16) & 0xff, (value >> 8) & 0xff, value & 0xff]) / 255.0
+    rgb.flags.writeable = False
+    return rgb
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+def encode_png(pixels: np.ndarray) -> bytes:
+    """Encode an (h, w, 3) uint8 array as a PNG.
+
+    Every row uses the Sub filter (each byte minus the byte one pixel to
+    its left), which turns flat backgrounds and fills into runs of zeros.
+    """
+    height, width, channels = pixels.shape
+    rows = np.ascontiguousarray(pixels, dtype=np.uint8).reshape(height, width * channels)
+    filtered = rows.copy()
+    filtered[:, channels:] -= rows[:, :-channels]
+    data = np.hstack((np.ones((height, 1), dtype=np.uint8), filtered)).tobytes()
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b''.join((
+        b'\x89PNG\r\n\x1a\n',
+        _chunk(b'IHDR', header),
+        _chunk(b'IDAT', zlib.compress(data, 9)),
+        _chunk(b'IEND', b''),
+    ))
+
+
+def _inside(xs: np.ndarray, ys: np.ndarray, polygons: np.ndarray) -> np.ndarray:
+    """Even-odd test of sample points against polygons (..., k, 2).
+
+    The polygons' leading dimensions broadcast against the samples', so a
+    batch of n polygons is tested against samples shaped (n, h, w).
+    """
+    inside = np.zeros(np.broadcast_shapes(xs.shape, ys.shape), dtype=bool)
+    pad = (None,) * (inside.ndim - polygons.ndim + 2)
+    for start, end in zip(np.moveaxis(polygons, -2, 0), np.moveaxis(np.roll(polygons, -1, axis=-2), -2, 0)):
+        x0, y0, x1, y1 = (a[(...,) + pad] for a in (start[..., 0], start[..., 1], end[..., 0], end[..., 1]))
+        crosses = (y0 > ys) != (y1 > ys)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inside ^= crosses & (xs < x0 + (ys - y0) * (x1 - x0) / (y1 - y0))
+    return inside
+
+
+def _segment_distance(xs: np.ndarray, ys: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Distance from sample points to segments; start and end are (..., 2) and broadcast like _inside."""
+    pad = (None,) * (len(np.broadcast_shapes(xs.shape, ys.shape)) - start.ndim + 1)
+    sx, sy, ex, ey = (a[(...,) + pad] for a in (start[..., 0], start[..., 1], end[..., 0], end[..., 1]))
+    dx, dy = ex - sx, ey - sy
+    length2 = np.maximum(dx * dx + dy * dy, 1e-12)
+    t = np.clip(((xs - sx) * dx + (ys - sy) * dy) / length2, 0, 1)
+    return np.hypot(xs - (sx + t * dx), ys - (sy + t * dy))
+
+
+def _rotate(points: np.ndarray, degrees: Any, centers: Any) -> np.ndarray:
+    """Rotate point lists (..., k, 2) by `degrees` (...) about `centers` (..., 2)."""
+    a = np.radians(np.asarray(degrees, dtype=float))[..., None]
+    c, s = np.cos(a), np.sin(a)
+    centers = np.asarray(centers, dtype=float)[..., None, :]
+    x, y = np.moveaxis(points - centers, -1, 0)
+    return np.stack((x * c - y * s, x * s + y * c), axis=-1) + centers
+
+
+def _quadratic(start: Any, control: Any, end: Any, steps: int = CURVE_STEPS) -> np.ndarray:
+    """Points along quadratic Bezier curves; the ends (..., 2) give curves (..., steps + 1, 2)."""
+    t = np.linspace(0, 1, steps + 1)[:, None]
+    start, control, end = (np.asarray(p, dtype=float)[..., None, :] for p in (start, control, end))
+    return (1 - t) ** 2 * start + 2 * (1 - t) * t * control + t ** 2 * end
+
+
+def _pad_polygons(polygons: Any) -> np.ndarray:
+    """Stack polygons into (n, k, 2), repeating the last vertex of shorter ones.
+
+    A repeated vertex adds an edge of zero length, which changes neither the
+    inside test nor the outline.
+    """
+    polygons = [np.asarray(polygon, dtype=float).reshape(-1, 2) for polygon in polygons]
+    k = max((len(polygon) for polygon in polygons), default=0)
+    padded = np.empty((len(polygons), k, 2))
+    for target, polygon in zip(padded, polygons):
+        target[:len(polygon)] = polygon
+        target[len(polygon):] = polygon[-1]
+    return padded
+
+
+def _thin(width: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Half-width to draw and coverage factor: strokes thinner than a pixel are drawn one pixel wide and fainter."""
+    return np.maximum(width, 1.0) / 2, np.minimum(width, 1.0)
+
+
+class Canvas:
+    """A size x size RGB canvas showing the world rectangle `bounds`, padded and centred.
+
+    The drawing methods take batches: arrays with one leading entry per
+    shape, plus one colour per shape.
+    """
+
+    def __init__(self, size: int, bounds: Tuple[float, float, float, float], background: str = 'white'):
+        self.size = size
+        self.pixels = np.empty((size, size, 3))
+        self.pixels[:] = parse_color(background)
+        x0, y0, x1, y1 = bounds
+        x0, y0, x1, y1 = x0 - PADDING, y0 - PADDING, x1 + PADDING, y1 + PADDING
+        self.scale = size / max(x1 - x0, y1 - y0, 1e-9)
+        # Centre the shorter side
+        self.origin = np.array([
+            x0 - (size / self.scale - (x1 - x0)) / 2,
+            y0 - (size / self.scale - (y1 - y0)) / 2,
+        ])
+
+    def to_pixels(self, points: Any) -> np.ndarray:
+        return (np.asarray(points, dtype=float) - self.origin) * self.scale
+
+    def _windows(self, lo: np.ndarray, hi: np.ndarray) -> Iterator[Tuple[int, int, np.ndarray, np.ndarray, np.ndarray]]:
+        """Split shapes with pixel bounds lo..hi (n, 2) into batches of equal-sized windows.
+
+        Yields (start, stop, corners, xs, ys): the shapes start..stop-1, the
+        top-left pixel of each one's window, and the pixel centres of the
+        windows, shaped (n, 1, w) and (n, h, 1). Batches keep drawing order.
+        """
+        lo = np.clip(np.floor(lo).astype(int), 0, self.size - 1)
+        hi = np.clip(np.ceil(hi).astype(int) + 1, 1, self.size)
+        extents = np.maximum(hi - lo, 1).tolist()
+        start = 0
+        while start < len(extents):
+            (w, h), stop = extents[start], start + 1
+            while stop < len(extents):
+                grown_w, grown_h = max(w, extents[stop][0]), max(h, extents[stop][1])
+                if (stop + 1 - start) * grown_w * grown_h > BATCH_PIXELS:
+                    break
+                (w, h), stop = (grown_w, grown_h), stop + 1
+            # Slide windows that would run off the canvas back inside it
+            corners = np.minimum(lo[start:stop], (self.size - w, self.size - h))
+            xs = corners[:, 0, None, None] + np.arange(w)[None, None, :] + 0.5
+            ys = corners[:, 1, None, None] + np.arange(h)[None, :, None] + 0.5
+            yield start, stop, corners, xs, ys
+            start = stop
+
+    def _blend(self, corners: np.ndarray, coverage: np.ndarray, colors: Sequence[str], opacity: float) -> None:
+        """Paint each shape's coverage window over the canvas, in order."""
+        h, w = coverage.shape[1:]
+        alphas = coverage[..., None] * opacity
+        for (x, y), alpha, color in zip(corners.tolist(), alphas, colors):
+            region = self.pixels[y:y + h, x:x + w]
+            region += (parse_color(color) - region) * alpha
+
+    def polylines(self, lines: Any, widths: Union[float, Sequence[float]], colors: Sequence[str],
+                  opacity: float = 1.0) -> None:
+        """Stroke polylines with the same number of points, (n, m, 2)."""
+        points = self.to_pixels(lines)
+        if not len(points):
+            return
+        half, faint = _thin(np.broadcast_to(np.asarray(widths, dtype=float) * self.scale, len(points)))
+        reach = (half + 1)[:, None]
+        for start, stop, corners, xs, ys in self._windows(points.min(axis=1) - reach, points.max(axis=1) + reach):
+            batch = points[start:stop]
+            distance = np.full(np.broadcast_shapes(xs.shape, ys.shape), np.inf)
+            for j in range(batch.shape[1] - 1):
+                distance = np.minimum(distance, _segment_distance(xs, ys, batch[:, j], batch[:, j + 1]))
+            pad = (slice(start, stop), None, None)
+            coverage = np.clip(half[pad] + 0.5 - distance, 0, 1) * faint[pad]
+            self._blend(corners, coverage, colors[start:stop], opacity)
+
+    def circles(self, centers: Any, radii: Union[float, Sequence[float]], colors: Sequence[str],
+                opacity: float = 1.0, stroke_width: Optional[float] = None) -> None:
+        """Filled circles, or their outlines when `stroke_width` is given."""
+        centers = self.to_pixels(centers).reshape(-1, 2)
+        if not len(centers):
+            return
+        radii = np.broadcast_to(np.asarray(radii, dtype=float) * self.scale, len(centers))
+        reach = (radii + (stroke_width or 0) * self.scale / 2 + 1.5)[:, None]
+        for start, stop, corners, xs, ys in self._windows(centers - reach, centers + reach):
+            pad = (slice(start, stop), None, None)
+            distance = np.hypot(xs - centers[start:stop, 0, None, None], ys - centers[start:stop, 1, None, None])
+            radius = radii[pad]
+            if stroke_width is None:
+                # Dots smaller than a pixel keep their area rather than their radius
+                drawn = np.maximum(radius, 0.5)
+                coverage = np.clip(drawn + 0.5 - distance, 0, 1) * np.minimum(1.0, (radius / drawn) ** 2)
+            else:
+                half, faint = _thin(stroke_width * self.scale)
+                coverage = np.clip(half + 0.5 - np.abs(distance - radius), 0, 1) * faint
+            self._blend(corners, coverage, colors[start:stop], opacity)
+
+    def polygons(self, polygons: Any, colors: Sequence[str], opacity: float = 1.0) -> None:
+        """Fill polygons, given as (n, k, 2) or a list of point lists of any lengths."""
+        polygons = self.to_pixels(_pad_polygons(polygons))
+        if not len(polygons) or polygons.shape[1] < 3:
+            return
+        offsets = (np.arange(SUPERSAMPLE) + 0.5) / SUPERSAMPLE - 0.5
+        for start, stop, corners, xs, ys in self._windows(polygons.min(axis=1), polygons.max(axis=1)):
+            batch = polygons[start:stop]
+            coverage = np.zeros(np.broadcast_shapes(xs.shape, ys.shape))
+            for dy in offsets:
+                for dx in offsets:
+                    coverage += _inside(xs + dx, ys + dy, batch)
+            self._blend(corners, coverage / SUPERSAMPLE ** 2, colors[start:stop], opacity)
+
+    def sample_grid(self) -> Tuple[np.ndarray, np.ndarray]:
+        """World coordinates of SUPERSAMPLE^2 samples per pixel, shaped (size, size, n)."""
+        offsets = (np.arange(SUPERSAMPLE) + 0.5) / SUPERSAMPLE
+        sub_y, sub_x = (a.ravel() for a in np.meshgrid(offsets, offsets, indexing='ij'))
+        ys, xs = np.mgrid[0:self.size, 0:self.size]
+        return (
+            (xs[..., None] + sub_x) / self.scale + self.origin[0],
+            (ys[..., None] + sub_y) / self.scale + self.origin[1],
+        )
+
+    def shade(self, colors: np.ndarray) -> None:
+        """Replace the canvas with per-sample colours (size, size, n, 3), averaged per pixel."""
+        self.pixels = colors.mean(axis=2)
+
+    def to_png(self) -> bytes:
+        return encode_png(np.rint(np.clip(self.pixels, 0, 1) * 255).astype(np.uint8))
+
+
+def _bounds(points: Iterable[Point]) -> Tuple[float, float, float, float]:
+    points = np.asarray(list(points), dtype=float).reshape(-1, 2)
+    if not len(points):
+        return (0.0, 0.0, 0.0, 0.0)
+    (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+    return (x0, y0, x1, y1)
+
+
+def rasterize_circular(pattern: Dict[str, Any], size: int = DEFAULT_THUMBNAIL_SIZE) -> Canvas:
+    circles = pattern['circles']
+    extent = max((circle['radius'] for circle in circles), default=0) + 3
+    canvas = Canvas(size, (-extent, -extent, extent, extent))
+    for circle in circles:
+        canvas.circles([(0, 0)], circle['radius'], [circle['color']], 0.3, stroke_width=1)
+        points = circle['points']
+        canvas.circles([(p['x'], p['y']) for p in points], 3, [p['color'] for p in points])
+    lines = []
+    for conn in pattern['connections']:
+        start = circles[conn['from']['circle']]['points'][conn['from']['point']]
+        end = circles[conn['to']['circle']]['points'][conn['to']['point']]
+        lines.append(((start['x'], start['y']), (end['x'], end['y'])))
+    canvas.polylines(np.reshape(lines, (-1, 2, 2)), 1, [conn['color'] for conn in pattern['connections']], 0.5)
+    return canvas
+
+
+def rasterize_geometric(pattern: Dict[str, Any], size: int = DEFAULT_THUMBNAIL_SIZE) -> Canvas:
+    shapes = pattern['shapes']
+    points = [p for shape in shapes for p in shape.get('points', [shape.get('start'), shape.get('end')])]
+    canvas = Canvas(size, _bounds(p for p in points if p is not None))
+    # Consecutive polygons, and consecutive lines, are drawn together
+    for kind, run in itertools.groupby(shapes, key=lambda shape: shape['type']):
+        run = list(run)
+        colors = [shape['color'] for shape in run]
+        if kind == 'polygon':
+            canvas.polygons([shape['points'] for shape in run], colors, 0.8)
+        elif kind == 'line':
+            canvas.polylines([(shape['start'], shape['end']) for shape in run], 2, colors, 0.6)
+    return canvas
+
+
+def _periodic_tile(data: Dict[str, Any]) -> List[Tuple[str, np.ndarray]]:
+    """The base unit of render_tessellation's pattern fill as (kind, geometry) shapes."""
+    size = data['cellSize']
+    if data['type'] == 'triangular':
+        height = size * math.sin(math.pi / 3)
+        return [
+            ('polygon', np.array([[0, 0], [size, 0], [size / 2, height]])),
+            ('polygon', np.array([[0, 0], [size / 2, height], [-size / 2, height]])),
+        ]
+    if data['type'] == 'hexagonal':
+        return [
+            ('polygon', np.asarray(data['baseUnit']['points'], dtype=float)),
+            ('circle', np.array([0, 0, size / 3])),
+        ]
+    return [
+        ('polygon', np.array([[0, 0], [size, 0], [size, size], [0, size]])),
+        ('circle', np.array([size / 2, size / 2, size / 4])),
+    ]
+
+
+def _rasterize_periodic(data: Dict[str, Any], size: int, extent: float) -> Canvas:
+    """Evaluate the repeating pattern fill at every sample: rotate into pattern space, wrap to one cell."""
+    canvas = Canvas(size, (0, 0, extent, extent))
+    xs, ys = canvas.sample_grid()
+    cell = data['cellSize'] * 2
+    a = math.radians(data['rotation'])
+    u = np.mod(xs * math.cos(a) + ys * math.sin(a), cell) - data['offset']
+    v = np.mod(-xs * math.sin(a) + ys * math.cos(a), cell) - data['offset']
+
+    colors = np.empty(xs.shape + (3,))
+    colors[:] = parse_color('white')
+    fills = data['colors']
+    for i, (kind, geometry) in enumerate(_periodic_tile(data)):
+        if kind == 'polygon':
+            fill = _inside(u, v, geometry)
+            distance = np.full(u.shape, np.inf)
+            for start, end in zip(geometry, np.roll(geometry, -1, axis=0)):
+                distance = np.minimum(distance, _segment_distance(u, v, start, end))
+        else:
+            cx, cy, radius = geometry
+            distance = np.hypot(u - cx, v - cy)
+            fill = distance <= radius
+            distance = np.abs(distance - radius)
+        colors[fill] = parse_color(fills[i])
+        colors[distance <= 0.5] = parse_color('white')
+    # The fill covers the extent x extent rect; the padding around it is background
+    outside = (xs < 0) | (xs > extent) | (ys < 0) | (ys > extent)
+    colors[outside] = parse_color('white')
+    canvas.shade(colors)
+    return canvas
+
+
+def rasterize_tessellation(data: Dict[str, Any], size: int = DEFAULT_THUMBNAIL_SIZE, extent: float = 800) -> Canvas:
+    colors = data['colors']
+    if 'tiles' not in data:
+        return _rasterize_periodic(data, size, extent)
+
+    x0, y0, x1, y1 = data['bbox']
+    zoom = data['zoom']
+    canvas = Canvas(size, (0, 0, (x1 - x0) * zoom, (y1 - y0) * zoom))
+    tiles = list(data['tiles'])
+    if not tiles:
+        return canvas
+    points = (np.array([tile['points'] for tile in tiles], dtype=float) - (x0, y0)) * zoom
+    fills = [colors[tile['kind'] % len(colors)] for tile in tiles]
+    outlines = np.concatenate((points, points[:, :1]), axis=1)
+    white = ['white'] * len(tiles)
+    # Tiles do not overlap, so fills and outlines are drawn as two batches
+    canvas.polygons(points, fills)
+    if data['type'] == 'penrose':
+        canvas.polylines(outlines, 0.5, fills)
+        canvas.polylines(points[:, [1, 0, 2]], 1, white)
+    else:
+        canvas.polylines(outlines, 1, white)
+    return canvas
+
+
+def _leaf_outline(leaf: Dict[str, Any]) -> np.ndarray:
+    """A leaf's outline before rotation."""
+    x, y = leaf['pos']
+    s = leaf['size']
+    if leaf.get('shape'):
+        return np.asarray(leaf['shape'], dtype=float) + (x, y)
+    # The page's default leaf: out to a tip, a curve back to the stem, and in
+    return np.concatenate((
+        [(x, y)], _quadratic((x + s, y - s / 2), (x + 1.5 * s, y - 3 * s / 4), (x + s, y)), [(x, y + s / 2)]))
+
+
+def rasterize_vine(pattern: Dict[str, Any], size: int = DEFAULT_THUMBNAIL_SIZE) -> Canvas:
+    segments, leaves, flowers = pattern['segments'], pattern['leaves'], pattern['flowers']
+    points = [p for segment in segments for p in (segment['start'], segment['end'])]
+    points += [leaf['pos'] for leaf in leaves] + [flower['pos'] for flower in flowers]
+    x0, y0, x1, y1 = _bounds(points)
+    reach = max([leaf['size'] for leaf in leaves] + [flower['size'] for flower in flowers], default=0)
+    canvas = Canvas(size, (x0 - reach, y0 - reach, x1 + reach, y1 + reach))
+
+    starts = np.array([segment['start'] for segment in segments], dtype=float).reshape(-1, 2)
+    ends = np.array([segment['end'] for segment in segments], dtype=float).reshape(-1, 2)
+    # The page bends each segment through a control point off its midpoint
+    delta = ends - starts
+    controls = starts + delta / 2 + delta[:, ::-1] * (-1, 1) / 8
+    canvas.polylines(_quadratic(starts, controls, ends), [s['thickness'] for s in segments],
+                     [s['color'] for s in segments])
+
+    if leaves:
+        outlines = _pad_polygons([_leaf_outline(leaf) for leaf in leaves])
+        canvas.polygons(_rotate(outlines, [leaf['angle'] for leaf in leaves], [leaf['pos'] for leaf in leaves]),
+                        [leaf['color'] for leaf in leaves])
+
+    if flowers:
+        centers = np.array([flower['pos'] for flower in flowers], dtype=float)
+        sizes = np.array([flower['size'] for flower in flowers], dtype=float)[:, None]
+        right = centers + sizes * (1, 0)
+        petal = np.concatenate((_quadratic(centers, centers + sizes * (1, -0.5), right),
+                                _quadratic(right, centers + sizes * (0.5, 0.5), centers)[:, 1:]), axis=1)
+        # Five copies of each flower's petal, 72 degrees apart
+        angles = np.arange(5) * 72 + np.array([flower.get('rotation', 0) for flower in flowers])[:, None]
+        petals = _rotate(petal[:, None], angles, centers[:, None])
+        canvas.polygons(petals.reshape(-1, *petal.shape[1:]), [f['color'] for f in flowers for _ in range(5)])
+        canvas.circles(centers, sizes[:, 0] / 3, ['#ffeb3b'] * len(flowers))
+    return canvas
+
+
+RASTERIZERS: Dict[str, Callable[..., Canvas]] = {
+    'circular': rasterize_circular,
+    'geometric': rasterize_geometric,
+    'tessellation': rasterize_tessellation,
+    'vine': rasterize_vine,
+}
+
+
+def requested_size() -> int:
+    size = request.args.get('size', DEFAULT_THUMBNAIL_SIZE, type=int)
+    if size not in THUMBNAIL_SIZES:
+        raise ValueError(f'size must be one of {", ".join(map(str, THUMBNAIL_SIZES))}')
+    return size
+
+
+def thumbnail_response(pattern_name: str, params: Dict[str, Any], seed: Optional[int],
+                       generate: Callable[..., Dict[str, Any]]):
+    """Return the PNG thumbnail of generate(seed=seed, **params) at ?size=.
+
+    Thumbnails of seeded patterns are cached and can be cached by browsers
+    too; without a seed every request draws a new pattern.
+    """
+    try:
+        size = requested_size()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cache = current_app.extensions['thumbnail_cache']
+    key = None if seed is None else f'{pattern_store.make_key(pattern_name, params)}#{seed}@{size}'
+    png = cache.get(key) if key is not None else None
+    if png is None:
+        stored = pattern_store.lookup(pattern_name, params, seed)
+        try:
+            payload = json.loads(stored) if stored is not None else generate(seed=seed, **params)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        png = RASTERIZERS[pattern_name](payload, size).to_png()
+        if key is not None:
+            cache.put(key, png)
+
+    response = current_app.response_class(png, mimetype='image/png')
+    if key is not None:
+        response.set_etag(hashlib.sha1(key.encode('utf-8')).hexdigest())
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['THUMBNAIL_MAX_AGE']
+    return response.make_conditional(request)
+
+
+def init_app(app) -> None:
+    app.extensions['thumbnail_cache'] = StageCache(app.config['THUMBNAIL_CACHE_SIZE'])
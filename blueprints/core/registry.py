@@ -0,0 +1,34 @@
+"""Name -> generator function lookup shared by the offline tooling.
+
+Every generator takes its parameters as keyword arguments plus an optional
+``seed`` and returns a JSON-serialisable dict, so tools can call them
+without going through the HTTP routes.
+"""
+import itertools
+from typing import Any, Dict, Iterator, Tuple
+
+from blueprints.circular_pattern import generate_circular_pattern
+from blueprints.geometric_pattern import generate_geometric_pattern
+from blueprints.tessellation_pattern import generate_tessellation_pattern
+from blueprints.vine_pattern import generate_vine_pattern
+
+PATTERN_GENERATORS = {
+    'circular': generate_circular_pattern,
+    'geometric': generate_geometric_pattern,
+    'tessellation': generate_tessellation_pattern,
+    'vine': generate_vine_pattern,
+}
+
+
+def expand_grid(grid: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (pattern_name, params) for every combination in a parameter grid.
+
+    The grid maps pattern names to ``{param: [values, ...]}`` under its
+    ``patterns`` key (see scripts/pattern_store_grid.json).
+    """
+    for pattern_name, axes in grid['patterns'].items():
+        if pattern_name not in PATTERN_GENERATORS:
+            raise ValueError(f'Unknown pattern in grid: {pattern_name}')
+        names = list(axes)
+        for values in itertools.product(*(axes[name] for name in names)):
+            yield pattern_name, dict(zip(names, values))
@@ -0,0 +1,238 @@
+"""Fair-share admission control for expensive generation requests.
+
+Each request to a scheduled route passes two checks before its view runs:
+
+1. A per-client token bucket, charged with the route's estimated cost. A
+   client that spends its budget gets a fast ``429`` with ``Retry-After``
+   instead of tying up a worker.
+2. A priority lane with a fixed number of concurrent slots and a bounded
+   wait queue. Interactive polls (``/vine/grow``) and bulk generation have
+   separate lanes, so a burst of large ``/circular/generate`` calls cannot
+   take the slots the light polls need. A full queue or a wait that exceeds
+   the lane's timeout gets a fast ``503``.
+
+A lane slot is held until the response is finished. Streamed bodies are
+generated after the view returns, so their slot is released when the
+server closes the response rather than at request teardown.
+
+Routes opt in with the ``@scheduled(lane, cost)`` decorator. Lanes only
+matter with a threaded worker class (see the Dockerfile); with sync workers
+the token buckets still apply.
+
+State is per worker process; ``/metrics`` reports this worker's view.
+"""
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional, Union
+
+from flask import current_app, g, jsonify, request
+
+DEFAULT_LANES = {
+    'interactive': {'concurrency': 8, 'queue': 64, 'timeout': 2.0},
+    'bulk': {'concurrency': 2, 'queue': 8, 'timeout': 5.0},
+}
+
+# Drop token buckets of clients idle for longer than this many seconds
+CLIENT_IDLE_SECONDS = 300
+
+
+def scheduled(lane: str, cost: Union[float, Callable[[], float]] = 1.0):
+    """Mark a view as scheduled in `lane` with a fixed or estimated cost.
+
+    `cost` may be a callable, evaluated in the request context, that
+    estimates the work from the request arguments.
+    """
+    def decorator(view):
+        view.schedule_lane = lane
+        view.schedule_cost = cost
+        return view
+    return decorator
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        """Take `cost` tokens; return 0 on success or the seconds to wait."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A request costing more than the burst is admitted once the bucket is full
+        cost = min(cost, self.burst)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class Lane:
+    """A fixed number of concurrent slots with a bounded FIFO-ish wait queue."""
+
+    def __init__(self, name: str, concurrency: int, queue: int, timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_limit = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.max_waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> str:
+        """Take a slot; return 'ok', 'full' or 'timeout'."""
+        with self._cond:
+            if self.active < self.concurrency and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return 'ok'
+            if self.waiting >= self.queue_limit:
+                self.rejected_full += 1
+                return 'full'
+
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            deadline = time.monotonic() + self.timeout
+            try:
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        return 'timeout'
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                return 'ok'
+            finally:
+                self.waiting -= 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        with self._cond:
+            return {
+                'active': self.active,
+                'waiting': self.waiting,
+                'max_waiting': self.max_waiting,
+                'concurrency': self.concurrency,
+                'queue_limit': self.queue_limit,
+                'admitted': self.admitted,
+                'rejected_full': self.rejected_full,
+                'rejected_timeout': self.rejected_timeout,
+            }
+
+
+class FairScheduler:
+    def __init__(self, rate: float, burst: float, lanes: Dict[str, Dict[str, float]]):
+        self.rate = rate
+        self.burst = burst
+        self.lanes = {name: Lane(name, **spec) for name, spec in lanes.items()}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+        self.rate_limited = 0
+
+    def charge(self, client: str, cost: float) -> float:
+        """Charge `client`'s bucket; return 0 if admitted, else seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_prune > CLIENT_IDLE_SECONDS:
+                self._prune(now)
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+            wait = bucket.take(cost, now)
+            if wait:
+                self.rate_limited += 1
+            return wait
+
+    def _prune(self, now: float) -> None:
+        self._buckets = {
+            client: bucket for client, bucket in self._buckets.items()
+            if now - bucket.updated < CLIENT_IDLE_SECONDS
+        }
+        self._last_prune = now
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            clients = len(self._buckets)
+        return {
+            'clients': clients,
+            'rate_limited': self.rate_limited,
+            'lanes': {name: lane.stats() for name, lane in self.lanes.items()},
+        }
+
+
+def _client_id() -> str:
+    # nginx sets X-Real-IP; fall back to the socket address when run directly
+    return request.headers.get('X-Real-IP') or request.remote_addr or 'unknown'
+
+
+def _admit():
+    if not current_app.config['SCHEDULER_ENABLED']:
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    lane_name = getattr(view, 'schedule_lane', None)
+    if lane_name is None:
+        return None
+
+    scheduler = current_app.extensions['scheduler']
+    cost = view.schedule_cost
+    if callable(cost):
+        try:
+            cost = cost()
+        except (TypeError, ValueError):
+            cost = 1.0
+
+    wait = scheduler.charge(_client_id(), max(0.0, float(cost)))
+    if wait:
+        response = jsonify({'error': 'Rate limit exceeded'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil(wait))
+        return response
+
+    lane = scheduler.lanes[lane_name]
+    outcome = lane.acquire()
+    if outcome != 'ok':
+        response = jsonify({'error': 'Server busy'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    g.scheduler_lane = lane
+    return None
+
+
+def _hand_over(response):
+    """Keep the slot of a streamed response until the server closes it."""
+    if response.is_streamed:
+        lane = g.pop('scheduler_lane', None)
+        if lane is not None:
+            response.call_on_close(lane.release)
+    return response
+
+
+def _release(exc: Optional[BaseException] = None) -> None:
+    lane = g.pop('scheduler_lane', None)
+    if lane is not None:
+        lane.release()
+
+
+def init_app(app) -> None:
+    """Create the scheduler from config and hook it into request handling."""
+    app.extensions['scheduler'] = FairScheduler(
+        rate=app.config['SCHEDULER_RATE'],
+        burst=app.config['SCHEDULER_BURST'],
+        lanes=app.config['SCHEDULER_LANES'],
+    )
+    app.before_request(_admit)
+    app.after_request(_hand_over)
+    app.teardown_request(_release)
@@ -0,0 +1,71 @@
+"""Node-aware vine session IDs for running several web containers.
+
+Vine and garden IDs have the form ``<node>.<hex>``, where ``<node>`` is the
+``NODE_ID`` of the container that created the session. nginx reads the
+prefix and sends every ``/vine/grow/<id>`` call to that node, whose replay
+cache already holds the live pattern (see ``nginx/nginx.conf``).
+
+Draining a node for maintenance: create the file named by
+``NODE_DRAIN_FILE`` in the container. From then on the node answers vine
+requests (views marked ``@refuses_while_draining``) with ``503`` before
+they are charged by the scheduler or touch any state, and nginx retries them
+on the node's backup server. Sessions live in the shared
+``VINE_SESSION_DIR``, so the backup replays them from config, seed and step
+and carries on where the drained node stopped. Removing the file puts the
+node back in service.
+"""
+import os
+import re
+import uuid
+from typing import Optional
+
+from flask import current_app, jsonify, request
+
+_NODE_ID = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def new_session_id() -> str:
+    """A fresh session ID owned by this node."""
+    return f"{current_app.config['NODE_ID']}.{uuid.uuid4().hex}"
+
+
+def node_of(session_id: str) -> Optional[str]:
+    """The node that created `session_id`, or None for IDs without a node prefix."""
+    node, sep, _ = session_id.partition('.')
+    return node if sep and _NODE_ID.match(node) else None
+
+
+def is_draining() -> bool:
+    drain_file = current_app.config['NODE_DRAIN_FILE']
+    return bool(drain_file) and os.path.exists(drain_file)
+
+
+def draining_response():
+    response = jsonify({'error': 'Node is draining', 'node': current_app.config['NODE_ID']})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def refuses_while_draining(view):
+    """Mark a view whose requests move to another node while this one drains."""
+    view.refuse_while_draining = True
+    return view
+
+
+def _refuse():
+    view = current_app.view_functions.get(request.endpoint)
+    if getattr(view, 'refuse_while_draining', False) and is_draining():
+        return draining_response()
+    return None
+
+
+def init_app(app) -> None:
+    """Check that NODE_ID can be embedded in session IDs and nginx routing keys.
+
+    Call this before ``scheduler.init_app`` so that requests a draining node
+    refuses are not charged to the client.
+    """
+    if not _NODE_ID.match(app.config['NODE_ID']):
+        raise ValueError(f"NODE_ID must match {_NODE_ID.pattern}, got {app.config['NODE_ID']!r}")
+    app.before_request(_refuse)
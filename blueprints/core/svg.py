@@ -0,0 +1,189 @@
+"""Server-side SVG rendering of generated pattern payloads.
+
+Each renderer takes the dict returned by a generator function (see
+``blueprints/core/registry.py``) and draws it the way the pattern's page
+does in the browser, so offline tools can produce the same artwork without
+a browser. The page animations (rotation, growth) are not rendered; the
+result is the pattern at rest, framed by its own bounding box.
+"""
+import math
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+PADDING = 20
+
+
+def _num(value: float) -> str:
+    text = f'{value:.2f}'.rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+
+def _pair(point: Sequence[float]) -> str:
+    return f'{_num(point[0])},{_num(point[1])}'
+
+
+def _document(elements: List[str], bounds: Tuple[float, float, float, float], background: str = 'white') -> str:
+    x0, y0, x1, y1 = bounds
+    x0, y0, x1, y1 = x0 - PADDING, y0 - PADDING, x1 + PADDING, y1 + PADDING
+    width, height = x1 - x0, y1 - y0
+    return '\n'.join([
+        '<?xml version="1.0" standalone="no"?>',
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{_num(width)}" height="{_num(height)}" '
+        f'viewBox="{_num(x0)} {_num(y0)} {_num(width)} {_num(height)}">',
+        f'<rect x="{_num(x0)}" y="{_num(y0)}" width="{_num(width)}" height="{_num(height)}" fill="{background}"/>',
+        *elements,
+        '</svg>',
+        '',
+    ])
+
+
+def _bounds(points: Iterable[Sequence[float]]) -> Tuple[float, float, float, float]:
+    xs, ys = [], []
+    for x, y in points:
+        xs.append(x)
+        ys.append(y)
+    if not xs:
+        return (0.0, 0.0, 0.0, 0.0)
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def render_circular(pattern: Dict[str, Any]) -> str:
+    circles = pattern['circles']
+    elements = []
+    for circle in circles:
+        elements.append(f'<circle cx="0" cy="0" r="{_num(circle["radius"])}" fill="none" '
+                        f'stroke="{circle["color"]}" stroke-width="1" opacity="0.3"/>')
+        for point in circle['points']:
+            elements.append(f'<circle cx="{_num(point["x"])}" cy="{_num(point["y"])}" r="3" fill="{point["color"]}"/>')
+    for conn in pattern['connections']:
+        start = circles[conn['from']['circle']]['points'][conn['from']['point']]
+        end = circles[conn['to']['circle']]['points'][conn['to']['point']]
+        elements.append(f'<line x1="{_num(start["x"])}" y1="{_num(start["y"])}" '
+                        f'x2="{_num(end["x"])}" y2="{_num(end["y"])}" '
+                        f'stroke="{conn["color"]}" stroke-width="1" opacity="0.5"/>')
+    extent = max((circle['radius'] for circle in circles), default=0) + 3
+    return _document(elements, (-extent, -extent, extent, extent))
+
+
+def render_geometric(pattern: Dict[str, Any]) -> str:
+    elements = []
+    points = []
+    for shape in pattern['shapes']:
+        if shape['type'] == 'polygon':
+            points.extend(shape['points'])
+            elements.append(f'<polygon points="{" ".join(_pair(p) for p in shape["points"])}" '
+                            f'fill="{shape["color"]}" stroke="none" opacity="0.8"/>')
+        elif shape['type'] == 'line':
+            points.extend((shape['start'], shape['end']))
+            elements.append(f'<line x1="{_num(shape["start"][0])}" y1="{_num(shape["start"][1])}" '
+                            f'x2="{_num(shape["end"][0])}" y2="{_num(shape["end"][1])}" '
+                            f'stroke="{shape["color"]}" stroke-width="2" opacity="0.6"/>')
+    return _document(elements, _bounds(points))
+
+
+def _periodic_tile(data: Dict[str, Any]) -> List[str]:
+    size = data['cellSize']
+    colors = data['colors']
+    stroke = 'stroke="#fff" stroke-width="1"'
+    if data['type'] == 'triangular':
+        height = size * math.sin(math.pi / 3)
+        return [
+            f'<path d="M0,0 L{_num(size)},0 L{_num(size / 2)},{_num(height)} Z" fill="{colors[0]}" {stroke}/>',
+            f'<path d="M0,0 L{_num(size / 2)},{_num(height)} L{_num(-size / 2)},{_num(height)} Z" '
+            f'fill="{colors[1]}" {stroke}/>',
+        ]
+    if data['type'] == 'hexagonal':
+        outline = 'L'.join(_pair(p) for p in data['baseUnit']['points'])
+        return [
+            f'<path d="M{outline}Z" fill="{colors[0]}" {stroke}/>',
+            f'<circle cx="0" cy="0" r="{_num(size / 3)}" fill="{colors[1]}" {stroke}/>',
+        ]
+    return [
+        f'<rect x="0" y="0" width="{_num(size)}" height="{_num(size)}" fill="{colors[0]}" {stroke}/>',
+        f'<circle cx="{_num(size / 2)}" cy="{_num(size / 2)}" r="{_num(size / 4)}" fill="{colors[1]}" {stroke}/>',
+    ]
+
+
+def render_tessellation(data: Dict[str, Any], size: float = 800) -> str:
+    colors = data['colors']
+    if 'tiles' not in data:
+        # Periodic tilings repeat one base unit through an SVG pattern fill
+        cell = data['cellSize'] * 2
+        elements = [
+            '<defs>',
+            f'<pattern id="tessellation" width="{_num(cell)}" height="{_num(cell)}" '
+            f'patternUnits="userSpaceOnUse" patternTransform="rotate({_num(data["rotation"])})">',
+            f'<g transform="translate({_num(data["offset"])}, {_num(data["offset"])})">',
+            *_periodic_tile(data),
+            '</g>',
+            '</pattern>',
+            '</defs>',
+            f'<rect x="0" y="0" width="{_num(size)}" height="{_num(size)}" fill="url(#tessellation)"/>',
+        ]
+        return _document(elements, (0, 0, size, size))
+
+    # Aperiodic tiles are in world coordinates; project them into the viewport
+    x0, y0, x1, y1 = data['bbox']
+    zoom = data['zoom']
+    penrose = data['type'] == 'penrose'
+
+    def project(point):
+        return _pair(((point[0] - x0) * zoom, (point[1] - y0) * zoom))
+
+    elements = []
+    for tile in data['tiles']:
+        color = colors[tile['kind'] % len(colors)]
+        outline = 'L'.join(project(p) for p in tile['points'])
+        if penrose:
+            a, b, c = tile['points']
+            elements.append(f'<path d="M{outline}Z" fill="{color}" stroke="{color}" stroke-width="0.5"/>')
+            elements.append(f'<path d="M{project(b)}L{project(a)}L{project(c)}" fill="none" stroke="#fff" stroke-width="1"/>')
+        else:
+            elements.append(f'<path d="M{outline}Z" fill="{color}" stroke="#fff" stroke-width="1"/>')
+    return _document(elements, (0, 0, (x1 - x0) * zoom, (y1 - y0) * zoom))
+
+
+def render_vine(pattern: Dict[str, Any]) -> str:
+    elements = []
+    points = []
+    for segment in pattern['segments']:
+        (x1, y1), (x2, y2) = segment['start'], segment['end']
+        dx, dy = x2 - x1, y2 - y1
+        control = (x1 + dx / 2 - dy / 8, y1 + dy / 2 + dx / 8)
+        points.extend((segment['start'], segment['end']))
+        elements.append(f'<path d="M {_pair(segment["start"])} Q {_pair(control)} {_pair(segment["end"])}" '
+                        f'stroke="{segment["color"]}" stroke-width="{_num(segment["thickness"])}" '
+                        f'fill="none" stroke-linecap="round"/>')
+    for leaf in pattern['leaves']:
+        x, y = leaf['pos']
+        size = leaf['size']
+        points.append(leaf['pos'])
+        if leaf.get('shape'):
+            shape = f'<polygon points="{" ".join(_pair((px + x, py + y)) for px, py in leaf["shape"])}" fill="{leaf["color"]}"/>'
+        else:
+            shape = (f'<path d="M {_pair((x, y))} l {_pair((size, -size / 2))} q {_pair((size / 2, -size / 4))} '
+                     f'0,{_num(size / 2)} l {_pair((-size, size / 2))} z" fill="{leaf["color"]}"/>')
+        elements.append(f'<g transform="rotate({_num(leaf["angle"])} {_num(x)} {_num(y)})">{shape}</g>')
+    for flower in pattern['flowers']:
+        x, y = flower['pos']
+        size = flower['size']
+        points.append(flower['pos'])
+        petal = (f'M {_pair((x, y))} q {_pair((size, -size / 2))} {_num(size)},0 '
+                 f'q {_pair((-size / 2, size / 2))} {_num(-size)},0 z')
+        petals = ''.join(
+            f'<path d="{petal}" fill="{flower["color"]}" '
+            f'transform="rotate({_num(i * 72 + flower.get("rotation", 0))} {_num(x)} {_num(y)})"/>'
+            for i in range(5)
+        )
+        elements.append(f'<g>{petals}<circle cx="{_num(x)}" cy="{_num(y)}" r="{_num(size / 3)}" fill="#ffeb3b"/></g>')
+    # Leaves and petals reach past their anchor points by up to their size
+    x0, y0, x1, y1 = _bounds(points)
+    reach = max([leaf['size'] for leaf in pattern['leaves']] + [f['size'] for f in pattern['flowers']], default=0)
+    return _document(elements, (x0 - reach, y0 - reach, x1 + reach, y1 + reach))
+
+
+SVG_RENDERERS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    'circular': render_circular,
+    'geometric': render_geometric,
+    'tessellation': render_tessellation,
+    'vine': render_vine,
+}
@@ -1,7 +1,13 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 import math
 import random
 import colorsys
+import json
+from blueprints.core import animation, compact_encoding, pattern_store, raster, sharding
+from blueprints.core.json_stream import stream_json
+from blueprints.core.assets import render_page
+from blueprints.core.scheduler import scheduled
+from blueprints.patterns import pattern_edits
 
 geometric_pattern_bp = Blueprint('geometric_pattern', __name__)
 
@@ -40,16 +46,34 @@ def generate_geometric_pattern(
     complexity=0.7,
     rotation=0,
     base_hue=0.5,
-    palette_type="monochromatic"
+    palette_type="monochromatic",
+    seed=None
 ):
+    # Seeding the generator makes the output reproducible
+    rng = random.Random(seed)
+
     pattern = {
         'shapes': [],
         'colors': generate_color_palette(base_hue, palette_type),
-        'rotationSpeed': random.uniform(0.1, 0.3)
+        'rotationSpeed': rng.uniform(0.1, 0.3)
     }
     
-    # Generate base shapes for each layer
-    for layer in range(layers):
+    for shapes in generate_geometric_layers(rng, 0, layers, symmetry, complexity, rotation, len(pattern['colors'])):
+        pattern['shapes'].extend(dict(shape, color=pattern['colors'][shape['color']]) for shape in shapes)
+    
+    return pattern
+
+def generate_geometric_layers(rng, start, stop, symmetry, complexity, rotation, palette_size):
+    """Yield the shapes of layers start..stop-1, with palette indices as colors.
+
+    Layer i only draws from `rng` after layers 0..i-1 did, so a pattern can be
+    extended one layer at a time from a saved rng state. The draws do not
+    depend on `rotation`, which only moves the points.
+    """
+    # choice() over indices draws exactly like choice() over the palette itself
+    colors = range(palette_size)
+    for layer in range(start, stop):
+        shapes = []
         radius = 100 + (layer * 50)
         points = []
         num_points = symmetry * (layer + 2)
@@ -62,7 +86,7 @@ def generate_geometric_pattern(
             points.append((x, y))
         
         # Generate shapes based on complexity
-        if random.random() < complexity:
+        if rng.random() < complexity:
             # Create polygons
             for i in range(0, len(points), symmetry):
                 shape_points = []
@@ -70,47 +94,140 @@ def generate_geometric_pattern(
                     idx = (i + j) % len(points)
                     shape_points.append(points[idx])
                 
-                pattern['shapes'].append({
+                shapes.append({
                     'type': 'polygon',
                     'points': shape_points,
-                    'color': random.choice(pattern['colors']),
+                    'color': rng.choice(colors),
                     'layer': layer
                 })
         
         # Add connecting lines
         for i in range(len(points)):
-            if random.random() < complexity:
-                start = points[i]
-                end = points[(i + symmetry) % len(points)]
-                pattern['shapes'].append({
+            if rng.random() < complexity:
+                start_point = points[i]
+                end_point = points[(i + symmetry) % len(points)]
+                shapes.append({
                     'type': 'line',
-                    'start': start,
-                    'end': end,
-                    'color': random.choice(pattern['colors']),
+                    'start': start_point,
+                    'end': end_point,
+                    'color': rng.choice(colors),
                     'layer': layer
                 })
-    
-    return pattern
+        
+        yield shapes
 
 @geometric_pattern_bp.route('/')
 def geometric_pattern_index():
-    return render_template('geometric_pattern/index.html')
+    return render_page('geometric_pattern/index.html')
 
-@geometric_pattern_bp.route('/generate')
-def get_pattern():
+def _estimated_cost():
+    # Layer i has symmetry * (i + 2) points; the defaults cost 1
     symmetry = int(request.args.get('symmetry', 6))
     layers = int(request.args.get('layers', 3))
-    complexity = float(request.args.get('complexity', 0.7))
-    rotation = float(request.args.get('rotation', 0))
-    base_hue = float(request.args.get('hue', 0.5))
-    palette_type = request.args.get('palette', 'monochromatic')
-    
-    pattern_data = generate_geometric_pattern(
-        symmetry=symmetry,
-        layers=layers,
-        complexity=complexity,
-        rotation=rotation,
-        base_hue=base_hue,
-        palette_type=palette_type
-    )
-    return jsonify(pattern_data) 
\ No newline at end of file
+    return max(1, symmetry * layers * (layers + 3) / 108)
+
+def _pattern_params():
+    return {
+        'symmetry': int(request.args.get('symmetry', 6)),
+        'layers': int(request.args.get('layers', 3)),
+        'complexity': float(request.args.get('complexity', 0.7)),
+        'rotation': float(request.args.get('rotation', 0)),
+        'base_hue': float(request.args.get('hue', 0.5)),
+        'palette_type': request.args.get('palette', 'monochromatic')
+    }
+
+@geometric_pattern_bp.route('/generate')
+@scheduled('bulk', cost=_estimated_cost)
+def get_pattern():
+    params = _pattern_params()
+    seed = request.args.get('seed', type=int)
+    compact = request.args.get('encoding') == 'compact'
+
+    cached = pattern_store.lookup('geometric', params, seed)
+    if cached is not None:
+        if not compact:
+            return current_app.response_class(cached, mimetype='application/json')
+        pattern_data = json.loads(cached)
+    else:
+        pattern_data = generate_geometric_pattern(seed=seed, **params)
+
+    if compact:
+        pattern_data = compact_encoding.encode(pattern_data, compact_encoding.GEOMETRIC_TABLES)
+    return stream_json(pattern_data)
+
+@geometric_pattern_bp.route('/animate')
+@scheduled('bulk', cost=lambda: _estimated_cost() + animation.estimated_cost())
+def animate_pattern():
+    """Stream the rotation as NDJSON: a keyframe, then batches of per-frame deltas"""
+    params = _pattern_params()
+    seed = request.args.get('seed', type=int)
+    compact = request.args.get('encoding') == 'compact'
+    try:
+        fps, frames = animation.requested_sequence()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cached = pattern_store.lookup('geometric', params, seed)
+    pattern_data = json.loads(cached) if cached is not None else generate_geometric_pattern(seed=seed, **params)
+    speed = pattern_data['rotationSpeed']
+    if compact:
+        pattern_data = compact_encoding.encode(pattern_data, compact_encoding.GEOMETRIC_TABLES)
+
+    keyframe = {'fps': fps, 'frames': frames, 'transform': {'rotate': 0.0}, 'pattern': pattern_data}
+    return animation.stream_frames(keyframe, animation.rotation_frames(speed, fps, frames, compact))
+
+@geometric_pattern_bp.route('/thumb.png')
+@scheduled('bulk', cost=_estimated_cost)
+def thumbnail():
+    """A PNG preview of the pattern; ?size= is 64, 128 or 256 pixels"""
+    return raster.thumbnail_response('geometric', _pattern_params(), request.args.get('seed', type=int),
+                                     generate_geometric_pattern)
+
+@geometric_pattern_bp.route('/edit')
+@scheduled('interactive', cost=_estimated_cost)
+@sharding.refuses_while_draining
+def start_edit():
+    """Start an edit session; later edits to it return patches instead of whole patterns"""
+    params = _pattern_params()
+    seed = request.args.get('seed', type=int)
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    session_id = sharding.new_session_id()
+    session = pattern_edits.EditSession('geometric', params, seed)
+    session.touch(current_app.config['EDIT_SESSION_TTL'])
+    pattern_data = current_app.extensions['edit_states'].start(session_id, session)
+    current_app.extensions['edit_sessions'].put(session_id, session)
+    reply = {'id': session_id, 'revision': session.revision, 'seed': seed, 'pattern': pattern_data}
+    if request.args.get('encoding') == 'compact':
+        reply = pattern_edits.encode_compact('geometric', reply)
+    return stream_json(reply)
+
+def _edit_cost():
+    """Patches are cheap; an edit that rebuilds or grows the pattern costs what generating it does"""
+    session_id = request.view_args['session_id']
+    return current_app.extensions['edit_states'].edit_cost(
+        session_id, current_app.extensions['edit_sessions'].get(session_id), 'geometric', _pattern_params(),
+        request.args.get('revision', type=int), _estimated_cost())
+
+@geometric_pattern_bp.route('/edit/<session_id>')
+@scheduled('interactive', cost=_edit_cost)
+@sharding.refuses_while_draining
+def edit_pattern(session_id):
+    """Apply the request's params to an edit session and return the ops that patch ?revision=N"""
+    sessions = current_app.extensions['edit_sessions']
+    session = sessions.get(session_id)
+    if session is None or session.kind != 'geometric':
+        return jsonify({'error': 'Edit session not found'}), 404
+
+    params = _pattern_params()
+    base = request.args.get('revision', type=int)
+    ops = current_app.extensions['edit_states'].edit(session_id, session, params, base)
+    session.params = params
+    session.revision += 1
+    session.touch(current_app.config['EDIT_SESSION_TTL'])
+    sessions.put(session_id, session)
+    reply = {'revision': session.revision, 'base': base, 'ops': ops}
+    if request.args.get('encoding') == 'compact':
+        reply = pattern_edits.encode_compact('geometric', reply)
+    return stream_json(reply)
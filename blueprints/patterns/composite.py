@@ -0,0 +1,251 @@
+"""Pipeline stages that combine the pattern generators (see blueprints/core/pipeline.py).
+
+* ``PaletteStage`` produces a colour palette that other stages share;
+* ``CircularMotif`` and ``GeometricOutline`` run the circular and geometric
+  generators in the palette's colours;
+* ``TessellationCells`` lays out the cells of a periodic or aperiodic
+  tiling over a canvas;
+* ``MotifFill`` places a motif in every cell, scaled to the cell;
+* ``VinesAlongOutline`` runs a vine stem along a geometric outline and
+  grows sprigs from its corners;
+* ``Layers`` bundles the outputs of several stages into one payload.
+"""
+import math
+from typing import Any, Dict, List
+
+import numpy as np
+
+from blueprints.circular_pattern import generate_circular_pattern, generate_color_palette
+from blueprints.core.pipeline import Stage
+from blueprints.geometric_pattern import generate_geometric_pattern
+from blueprints.patterns.substitution_tiling import MAX_TILES, RULES, SubstitutionTiling
+from blueprints.patterns.vine_pattern import VinePattern
+from blueprints.vine_pattern import vine_elements
+
+# Mean length of a vine segment, which sets how finely a stem follows an outline
+STEM_SEGMENT_LENGTH = 15.0
+# Sprig growth is exponential in depth and every sprouting corner grows one
+MAX_SPRIG_LENGTH = 20
+
+
+class PaletteStage(Stage):
+    """A palette of hex colours."""
+
+    pattern_type = "palette"
+    defaults = {'base_hue': 0.5, 'palette_type': 'complementary'}
+
+    def run(self) -> Dict[str, Any]:
+        colors = generate_color_palette(self.config['base_hue'], self.config['palette_type'])
+        if not colors:
+            raise ValueError(f"Unknown palette type: {self.config['palette_type']}")
+        return {'colors': colors}
+
+
+class CircularMotif(Stage):
+    """A circular pattern drawn from the input palette."""
+
+    pattern_type = "circular_motif"
+    defaults = {'num_circles': 4, 'num_points': 12, 'connection_density': 0.7, 'symmetry': 1, 'seed': 0}
+
+    def run(self, palette: Dict[str, Any]) -> Dict[str, Any]:
+        return generate_circular_pattern(color_palette=palette['colors'], **self.config)
+
+
+class GeometricOutline(Stage):
+    """A geometric pattern recoloured with the input palette."""
+
+    pattern_type = "geometric_outline"
+    defaults = {'symmetry': 6, 'layers': 3, 'complexity': 0.7, 'rotation': 0, 'seed': 0}
+
+    def run(self, palette: Dict[str, Any]) -> Dict[str, Any]:
+        pattern = generate_geometric_pattern(**self.config)
+        colors = palette['colors']
+        recolor = {old: colors[i % len(colors)] for i, old in enumerate(pattern['colors'])}
+        return dict(
+            pattern,
+            colors=colors,
+            shapes=[dict(shape, color=recolor[shape['color']]) for shape in pattern['shapes']]
+        )
+
+
+def _check_cells(count: int) -> None:
+    if count > MAX_TILES:
+        raise ValueError(f'The tiling would have about {count} cells; at most {MAX_TILES} are allowed, '
+                         f'so use a larger cell_size or a smaller canvas')
+
+
+def _lattice(pattern_type: str, size: float, width: float, height: float) -> np.ndarray:
+    """Cell polygons (n, k, 2) of a periodic tiling covering the canvas around the origin.
+
+    Raises ValueError before building anything if there would be more than
+    MAX_TILES cells.
+    """
+    if pattern_type == 'square':
+        nx, ny = math.ceil(width / size / 2), math.ceil(height / size / 2)
+        _check_cells((2 * nx + 1) * (2 * ny + 1))
+        offsets = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * size / 2
+        xs = np.arange(-nx, nx + 1) * size
+        ys = np.arange(-ny, ny + 1) * size
+        centers = np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+        return centers[:, None] + offsets
+    if pattern_type == 'hexagonal':
+        nx, ny = math.ceil(width / size / 3) + 1, math.ceil(height / size / 3.4) + 1
+        _check_cells((2 * nx + 1) * (2 * ny + 1))
+        # Flat-topped hexagons with circumradius `size`, as in generate_base_unit
+        angles = np.arange(6) * math.pi / 3
+        offsets = np.stack((np.cos(angles), np.sin(angles)), axis=1) * size
+        columns = np.arange(-nx, nx + 1)
+        rows = np.arange(-ny, ny + 1)
+        i, j = (a.ravel() for a in np.meshgrid(columns, rows))
+        centers = np.stack((1.5 * size * i, math.sqrt(3) * size * (j + 0.5 * (i % 2))), axis=1)
+        return centers[:, None] + offsets
+    if pattern_type == 'triangular':
+        row_height = size * math.sqrt(3) / 2
+        nx, ny = math.ceil(width / size) + 1, math.ceil(height / row_height / 2) + 1
+        _check_cells((2 * nx + 1) * (2 * ny + 1))
+        up = np.array([[-size / 2, row_height / 2], [size / 2, row_height / 2], [0, -row_height / 2]])
+        columns = np.arange(-nx, nx + 1)
+        rows = np.arange(-ny, ny + 1)
+        i, j = (a.ravel() for a in np.meshgrid(columns, rows))
+        centers = np.stack((i * size / 2, j * row_height), axis=1)
+        # Neighbouring triangles alternate between pointing up and down
+        flip = np.where((i + j) % 2 == 0, 1.0, -1.0)[:, None, None] * np.array([1, -1])
+        return centers[:, None] + up * flip
+    raise ValueError(f'Unknown tessellation type: {pattern_type}')
+
+
+class TessellationCells(Stage):
+    """Cells of a tiling over a width x height canvas centred on the origin.
+
+    Each cell has its polygon, a centre and the radius of a circle around
+    the centre that stays inside the cell.
+    """
+
+    pattern_type = "tessellation_cells"
+    defaults = {'pattern_type': 'hexagonal', 'cell_size': 80.0, 'width': 800.0, 'height': 800.0}
+
+    def run(self) -> Dict[str, Any]:
+        kind = self.config['pattern_type']
+        size = float(self.config['cell_size'])
+        width, height = float(self.config['width']), float(self.config['height'])
+        if not all(math.isfinite(v) and v > 0 for v in (size, width, height)):
+            raise ValueError('cell_size, width and height must be positive')
+
+        if kind in RULES:
+            tiling = SubstitutionTiling({
+                'rule': kind,
+                'bbox': (-width / 2, -height / 2, width / 2, height / 2),
+                'cell_size': size
+            })
+            parts = [verts for _, verts in tiling.iter_tile_arrays()]
+            polygons = np.concatenate(parts) if parts else np.empty((0, 3, 2))
+        else:
+            polygons = _lattice(kind, size, width, height)
+
+        centers = polygons.mean(axis=1)
+        # Distance from the centre to the nearest edge line
+        edges = np.roll(polygons, -1, axis=1) - polygons
+        to_center = centers[:, None] - polygons
+        cross = np.abs(edges[..., 0] * to_center[..., 1] - edges[..., 1] * to_center[..., 0])
+        radii = (cross / np.linalg.norm(edges, axis=2)).min(axis=1)
+
+        visible = (np.abs(centers[:, 0]) <= width / 2) & (np.abs(centers[:, 1]) <= height / 2)
+        return {
+            'type': kind,
+            'width': width,
+            'height': height,
+            'cells': [
+                {'center': center, 'radius': radius, 'points': points}
+                for center, radius, points in zip(
+                    centers[visible].tolist(), radii[visible].tolist(), polygons[visible].tolist())
+            ]
+        }
+
+
+def _motif_extent(motif: Dict[str, Any]) -> float:
+    if 'circles' in motif:
+        return max((circle['radius'] for circle in motif['circles']), default=1.0)
+    points = [p for shape in motif.get('shapes', []) for p in shape.get('points', [shape.get('start'), shape.get('end')])]
+    return max((math.hypot(*p) for p in points if p is not None), default=1.0)
+
+
+class MotifFill(Stage):
+    """Places the motif in every cell, scaled to fill `fill` of the cell's inner circle.
+
+    The motif is sent once and each cell gets a placement (offset and
+    scale), so the payload grows with the number of cells, not with the
+    size of the motif.
+    """
+
+    pattern_type = "motif_fill"
+    defaults = {'fill': 0.9}
+
+    def run(self, cells: Dict[str, Any], motif: Dict[str, Any]) -> Dict[str, Any]:
+        extent = _motif_extent(motif) or 1.0
+        radii = np.array([cell['radius'] for cell in cells['cells']], dtype=float)
+        scales = (radii * self.config['fill'] / extent).tolist()
+        return {
+            'tiling': cells,
+            'motif': motif,
+            'placements': [
+                {'cell': i, 'offset': cell['center'], 'scale': scale}
+                for i, (cell, scale) in enumerate(zip(cells['cells'], scales))
+            ]
+        }
+
+
+class VinesAlongOutline(Stage):
+    """A vine stem traced along the polygons of one geometric layer, with sprigs at the corners.
+
+    `layer` indexes the layers that have polygons, so -1 is the outermost.
+    Sprigs start pointing away from the centre and grow by the usual vine
+    rules for `max_length` steps of depth, at most MAX_SPRIG_LENGTH.
+    """
+
+    pattern_type = "vines_along_outline"
+    defaults = {'layer': -1, 'max_length': 4, 'growth_pattern': 'spreading', 'sprout_probability': 0.5, 'seed': 0}
+
+    def run(self, outline: Dict[str, Any]) -> Dict[str, Any]:
+        if not 0 <= self.config['max_length'] <= MAX_SPRIG_LENGTH:
+            raise ValueError(f'max_length must be between 0 and {MAX_SPRIG_LENGTH}')
+        vine = VinePattern({
+            'max_length': self.config['max_length'],
+            'growth_pattern': self.config['growth_pattern']
+        }, seed=self.config['seed'])
+        polygons = [shape for shape in outline['shapes'] if shape['type'] == 'polygon']
+        layers = sorted({shape['layer'] for shape in polygons})
+        if layers:
+            layer = layers[self.config['layer']]
+            for shape in polygons:
+                if shape['layer'] == layer:
+                    self._trace(vine, shape['points'])
+
+        while vine.growth_points:
+            vine.grow_step()
+        return vine_elements(vine.get_current_state())
+
+    def _trace(self, vine: VinePattern, points: List[List[float]]) -> None:
+        rng = vine.rng
+        for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]):
+            length = math.hypot(x1 - x0, y1 - y0)
+            steps = max(1, round(length / STEM_SEGMENT_LENGTH))
+            normal = ((y0 - y1) / (length or 1), (x1 - x0) / (length or 1))
+            start = (x0, y0)
+            for k in range(1, steps + 1):
+                # Wobble off the edge, but meet the corners exactly
+                wobble = rng.uniform(-2, 2) if k < steps else 0
+                end = (x0 + (x1 - x0) * k / steps + normal[0] * wobble,
+                       y0 + (y1 - y0) * k / steps + normal[1] * wobble)
+                vine.segments.append({'start': start, 'end': end, 'thickness': 3, 'color': vine.colors.vine_color})
+                start = end
+            if rng.random() < self.config['sprout_probability']:
+                vine.growth_points.append(((x0, y0), math.degrees(math.atan2(y0, x0)), 0))
+
+
+class Layers(Stage):
+    """Collects the outputs of its inputs under their input names."""
+
+    pattern_type = "layers"
+
+    def run(self, **inputs: Any) -> Dict[str, Any]:
+        return dict(inputs)
@@ -0,0 +1,320 @@
+"""Incremental regeneration for circular and geometric edit sessions.
+
+An edit session keeps a generated pattern and the structure it was built
+from, so that moving one slider only recomputes what that slider affects.
+Both generators draw from their rng ring by ring (circles, or layers), and
+colours are drawn as indices into the palette, so:
+
+* a hue or palette change that keeps the palette length leaves every draw
+  unchanged; only the palette itself is replaced;
+* changing the ring count keeps the existing rings; new rings are
+  generated from the rng state saved after the last kept ring;
+* the geometric ``rotation`` moves points without changing any draw.
+
+Anything else (points per circle, symmetry, density, ...) changes the draw
+sequence, so the pattern is rebuilt.
+
+Patterns in edit sessions carry palette indices instead of colours, plus the
+``palette`` to resolve them, and changes are returned as a list of ops:
+
+* ``{"op": "replace", "pattern": {...}}``: the whole pattern;
+* ``{"op": "palette", "palette": [...]}``: new colours for the indices;
+* ``{"op": "rotate", "degrees": d}``: rotate every point about the origin;
+* ``{"op": "truncate", <list>: n, ...}``: keep the first n items of each list;
+* ``{"op": "append", <list>: [...], ...}``: add items to the end of each list.
+
+With ``?encoding=compact`` patterns and appended rings are sent in the compact
+encoding (colours stay indices). The decoders drop an encoded object's
+``palette``, so a compact pattern's palette travels next to it instead, as
+the ``palette`` of the start reply or of the ``replace`` op.
+
+The ``EditSession`` record (params, seed, revision) lives in the shared
+``edit_sessions`` store, so any worker can serve a session, and expires
+``EDIT_SESSION_TTL`` seconds after its last edit; ``EditStateCache`` keeps the
+materialized state of recent sessions in each process.
+"""
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from blueprints import circular_pattern, geometric_pattern
+from blueprints.core import compact_encoding
+from blueprints.patterns.vine_session import FileVineSessionStore, MemoryVineSessionStore
+
+Op = Dict[str, Any]
+
+# Scheduler cost of an edit that only patches the pattern, in default renders
+PATCH_COST = 0.25
+
+
+@dataclass
+class EditSession:
+    kind: str  # 'circular' or 'geometric'
+    params: Dict[str, Any]
+    seed: int
+    revision: int = 0
+    expires: Optional[float] = None  # time.time() after which the store forgets the session
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'kind': self.kind, 'params': self.params, 'seed': self.seed, 'revision': self.revision,
+                'expires': self.expires}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EditSession':
+        return cls(data['kind'], dict(data['params']), int(data['seed']), int(data['revision']), data.get('expires'))
+
+    def expired(self) -> bool:
+        return self.expires is not None and time.time() >= self.expires
+
+    def touch(self, ttl: float) -> None:
+        """Keep the session for another `ttl` seconds."""
+        self.expires = time.time() + ttl
+
+
+class EditState:
+    """A pattern built ring by ring, with the rng state saved before every ring."""
+
+    pattern_type = "base"
+    count_param = ''
+    # Parameters that can change without a rebuild
+    incremental_params = frozenset()
+
+    def __init__(self, params: Dict[str, Any], seed: int):
+        self.seed = seed
+        self._build(params)
+
+    def _build(self, params: Dict[str, Any]) -> None:
+        self.params = dict(params)
+        self.palette = self._palette(self.params)
+        self.rng = random.Random(self.seed)
+        self.rotation_speed = self._rotation_speed(self.rng)
+        self.checkpoints = [self.rng.getstate()]
+        self.rings: List[Any] = []
+        self._grow(self.params[self.count_param])
+
+    def _grow(self, count: int) -> List[Any]:
+        added = []
+        self.rng.setstate(self.checkpoints[len(self.rings)])
+        for ring in self._rings(len(self.rings), count):
+            self.rings.append(ring)
+            self.checkpoints.append(self.rng.getstate())
+            added.append(ring)
+        return added
+
+    def rebuilds(self, params: Dict[str, Any]) -> bool:
+        """Whether moving to `params` regenerates the whole pattern."""
+        changed = {name for name in params if params[name] != self.params.get(name)}
+        return bool(changed - self.incremental_params) or len(self._palette(params)) != len(self.palette)
+
+    def update(self, params: Dict[str, Any]) -> List[Op]:
+        """Move the state to `params` and return the ops that bring a client along."""
+        params = dict(params)
+        if self.rebuilds(params):
+            self._build(params)
+            return [{'op': 'replace', 'pattern': self.pattern()}]
+
+        changed = {name for name in params if params[name] != self.params.get(name)}
+        palette = self._palette(params)
+        ops = []
+        if palette != self.palette:
+            self.palette = palette
+            ops.append({'op': 'palette', 'palette': palette})
+        ops.extend(self._relayout(params, changed))
+        self.params = params
+
+        count = max(0, params[self.count_param])
+        if count < len(self.rings):
+            del self.rings[count:]
+            del self.checkpoints[count + 1:]
+            ops.append(dict(self._sizes(), op='truncate'))
+        elif count > len(self.rings):
+            ops.append(dict(self._flatten(self._grow(count)), op='append'))
+        return ops
+
+    def pattern(self) -> Dict[str, Any]:
+        return dict(self._flatten(self.rings), palette=self.palette, rotationSpeed=self.rotation_speed)
+
+    def _relayout(self, params: Dict[str, Any], changed: set) -> List[Op]:
+        return []
+
+    def _palette(self, params: Dict[str, Any]) -> List[str]:
+        raise NotImplementedError
+
+    def _rotation_speed(self, rng: random.Random) -> float:
+        raise NotImplementedError
+
+    def _rings(self, start: int, stop: int):
+        raise NotImplementedError
+
+    def _flatten(self, rings: List[Any]) -> Dict[str, list]:
+        raise NotImplementedError
+
+    def _sizes(self) -> Dict[str, int]:
+        return {name: len(items) for name, items in self._flatten(self.rings).items()}
+
+
+class CircularEditState(EditState):
+    """Edit state of generate_circular_pattern; each ring is (circle, connections)."""
+
+    pattern_type = "circular"
+    count_param = 'num_circles'
+    incremental_params = frozenset({'num_circles', 'base_hue', 'palette_type'})
+
+    def _palette(self, params):
+        return circular_pattern.generate_color_palette(params['base_hue'], params['palette_type'])
+
+    def _rotation_speed(self, rng):
+        return rng.uniform(0.1, 0.5)
+
+    def _rings(self, start, stop):
+        p = self.params
+        return circular_pattern.generate_circular_rings(
+            self.rng, start, stop, p['num_points'], p['connection_density'], p['symmetry'], len(self.palette))
+
+    def _flatten(self, rings):
+        return {
+            'circles': [circle for circle, _ in rings],
+            'connections': [c for _, connections in rings for c in connections]
+        }
+
+
+class GeometricEditState(EditState):
+    """Edit state of generate_geometric_pattern; each ring is one layer's shapes."""
+
+    pattern_type = "geometric"
+    count_param = 'layers'
+    incremental_params = frozenset({'layers', 'base_hue', 'palette_type', 'rotation'})
+
+    def _palette(self, params):
+        return geometric_pattern.generate_color_palette(params['base_hue'], params['palette_type'])
+
+    def _rotation_speed(self, rng):
+        return rng.uniform(0.1, 0.3)
+
+    def _rings(self, start, stop):
+        p = self.params
+        return geometric_pattern.generate_geometric_layers(
+            self.rng, start, stop, p['symmetry'], p['complexity'], p['rotation'], len(self.palette))
+
+    def _relayout(self, params, changed):
+        if 'rotation' not in changed:
+            return []
+        # Replay the kept layers at the new rotation; the draws come out the same
+        degrees = params['rotation'] - self.params['rotation']
+        self.params = params
+        count = len(self.rings)
+        del self.rings[:]
+        del self.checkpoints[1:]
+        self._grow(count)
+        return [{'op': 'rotate', 'degrees': degrees}]
+
+    def _flatten(self, rings):
+        return {'shapes': [shape for shapes in rings for shape in shapes]}
+
+
+EDIT_STATES = {
+    'circular': CircularEditState,
+    'geometric': GeometricEditState,
+}
+
+
+EDIT_TABLES = {
+    'circular': compact_encoding.indexed(compact_encoding.CIRCULAR_TABLES),
+    'geometric': compact_encoding.indexed(compact_encoding.GEOMETRIC_TABLES),
+}
+
+
+def encode_compact(kind: str, reply: Dict[str, Any]) -> Dict[str, Any]:
+    """A start reply, edit reply or op of a `kind` session in the compact encoding."""
+    tables = EDIT_TABLES[kind]
+    reply = dict(reply)
+    if 'pattern' in reply:
+        pattern = dict(reply['pattern'])
+        reply['palette'] = pattern.pop('palette')
+        reply['pattern'] = compact_encoding.encode(pattern, tables)
+    if 'ops' in reply:
+        reply['ops'] = [encode_compact(kind, op) for op in reply['ops']]
+    if reply.get('op') == 'append':
+        reply = compact_encoding.encode(reply, tables)
+    return reply
+
+
+class EditStateCache:
+    """Per-process cache of materialized edit sessions.
+
+    A session last edited by another worker (or evicted here) is rebuilt
+    from the params in its session record.
+    """
+
+    def __init__(self, max_sessions: int = 256):
+        self.max_sessions = max_sessions
+        self._states: 'OrderedDict[str, EditState]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _materialize(self, session_id: str, session: EditSession) -> EditState:
+        state = self._states.get(session_id)
+        if state is None or state.seed != session.seed or state.params != session.params:
+            state = EDIT_STATES[session.kind](session.params, session.seed)
+            self._states[session_id] = state
+        self._states.move_to_end(session_id)
+        while len(self._states) > self.max_sessions:
+            self._states.popitem(last=False)
+        return state
+
+    def start(self, session_id: str, session: EditSession) -> Dict[str, Any]:
+        """Build the session's pattern and return it."""
+        with self._lock:
+            return self._materialize(session_id, session).pattern()
+
+    def edit_cost(self, session_id: str, session: Optional[EditSession], kind: str, params: Dict[str, Any],
+                  revision: Optional[int], full_cost: float) -> float:
+        """Scheduler cost of an edit, where `full_cost` is that of generating `params` from scratch.
+
+        Patches, and edits of missing sessions (a 404), cost PATCH_COST; new
+        rings their share of `full_cost`; and anything that rebuilds the
+        pattern here (a rebuilding edit, a stale `revision` or a session this
+        process does not hold) all of it.
+        """
+        if session is None or session.kind != kind:
+            return PATCH_COST
+        with self._lock:
+            state = self._states.get(session_id)
+            if (state is None or state.seed != session.seed or state.params != session.params
+                    or revision != session.revision or state.rebuilds(params)):
+                return full_cost
+            count = params[state.count_param]
+            added = max(0, count - len(state.rings))
+        return max(PATCH_COST, full_cost * added / count) if added else PATCH_COST
+
+    def edit(self, session_id: str, session: EditSession, params: Dict[str, Any],
+             revision: Optional[int] = None) -> List[Op]:
+        """Apply `params` to the session and return the patch.
+
+        A client whose `revision` is not the session's current one has
+        missed a patch, so it gets a full replace.
+        """
+        with self._lock:
+            state = self._materialize(session_id, session)
+            if revision != session.revision:
+                state.update(params)
+                return [{'op': 'replace', 'pattern': state.pattern()}]
+            return state.update(params)
+
+
+def init_app(app) -> None:
+    """Create the edit session store and state cache for `app`.
+
+    Like vine sessions, edit sessions are shared through ``VINE_SESSION_DIR``
+    (in its ``edits`` subdirectory) when it is set.
+    """
+    directory = app.config.get('VINE_SESSION_DIR')
+    if directory:
+        store = FileVineSessionStore(os.path.join(directory, 'edits'), EditSession)
+    else:
+        store = MemoryVineSessionStore(EditSession)
+    app.extensions['edit_sessions'] = store
+    app.extensions['edit_states'] = EditStateCache()
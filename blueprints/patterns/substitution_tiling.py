@@ -0,0 +1,257 @@
+"""Aperiodic substitution tilings with lazy, viewport-culled subdivision.
+
+A substitution tiling starts from a few huge prototiles covering the plane
+and repeatedly replaces every tile with smaller copies of the prototiles.
+Two rules are supported:
+
+* ``penrose``: Penrose P3 rhombs, built from Robinson half-rhomb triangles
+  (kind 0 halves thin rhombs, kind 1 halves thick rhombs) that shrink by the
+  golden ratio at every level;
+* ``pinwheel``: Conway and Radin's pinwheel tiling of 1:2 right triangles,
+  which shrink by sqrt(5) and appear in infinitely many orientations.
+
+Every tile is a triangle and every child vertex is a fixed linear
+combination of its parent's vertices, so a rule is stored as 3x3 weight
+matrices per prototile, and substituting any tile is a matrix product.
+
+Only tiles that meet the requested viewport are subdivided, and
+subdivision stops once tiles are ``cell_size`` pixels across at the
+requested zoom. A tile that lies entirely inside the viewport is expanded
+in one step from ``_expansion``, which memoizes the full substitution of
+each prototile to each depth. A deep zoom into the plane therefore costs
+time proportional to the visible tiles plus the tiles crossing the viewport
+edge on each level, not to the size of the plane.
+"""
+import math
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from blueprints.core.pattern import Pattern
+
+GOLDEN_RATIO = (1 + math.sqrt(5)) / 2
+
+# Half-width of the square of the plane covered by the root prototiles, in world units
+PLANE_SIZE = 2.0 ** 20
+# Subdivision coarsens beyond cell_size to keep a viewport to about this many tiles
+MAX_TILES = 20000
+# Beyond this, tiles get too small for float64 coordinates across the plane
+MAX_ZOOM = 1e8
+
+
+def _weights(*rows):
+    return np.array(rows, dtype=float)
+
+
+def _penrose_rules():
+    g = 1 / GOLDEN_RATIO
+    a, b, c = (1, 0, 0), (0, 1, 0), (0, 0, 1)
+    # Triangles are (A, B, C) with A the apex
+    p = (1 - g, g, 0)          # on AB, splitting a kind 0 triangle
+    q = (g, 1 - g, 0)          # on BA, splitting a kind 1 triangle
+    r = (0, 1 - g, g)          # on BC
+    return {
+        0: [(0, _weights(c, p, b)), (1, _weights(p, c, a))],
+        1: [(1, _weights(r, c, a)), (1, _weights(q, r, b)), (0, _weights(r, q, a))],
+    }
+
+
+def _pinwheel_rules():
+    # Triangles are (R, S, L): the right-angle vertex, then the ends of the
+    # short and long legs. The altitude from R (foot F) cuts off one child;
+    # the rest is split into a rectangle, halved along its diagonal, and two
+    # more children.
+    r, s, l = (1, 0, 0), (0, 1, 0), (0, 0, 1)
+    f = (0, 4 / 5, 1 / 5)
+    m_fr = (1 / 2, 2 / 5, 1 / 10)
+    m_fl = (0, 2 / 5, 3 / 5)
+    m_rl = (1 / 2, 0, 1 / 2)
+    return {
+        0: [
+            (0, _weights(f, s, r)),
+            (0, _weights(m_fl, m_rl, f)),
+            (0, _weights(m_fr, f, m_rl)),
+            (0, _weights(m_fr, r, m_rl)),
+            (0, _weights(m_fl, m_rl, l)),
+        ],
+    }
+
+
+def _penrose_roots():
+    # A wheel of ten kind 0 triangles around the origin
+    verts = []
+    for i in range(10):
+        b = (math.cos((2 * i - 1) * math.pi / 10), math.sin((2 * i - 1) * math.pi / 10))
+        c = (math.cos((2 * i + 1) * math.pi / 10), math.sin((2 * i + 1) * math.pi / 10))
+        if i % 2 == 0:
+            b, c = c, b
+        verts.append([(0, 0), b, c])
+    # The wheel has radius 1; scale it to cover the unit square
+    return np.zeros(10, dtype=np.int64), np.array(verts) * math.sqrt(2)
+
+
+def _pinwheel_roots():
+    # Two triangles making a 4x2 rectangle, which covers the unit square
+    verts = [
+        [(-2, -1), (-2, 1), (2, -1)],
+        [(2, 1), (2, -1), (-2, 1)],
+    ]
+    return np.zeros(2, dtype=np.int64), np.array(verts, dtype=float)
+
+
+# name -> (children per prototile, linear shrink per level, roots, edge length of a root tile)
+RULES = {
+    'penrose': (_penrose_rules(), GOLDEN_RATIO, _penrose_roots(), math.sqrt(2)),
+    'pinwheel': (_pinwheel_rules(), math.sqrt(5), _pinwheel_roots(), 2.0),
+}
+
+
+@lru_cache(maxsize=256)
+def _expansion(rule: str, kind: int, depth: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Substitute prototile `kind` `depth` times.
+
+    Returns the kinds of the resulting tiles and, for each, the 3x3 weights
+    expressing its vertices in terms of the prototile's vertices.
+    """
+    if depth == 0:
+        kinds, weights = np.array([kind]), np.eye(3)[None]
+    else:
+        kind_parts, weight_parts = [], []
+        for child_kind, child_weights in RULES[rule][0][kind]:
+            sub_kinds, sub_weights = _expansion(rule, child_kind, depth - 1)
+            kind_parts.append(sub_kinds)
+            weight_parts.append(sub_weights @ child_weights)
+        kinds, weights = np.concatenate(kind_parts), np.concatenate(weight_parts)
+    kinds.flags.writeable = False
+    weights.flags.writeable = False
+    return kinds, weights
+
+
+def substitute(rule: str, kinds: np.ndarray, verts: np.ndarray, depth: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Substitute every tile (`kinds`, `verts` of shape (n, 3, 2)) `depth` times."""
+    kind_parts, vert_parts = [], []
+    for kind in np.unique(kinds):
+        sub_kinds, sub_weights = _expansion(rule, int(kind), depth)
+        tiles = verts[kinds == kind]
+        kind_parts.append(np.tile(sub_kinds, len(tiles)))
+        vert_parts.append(np.einsum('njk,mkd->mnjd', sub_weights, tiles).reshape(-1, 3, 2))
+    if not kind_parts:
+        return np.empty(0, dtype=np.int64), np.empty((0, 3, 2))
+    return np.concatenate(kind_parts), np.concatenate(vert_parts)
+
+
+class SubstitutionTiling(Pattern):
+    """A substitution tiling of a huge plane, generated only where it is visible."""
+
+    pattern_type = "substitution_tiling"
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        super().__init__(config)
+        self.config = {
+            'rule': 'penrose',
+            'bbox': (-400.0, -400.0, 400.0, 400.0),
+            'zoom': 1.0,
+            'cell_size': 50.0,
+            'rotation': 0.0,
+        }
+        if config:
+            self.config.update(config)
+        if self.config['rule'] not in RULES:
+            raise ValueError(f"Unknown substitution rule: {self.config['rule']}")
+
+        x0, y0, x1, y1 = self.config['bbox']
+        zoom = self.config['zoom']
+        if not all(math.isfinite(v) for v in (x0, y0, x1, y1, zoom)):
+            raise ValueError('bbox and zoom must be finite')
+        if not (x1 > x0 and y1 > y0 and 0 < zoom <= MAX_ZOOM):
+            raise ValueError(f'bbox must have positive size and zoom must be in (0, {MAX_ZOOM:g}]')
+
+        _, shrink, _, root_edge = RULES[self.config['rule']]
+        visible_px = (x1 - x0) * (y1 - y0) * zoom ** 2
+        cell_size = max(float(self.config['cell_size']), math.sqrt(visible_px / MAX_TILES), 1.0)
+        self.depth = max(0, math.ceil(math.log(root_edge * PLANE_SIZE * zoom / cell_size, shrink)))
+
+    def iter_tile_arrays(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (kinds, verts) chunks of the visible tiles at the target depth."""
+        rule = self.config['rule']
+        x0, y0, x1, y1 = self.config['bbox']
+        _, _, (kinds, verts), _ = RULES[rule]
+
+        theta = math.radians(self.config['rotation'])
+        rotation = np.array([[math.cos(theta), math.sin(theta)], [-math.sin(theta), math.cos(theta)]])
+        verts = verts @ rotation * PLANE_SIZE
+
+        for level in range(self.depth + 1):
+            lo, hi = verts.min(axis=1), verts.max(axis=1)
+            hit = (hi[:, 0] >= x0) & (lo[:, 0] <= x1) & (hi[:, 1] >= y0) & (lo[:, 1] <= y1)
+            inside = (lo[:, 0] >= x0) & (hi[:, 0] <= x1) & (lo[:, 1] >= y0) & (hi[:, 1] <= y1)
+            kinds, verts, inside = kinds[hit], verts[hit], inside[hit]
+
+            remaining = self.depth - level
+            if remaining == 0:
+                if len(kinds):
+                    yield kinds, verts
+                return
+            if inside.any():
+                # Everything below these tiles is visible, so skip the culling
+                yield substitute(rule, kinds[inside], verts[inside], remaining)
+            kinds, verts = substitute(rule, kinds[~inside], verts[~inside], 1)
+
+    def iter_tiles(self) -> Iterator[Dict[str, Any]]:
+        """Visible tiles as {'kind', 'points'} dicts.
+
+        Penrose kinds tell thin (0) and thick (1) rhomb halves apart; pinwheel
+        has a single prototile, so its kind is the triangle's handedness.
+        """
+        pinwheel = self.config['rule'] == 'pinwheel'
+        for kinds, verts in self.iter_tile_arrays():
+            if pinwheel:
+                edges = verts[:, 1:] - verts[:, :1]
+                kinds = (edges[:, 0, 0] * edges[:, 1, 1] - edges[:, 0, 1] * edges[:, 1, 0] > 0).astype(np.int64)
+            for kind, points in zip(kinds.tolist(), verts.tolist()):
+                yield {'kind': kind, 'points': points}
+
+    def generate(self) -> Dict[str, Any]:
+        return {
+            'rule': self.config['rule'],
+            'depth': self.depth,
+            'bbox': list(self.config['bbox']),
+            'zoom': self.config['zoom'],
+            'tiles': self.iter_tiles()
+        }
+
+    @classmethod
+    def get_config_schema(cls) -> Dict[str, Any]:
+        """Return the configuration schema for this pattern."""
+        return {
+            "type": "object",
+            "properties": {
+                "rule": {
+                    "type": "string",
+                    "enum": list(RULES),
+                    "default": "penrose"
+                },
+                "bbox": {
+                    "type": "array",
+                    "items": {"type": "number"},
+                    "minItems": 4,
+                    "maxItems": 4,
+                    "default": [-400, -400, 400, 400]
+                },
+                "zoom": {
+                    "type": "number",
+                    "exclusiveMinimum": 0,
+                    "default": 1
+                },
+                "cell_size": {
+                    "type": "number",
+                    "minimum": 1,
+                    "default": 50
+                },
+                "rotation": {
+                    "type": "number",
+                    "default": 0
+                }
+            }
+        }
@@ -0,0 +1,293 @@
+"""Batched multi-vine growth engine.
+
+A ``VineGarden`` grows many vines at once. Instead of one ``VinePattern`` per
+vine, each paying Python overhead per segment, the growth tips of every vine
+live in shared NumPy frontier arrays and one ``grow_step`` advances all vines
+together with a handful of vectorized operations.
+
+The rules match ``VinePattern.grow_step``: each step every vine takes its
+oldest growth tip, adds one segment steered by ``adjust_growth_angle``, may
+add a leaf, a flower and a branch tip, and queues the continuation tip.
+Like ``VinePattern``, a garden is fully determined by its config, its seed
+and the number of steps taken, so it can be stored in the vine session store
+and replayed with ``VineReplayCache``.
+"""
+import random
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from blueprints.patterns.vine_pattern import (
+    FlowerType,
+    GrowthPattern,
+    LeafType,
+    adjust_growth_angle,
+    generate_leaf_shape,
+    initial_growth_angle,
+)
+
+GROWTH_PATTERNS = list(GrowthPattern)
+LEAF_TYPES = list(LeafType)
+FLOWER_TYPES = list(FlowerType)
+
+# Same odds as VinePattern.grow_step
+LEAF_PROBABILITY = 0.3
+FLOWER_PROBABILITY = 0.2
+BRANCH_PROBABILITY = 0.3
+
+# Leaf shapes scale linearly with size, so each type is computed once at unit size
+_UNIT_LEAF_SHAPES = [np.array(generate_leaf_shape(leaf_type, 1.0)) for leaf_type in LEAF_TYPES]
+
+
+def _hex_colors(colors: np.ndarray) -> List[str]:
+    return ['#{:02x}{:02x}{:02x}'.format(*c) for c in colors.tolist()]
+
+
+def _empty_tips():
+    return {
+        'pos': np.empty((0, 2)),
+        'angle': np.empty(0),
+        'depth': np.empty(0, dtype=np.int64),
+        'vine': np.empty(0, dtype=np.int64),
+        'order': np.empty(0, dtype=np.int64),
+    }
+
+
+class VineGarden:
+    """Grows many vines together over shared frontier arrays."""
+
+    pattern_type = "vine_garden"
+
+    def __init__(self, config: Dict[str, Any], seed: Optional[int] = None):
+        self.config = config
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = np.random.default_rng(self.seed)
+
+        vines = config['vines']
+        self.count = len(vines)
+        self.max_length = np.array([int(v.get('max_length', 10)) for v in vines], dtype=np.int64)
+        self.pattern_code = np.array(
+            [GROWTH_PATTERNS.index(GrowthPattern(v.get('growth_pattern', 'climbing'))) for v in vines],
+            dtype=np.int64
+        )
+
+        # Same ranges as ColorScheme.create_random_natural
+        self.vine_colors = self.rng.integers([40, 90, 40], [81, 131, 81], size=(self.count, 3))
+        self.leaf_colors = self.rng.integers([50, 120, 50], [101, 181, 101], size=(self.count, 3))
+        flower_choices = self.rng.integers(
+            [[200, 100, 150], [200, 200, 200], [180, 180, 0]],
+            [[256, 151, 201], [256, 256, 256], [221, 221, 51]],
+            size=(self.count, 3, 3)
+        )
+        self.flower_colors = flower_choices[np.arange(self.count), self.rng.integers(0, 3, self.count)]
+
+        self.tips = _empty_tips()
+        self.next_order = 0
+        self.segment_chunks: List[Dict[str, np.ndarray]] = []
+        self.leaf_chunks: List[Dict[str, np.ndarray]] = []
+        self.flower_chunks: List[Dict[str, np.ndarray]] = []
+        self.completed = False
+        self.steps = 0
+
+    def init_growth(self) -> None:
+        """Place one growth tip per vine at its start position."""
+        starts = np.array([v.get('start_pos', (0, 0)) for v in self.config['vines']], dtype=float)
+        angles = np.array([initial_growth_angle(p) for p in GROWTH_PATTERNS], dtype=float)
+        self.tips = {
+            'pos': starts.reshape(self.count, 2),
+            'angle': angles[self.pattern_code],
+            'depth': np.zeros(self.count, dtype=np.int64),
+            'vine': np.arange(self.count, dtype=np.int64),
+            'order': np.arange(self.count, dtype=np.int64),
+        }
+        self.next_order = self.count
+
+    @classmethod
+    def replay(cls, config: Dict[str, Any], seed: int, steps: int) -> 'VineGarden':
+        """Rebuild a garden by replaying `steps` growth steps from its seed."""
+        garden = cls(config, seed)
+        garden.init_growth()
+        for _ in range(steps):
+            garden.grow_step()
+        return garden
+
+    def grow_step(self) -> None:
+        """Advance every vine by one segment."""
+        self.steps += 1
+        tips = self.tips
+        empty = {'segments': None, 'leaves': None, 'flowers': None}
+        if len(tips['vine']) == 0:
+            self.completed = True
+            self._append_chunks(empty)
+            return
+
+        # Each vine pops its oldest tip, like growth_points.pop(0)
+        by_vine = np.lexsort((tips['order'], tips['vine']))
+        sorted_vines = tips['vine'][by_vine]
+        first = np.ones(len(by_vine), dtype=bool)
+        first[1:] = sorted_vines[1:] != sorted_vines[:-1]
+        taken = by_vine[first]
+        remaining = np.ones(len(tips['vine']), dtype=bool)
+        remaining[taken] = False
+
+        vine = tips['vine'][taken]
+        depth = tips['depth'][taken]
+        growing = depth < self.max_length[vine]
+        taken, vine, depth = taken[growing], vine[growing], depth[growing]
+        pos = tips['pos'][taken]
+        angle = tips['angle'][taken]
+        n = len(taken)
+
+        length = self.rng.uniform(10, 20, n)
+        variation = self.rng.uniform(-15, 15, n)
+        next_angle = np.empty(n)
+        codes = self.pattern_code[vine]
+        for code, growth_pattern in enumerate(GROWTH_PATTERNS):
+            mask = codes == code
+            if mask.any():
+                next_angle[mask] = adjust_growth_angle(angle[mask], depth[mask], growth_pattern, variation[mask])
+
+        radians = np.radians(next_angle)
+        end = pos + length[:, None] * np.column_stack((np.cos(radians), np.sin(radians)))
+
+        chunk = {
+            'segments': {
+                'start': pos,
+                'end': end,
+                'thickness': np.maximum(1, (self.max_length[vine] - depth) / 2),
+                'vine': vine,
+            }
+        }
+
+        leaf = self.rng.random(n) < LEAF_PROBABILITY
+        k = int(leaf.sum())
+        chunk['leaves'] = {
+            'pos': end[leaf],
+            'angle': next_angle[leaf] + self.rng.choice([-90, 90], k),
+            'size': self.rng.uniform(5, 15, k),
+            'type': self.rng.integers(0, len(LEAF_TYPES), k),
+            'vine': vine[leaf],
+        }
+
+        flower = self.rng.random(n) < FLOWER_PROBABILITY
+        k = int(flower.sum())
+        chunk['flowers'] = {
+            'pos': end[flower],
+            'size': self.rng.uniform(3, 8, k),
+            'type': self.rng.integers(0, len(FLOWER_TYPES), k),
+            'rotation': self.rng.uniform(0, 360, k),
+            'vine': vine[flower],
+        }
+
+        branch = (self.rng.random(n) < BRANCH_PROBABILITY) & (depth < self.max_length[vine] - 1)
+        branch_angle = next_angle[branch] + self.rng.uniform(-45, 45, int(branch.sum()))
+
+        # Branch tips are queued before the continuation tip, as in grow_step
+        order = self.next_order + 2 * np.arange(n)
+        self.next_order += 2 * n
+        self.tips = {
+            'pos': np.concatenate((tips['pos'][remaining], end[branch], end)),
+            'angle': np.concatenate((tips['angle'][remaining], branch_angle, next_angle)),
+            'depth': np.concatenate((tips['depth'][remaining], depth[branch] + 1, depth + 1)),
+            'vine': np.concatenate((tips['vine'][remaining], vine[branch], vine)),
+            'order': np.concatenate((tips['order'][remaining], order[branch], order + 1)),
+        }
+        self._append_chunks(chunk)
+
+    def _append_chunks(self, chunk: Dict[str, Optional[Dict[str, np.ndarray]]]) -> None:
+        self.segment_chunks.append(chunk['segments'])
+        self.leaf_chunks.append(chunk['leaves'])
+        self.flower_chunks.append(chunk['flowers'])
+
+    def vines_completed(self) -> np.ndarray:
+        """Boolean array telling which vines have no growth tips left."""
+        done = np.ones(self.count, dtype=bool)
+        done[self.tips['vine']] = False
+        return done
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Capture the mutable growth state so it can be restored later."""
+        return {
+            'steps': self.steps,
+            'completed': self.completed,
+            'tips': dict(self.tips),
+            'next_order': self.next_order,
+            'segment_chunks': list(self.segment_chunks),
+            'leaf_chunks': list(self.leaf_chunks),
+            'flower_chunks': list(self.flower_chunks),
+            'rng_state': self.rng.bit_generator.state,
+        }
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        """Restore a state captured by snapshot() on a garden with the same config and seed."""
+        self.steps = snapshot['steps']
+        self.completed = snapshot['completed']
+        self.tips = dict(snapshot['tips'])
+        self.next_order = snapshot['next_order']
+        self.segment_chunks = list(snapshot['segment_chunks'])
+        self.leaf_chunks = list(snapshot['leaf_chunks'])
+        self.flower_chunks = list(snapshot['flower_chunks'])
+        self.rng.bit_generator.state = snapshot['rng_state']
+
+    def get_state(self, since: int = 0) -> Dict[str, Any]:
+        """Elements added after step `since`, in the vine endpoints' format.
+
+        The element lists are generators, so a streamed response encodes
+        them straight from the chunk arrays. The chunks are picked here, so
+        steps the garden grows after this call are not included.
+        """
+        return {
+            'segments': self._iter_segments(self.segment_chunks[since:self.steps]),
+            'leaves': self._iter_leaves(self.leaf_chunks[since:self.steps]),
+            'flowers': self._iter_flowers(self.flower_chunks[since:self.steps])
+        }
+
+    def _iter_segments(self, chunks: List[Optional[Dict[str, np.ndarray]]]):
+        vine_hex = _hex_colors(self.vine_colors)
+        for chunk in chunks:
+            if chunk is None:
+                continue
+            for start, end, thickness, vine in zip(chunk['start'].tolist(), chunk['end'].tolist(),
+                                                   chunk['thickness'].tolist(), chunk['vine'].tolist()):
+                yield {
+                    'start': start,
+                    'end': end,
+                    'thickness': thickness,
+                    'color': vine_hex[vine],
+                    'vine': vine
+                }
+
+    def _iter_leaves(self, chunks: List[Optional[Dict[str, np.ndarray]]]):
+        leaf_hex = _hex_colors(self.leaf_colors)
+        for chunk in chunks:
+            if chunk is None:
+                continue
+            for pos, angle, size, leaf_type, vine in zip(chunk['pos'].tolist(), chunk['angle'].tolist(),
+                                                         chunk['size'].tolist(), chunk['type'].tolist(),
+                                                         chunk['vine'].tolist()):
+                yield {
+                    'pos': pos,
+                    'angle': angle,
+                    'size': size,
+                    'type': LEAF_TYPES[leaf_type].value,
+                    'color': leaf_hex[vine],
+                    'shape': _UNIT_LEAF_SHAPES[leaf_type] * size,
+                    'vine': vine
+                }
+
+    def _iter_flowers(self, chunks: List[Optional[Dict[str, np.ndarray]]]):
+        flower_hex = _hex_colors(self.flower_colors)
+        for chunk in chunks:
+            if chunk is None:
+                continue
+            for pos, size, flower_type, rotation, vine in zip(chunk['pos'].tolist(), chunk['size'].tolist(),
+                                                              chunk['type'].tolist(), chunk['rotation'].tolist(),
+                                                              chunk['vine'].tolist()):
+                yield {
+                    'pos': pos,
+                    'size': size,
+                    'type': FLOWER_TYPES[flower_type].value,
+                    'color': flower_hex[vine],
+                    'rotation': rotation,
+                    'vine': vine
+                }
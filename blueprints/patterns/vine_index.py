@@ -0,0 +1,138 @@
+"""Grid index over a vine's segments, leaves and flowers, for viewport queries.
+
+A vine only ever appends elements while it grows, so the index keeps a
+count per element list and ``update`` indexes just the new tail: each
+element's bounding box is stored and the element is filed under every grid
+cell the box touches. ``query`` visits the cells under a viewport, so its
+cost follows what is on screen rather than the size of the vine.
+
+``merge_segments`` is the level of detail for zoomed-out views: chains of
+segments that would be shorter than a few pixels on screen are replaced by
+one straight segment per chain piece.
+"""
+import math
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+CELL_SIZE = 64.0
+KINDS = ('segments', 'leaves', 'flowers')
+# Leaf outlines reach up to 2 leaf sizes from the stem (the SIMPLE tip and the HEART lobe)
+LEAF_REACH = 2.0
+
+BBox = Tuple[float, float, float, float]
+
+
+class _Boxes:
+    """An append-only (n, 4) array of bounding boxes."""
+
+    def __init__(self):
+        self._data = np.empty((64, 4))
+        self.count = 0
+
+    def append(self, box: BBox) -> None:
+        if self.count == len(self._data):
+            self._data = np.concatenate((self._data, np.empty_like(self._data)))
+        self._data[self.count] = box
+        self.count += 1
+
+    def view(self, count: int) -> np.ndarray:
+        return self._data[:count]
+
+
+def element_bbox(kind: str, element: Dict[str, Any]) -> BBox:
+    """World-space bounding box of a raw VinePattern element."""
+    if kind == 'segments':
+        (x0, y0), (x1, y1) = element['start'], element['end']
+        half = element['thickness'] / 2
+        return (min(x0, x1) - half, min(y0, y1) - half, max(x0, x1) + half, max(y0, y1) + half)
+    x, y = element['pos']
+    reach = element['size'] * (LEAF_REACH if kind == 'leaves' else 1)
+    return (x - reach, y - reach, x + reach, y + reach)
+
+
+class VineIndex:
+    """Uniform grid of `cell_size` world units over a vine's elements."""
+
+    def __init__(self, cell_size: float = CELL_SIZE):
+        self.cell_size = cell_size
+        self.boxes = {kind: _Boxes() for kind in KINDS}
+        # (column, row) -> kind -> indices of the elements touching the cell
+        self.cells: Dict[Tuple[int, int], Dict[str, List[int]]] = {}
+
+    def update(self, pattern: Any) -> None:
+        """Index the elements `pattern` has gained since the last update."""
+        for kind in KINDS:
+            elements = getattr(pattern, kind)
+            boxes = self.boxes[kind]
+            for i in range(boxes.count, len(elements)):
+                box = element_bbox(kind, elements[i])
+                boxes.append(box)
+                for cell in self._cells(box):
+                    self.cells.setdefault(cell, {}).setdefault(kind, []).append(i)
+
+    def _range(self, box: BBox) -> Tuple[int, int, int, int]:
+        x0, y0, x1, y1 = box
+        size = self.cell_size
+        return math.floor(x0 / size), math.floor(y0 / size), math.floor(x1 / size), math.floor(y1 / size)
+
+    def _cells(self, box: BBox) -> Iterable[Tuple[int, int]]:
+        c0, r0, c1, r1 = self._range(box)
+        return ((c, r) for c in range(c0, c1 + 1) for r in range(r0, r1 + 1))
+
+    def query(self, box: BBox) -> Dict[str, np.ndarray]:
+        """Indices, in drawing order, of the elements whose bounding boxes meet `box`."""
+        counts = {kind: self.boxes[kind].count for kind in KINDS}
+        c0, r0, c1, r1 = self._range(box)
+        if (c1 - c0 + 1) * (r1 - r0 + 1) <= len(self.cells):
+            cells = (self.cells.get((c, r)) for c in range(c0, c1 + 1) for r in range(r0, r1 + 1))
+        else:
+            # A viewport larger than the vine: walk the occupied cells instead
+            cells = (entries for (c, r), entries in list(self.cells.items()) if c0 <= c <= c1 and r0 <= r <= r1)
+
+        candidates: Dict[str, List[int]] = {kind: [] for kind in KINDS}
+        for entries in cells:
+            if entries:
+                for kind, indices in entries.items():
+                    candidates[kind].extend(indices)
+
+        x0, y0, x1, y1 = box
+        visible = {}
+        for kind in KINDS:
+            # Elements indexed by a concurrent grow step after the counts were taken are left out
+            indices = np.unique(np.array(candidates[kind], dtype=np.int64))
+            indices = indices[indices < counts[kind]]
+            boxes = self.boxes[kind].view(counts[kind])[indices]
+            hit = (boxes[:, 0] <= x1) & (boxes[:, 2] >= x0) & (boxes[:, 1] <= y1) & (boxes[:, 3] >= y0)
+            visible[kind] = indices[hit]
+        return visible
+
+
+def merge_segments(segments: Sequence[Dict[str, Any]], indices: Iterable[int], min_length: float) -> List[Dict[str, Any]]:
+    """Join chains of short segments into segments at least `min_length` long.
+
+    A segment continues the chain of the segment that ends where it starts,
+    if that chain is still shorter than `min_length`; at a branch only the
+    first child continues the chain. A merged segment runs straight from
+    the start of its first piece to the end of its last and keeps the
+    greatest thickness.
+    """
+    merged: List[Dict[str, Any]] = []
+    open_chains: Dict[Tuple[float, float], int] = {}  # end point -> index into merged
+    lengths: List[float] = []
+    for i in indices:
+        segment = segments[i]
+        start, end = tuple(segment['start']), tuple(segment['end'])
+        length = math.hypot(end[0] - start[0], end[1] - start[1])
+        chain = open_chains.pop(start, None)
+        if chain is not None and lengths[chain] < min_length:
+            previous = merged[chain]
+            merged[chain] = dict(previous, end=segment['end'],
+                                 thickness=max(previous['thickness'], segment['thickness']))
+            lengths[chain] += length
+        else:
+            chain = len(merged)
+            merged.append(dict(segment))
+            lengths.append(length)
+        open_chains[end] = chain
+    return merged
@@ -5,6 +5,7 @@ from datetime import datetime
 import random
 import math
 from blueprints.core.pattern import Pattern
+from blueprints.patterns.vine_index import VineIndex
 from blueprints.utils.vector import Vector2
 
 class Season(Enum):
@@ -49,22 +50,110 @@ class ColorScheme:
     flower_color: Tuple[int, int, int]
     
     @classmethod
-    def create_random_natural(cls):
-        vine_green = (random.randint(40, 80), random.randint(90, 130), random.randint(40, 80))
-        leaf_green = (random.randint(50, 100), random.randint(120, 180), random.randint(50, 100))
+    def create_random_natural(cls, rng=random):
+        vine_green = (rng.randint(40, 80), rng.randint(90, 130), rng.randint(40, 80))
+        leaf_green = (rng.randint(50, 100), rng.randint(120, 180), rng.randint(50, 100))
         flower_colors = [
-            (random.randint(200, 255), random.randint(100, 150), random.randint(150, 200)),  # Pink
-            (random.randint(200, 255), random.randint(200, 255), random.randint(200, 255)),  # White
-            (random.randint(180, 220), random.randint(180, 220), random.randint(0, 50)),     # Yellow
+            (rng.randint(200, 255), rng.randint(100, 150), rng.randint(150, 200)),  # Pink
+            (rng.randint(200, 255), rng.randint(200, 255), rng.randint(200, 255)),  # White
+            (rng.randint(180, 220), rng.randint(180, 220), rng.randint(0, 50)),     # Yellow
         ]
-        return cls(vine_green, leaf_green, random.choice(flower_colors))
+        return cls(vine_green, leaf_green, rng.choice(flower_colors))
+
+def generate_leaf_shape(leaf_type: LeafType, size: float) -> List[Tuple[float, float]]:
+    """Generate points for different leaf shapes.
+
+    Every shape scales linearly with `size`.
+    """
+    points = []
+    match leaf_type:
+        case LeafType.SIMPLE:
+            points = [
+                (0, 0),
+                (size, -size/2),
+                (size*2, 0),
+                (size, size/2)
+            ]
+        case LeafType.HEART:
+            num_points = 12
+            for i in range(num_points):
+                angle = (i * 2 * math.pi / num_points)
+                r = size * (1 + math.sin(angle))
+                x = r * math.cos(angle)
+                y = r * math.sin(angle)
+                points.append((x, y))
+        case LeafType.MAPLE:
+            # Generate maple leaf points
+            angles = [0, 72, 144, 216, 288]
+            for angle in angles:
+                rad = math.radians(angle)
+                points.extend([
+                    (size * math.cos(rad), size * math.sin(rad)),
+                    (size * 0.5 * math.cos(rad + math.radians(36)),
+                     size * 0.5 * math.sin(rad + math.radians(36)))
+                ])
+        case LeafType.COMPOUND:
+            # Generate compound leaf with multiple leaflets
+            num_leaflets = 5
+            for i in range(num_leaflets):
+                offset = (i - num_leaflets//2) * size/3
+                points.extend([
+                    (offset, 0),
+                    (offset + size/2, -size/4),
+                    (offset + size, 0),
+                    (offset + size/2, size/4)
+                ])
+    return points
+
+def initial_growth_angle(growth_pattern: GrowthPattern) -> float:
+    """Starting angle for a new vine with the given growth pattern."""
+    match growth_pattern:
+        case GrowthPattern.CLIMBING:
+            return 270  # Start growing upward
+        case GrowthPattern.HANGING:
+            return 90   # Start growing downward
+        case GrowthPattern.SPREADING:
+            return 0    # Start growing to the right
+        case GrowthPattern.SPIRAL:
+            return 0    # Start horizontally for spiral
+        case _:
+            return 270  # Default to upward growth
+
+def adjust_growth_angle(current_angle, depth, growth_pattern: GrowthPattern, base_variation):
+    """Adjust the growth angle based on the growth pattern.
+
+    Works element-wise on NumPy arrays as well as on plain numbers, so the
+    same rules drive single vines and the batched garden engine.
+    """
+    match growth_pattern:
+        case GrowthPattern.CLIMBING:
+            # Tend upward (270 degrees is up in SVG)
+            target_angle = 270
+            return current_angle + (target_angle - current_angle) * 0.1 + base_variation * 0.5
+
+        case GrowthPattern.HANGING:
+            # Tend downward (90 degrees is down in SVG)
+            target_angle = 90
+            return current_angle + (target_angle - current_angle) * 0.1 + base_variation * 0.5
+
+        case GrowthPattern.SPREADING:
+            # Alternate between left and right growth
+            spread_angle = (depth % 2) * 180 - 90  # Alternates between -90 and 90
+            return current_angle + (spread_angle - current_angle) * 0.1 + base_variation
+
+        case GrowthPattern.SPIRAL:
+            # Create continuous rotation
+            return current_angle + 15 + base_variation * 0.3
+
+        case _:
+            return current_angle + base_variation
 
 class VinePattern(Pattern):
     """Blueprint for generating organic vine growth patterns."""
     
     pattern_type = "vine"
     
-    def __init__(self, config: Optional[Dict[str, Any]] = None):
+    def __init__(self, config: Optional[Dict[str, Any]] = None, seed: Optional[int] = None):
         super().__init__(config)
         self.config = {
             'max_length': 10,
@@ -75,12 +164,19 @@ class VinePattern(Pattern):
         if config:
             self.config.update(config)
         
+        # Every random draw comes from this stream, so a vine is fully
+        # determined by its config, its seed and the number of steps taken
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+
         self.segments = []
         self.leaves = []
         self.flowers = []
-        self.colors = ColorScheme.create_random_natural()
+        self.colors = ColorScheme.create_random_natural(self.rng)
         self.growth_points = []  # Stack of points to grow from
         self.completed = False
+        self.steps = 0  # Number of grow_step calls so far
+        self.index = VineIndex()  # Grid of the elements above, for viewport queries
 
     def init_growth(self, start_pos: Tuple[float, float]):
         """Initialize the growth point with appropriate starting angle"""
@@ -90,23 +186,14 @@ class VinePattern(Pattern):
         if isinstance(growth_pattern, str):
             growth_pattern = GrowthPattern(growth_pattern)
         
-        match growth_pattern:
-            case GrowthPattern.CLIMBING:
-                initial_angle = 270  # Start growing upward
-            case GrowthPattern.HANGING:
-                initial_angle = 90   # Start growing downward
-            case GrowthPattern.SPREADING:
-                initial_angle = 0    # Start growing to the right
-            case GrowthPattern.SPIRAL:
-                initial_angle = 0    # Start horizontally for spiral
-            case _:
-                initial_angle = 270  # Default to upward growth
+        initial_angle = initial_growth_angle(growth_pattern)
         
         self.growth_points = [(start_pos, initial_angle, 0)]  # (pos, angle, depth)
         return self.get_current_state()
 
     def grow_step(self):
         """Perform one growth step"""
+        self.steps += 1
         if not self.growth_points or self.completed:
             self.completed = True
             return self.get_current_state()
@@ -117,7 +204,7 @@ class VinePattern(Pattern):
             return self.get_current_state()
 
         # Generate new segment
-        length = random.uniform(10, 20)
+        length = self.rng.uniform(10, 20)
         next_angle = self._adjust_growth_angle(angle, depth)
         
         end_x = pos[0] + length * math.cos(math.radians(next_angle))
@@ -133,23 +220,57 @@ class VinePattern(Pattern):
         })
 
         # Randomly add leaf
-        if random.random() < 0.3:
+        if self.rng.random() < 0.3:
             self._add_leaf(end_pos, next_angle)
 
         # Randomly add flower
-        if random.random() < 0.2:
+        if self.rng.random() < 0.2:
             self._add_flower(end_pos)
 
         # Add branching points
-        if random.random() < 0.3 and depth < self.config['max_length'] - 1:
-            branch_angle = next_angle + random.uniform(-45, 45)
+        if self.rng.random() < 0.3 and depth < self.config['max_length'] - 1:
+            branch_angle = next_angle + self.rng.uniform(-45, 45)
             self.growth_points.append((end_pos, branch_angle, depth + 1))
 
         # Continue main growth
         self.growth_points.append((end_pos, next_angle, depth + 1))
+        self.index.update(self)
         
         return self.get_current_state()
 
+    @classmethod
+    def replay(cls, config: Dict[str, Any], seed: int, steps: int) -> 'VinePattern':
+        """Rebuild a vine by replaying `steps` growth steps from its seed"""
+        pattern = cls(config, seed)
+        pattern.init_growth(pattern.config['start_pos'])
+        for _ in range(steps):
+            pattern.grow_step()
+        return pattern
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Capture the mutable growth state so it can be restored later"""
+        return {
+            'steps': self.steps,
+            'completed': self.completed,
+            'segments': list(self.segments),
+            'leaves': list(self.leaves),
+            'flowers': list(self.flowers),
+            'growth_points': list(self.growth_points),
+            'rng_state': self.rng.getstate()
+        }
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        """Restore a state captured by snapshot() on a vine with the same config and seed"""
+        self.steps = snapshot['steps']
+        self.completed = snapshot['completed']
+        self.segments = list(snapshot['segments'])
+        self.leaves = list(snapshot['leaves'])
+        self.flowers = list(snapshot['flowers'])
+        self.growth_points = list(snapshot['growth_points'])
+        self.rng.setstate(snapshot['rng_state'])
+        self.index = VineIndex()
+        self.index.update(self)
+
     def get_current_state(self):
         """Get the current state of the pattern"""
         return {
@@ -176,7 +297,7 @@ class VinePattern(Pattern):
             return
             
         if length is None:
-            length = random.uniform(10, 20)
+            length = self.rng.uniform(10, 20)
             
         # Calculate end position with obstacle avoidance
         end_x = start_pos[0] + length * math.cos(math.radians(angle))
@@ -186,7 +307,7 @@ class VinePattern(Pattern):
         # If endpoint collides with obstacle, try adjusting angle
         if self.check_collision(end_pos):
             for _ in range(8):  # Try 8 different angles
-                test_angle = angle + random.uniform(-45, 45)
+                test_angle = angle + self.rng.uniform(-45, 45)
                 test_x = start_pos[0] + length * math.cos(math.radians(test_angle))
                 test_y = start_pos[1] + length * math.sin(math.radians(test_angle))
                 if not self.check_collision((test_x, test_y)):
@@ -205,10 +326,10 @@ class VinePattern(Pattern):
         })
 
         # Add leaf with random type
-        if random.random() < self.config['leaf_probability']:
-            leaf_type = random.choice(list(LeafType))
-            leaf_angle = angle + random.choice([-90, 90])
-            leaf_size = random.uniform(5, 15)
+        if self.rng.random() < self.config['leaf_probability']:
+            leaf_type = self.rng.choice(list(LeafType))
+            leaf_angle = angle + self.rng.choice([-90, 90])
+            leaf_size = self.rng.uniform(5, 15)
             self.leaves.append({
                 'pos': end_pos,
                 'angle': leaf_angle,
@@ -219,105 +340,46 @@ class VinePattern(Pattern):
             })
 
         # Add flower
-        if random.random() < self.config['flower_probability']:
-            flower_type = random.choice(list(FlowerType))
+        if self.rng.random() < self.config['flower_probability']:
+            flower_type = self.rng.choice(list(FlowerType))
             self._generate_flower(end_pos, flower_type)
 
         # Branch generation with varying patterns
-        if random.random() < self.config['branch_probability'] and depth < self.config['max_length'] - 1:
-            num_branches = random.randint(1, 2)
+        if self.rng.random() < self.config['branch_probability'] and depth < self.config['max_length'] - 1:
+            num_branches = self.rng.randint(1, 2)
             for _ in range(num_branches):
-                branch_angle = angle + random.uniform(-45, 45)
+                branch_angle = angle + self.rng.uniform(-45, 45)
                 self._generate_segment(end_pos, branch_angle, depth + 1, length * 0.8)
         
         # Continue main vine with adjusted angle based on growth pattern
         next_angle = self._adjust_growth_angle(angle, depth)
-        next_length = length * random.uniform(0.8, 1.0)
+        next_length = length * self.rng.uniform(0.8, 1.0)
         self._generate_segment(end_pos, next_angle, depth + 1, next_length)
 
     def _generate_leaf_shape(self, leaf_type: LeafType, size: float) -> List[Tuple[float, float]]:
         """Generate points for different leaf shapes."""
-        points = []
-        match leaf_type:
-            case LeafType.SIMPLE:
-                points = [
-                    (0, 0),
-                    (size, -size/2),
-                    (size*2, 0),
-                    (size, size/2)
-                ]
-            case LeafType.HEART:
-                num_points = 12
-                for i in range(num_points):
-                    angle = (i * 2 * math.pi / num_points)
-                    r = size * (1 + math.sin(angle))
-                    x = r * math.cos(angle)
-                    y = r * math.sin(angle)
-                    points.append((x, y))
-            case LeafType.MAPLE:
-                # Generate maple leaf points
-                angles = [0, 72, 144, 216, 288]
-                for angle in angles:
-                    rad = math.radians(angle)
-                    points.extend([
-                        (size * math.cos(rad), size * math.sin(rad)),
-                        (size * 0.5 * math.cos(rad + math.radians(36)),
-                         size * 0.5 * math.sin(rad + math.radians(36)))
-                    ])
-            case LeafType.COMPOUND:
-                # Generate compound leaf with multiple leaflets
-                num_leaflets = 5
-                for i in range(num_leaflets):
-                    offset = (i - num_leaflets//2) * size/3
-                    points.extend([
-                        (offset, 0),
-                        (offset + size/2, -size/4),
-                        (offset + size, 0),
-                        (offset + size/2, size/4)
-                    ])
-        return points
+        return generate_leaf_shape(leaf_type, size)
 
     def _generate_flower(self, pos: Tuple[float, float], flower_type: FlowerType) -> None:
         """Generate a flower at the specified position."""
-        size = random.uniform(3, 8)
+        size = self.rng.uniform(3, 8)
         self.flowers.append({
             'pos': pos,
             'size': size,
             'type': flower_type,
             'color': self.colors.flower_color,
-            'rotation': random.uniform(0, 360)
+            'rotation': self.rng.uniform(0, 360)
         })
 
     def _adjust_growth_angle(self, current_angle: float, depth: int) -> float:
         """Adjust the growth angle based on the growth pattern."""
-        base_variation = random.uniform(-15, 15)
+        base_variation = self.rng.uniform(-15, 15)
         growth_pattern = self.config['growth_pattern']
         
         if isinstance(growth_pattern, str):
             growth_pattern = GrowthPattern(growth_pattern)
         
-        match growth_pattern:
-            case GrowthPattern.CLIMBING:
-                # Tend upward (270 degrees is up in SVG)
-                target_angle = 270
-                return current_angle + (target_angle - current_angle) * 0.1 + base_variation * 0.5
-                
-            case GrowthPattern.HANGING:
-                # Tend downward (90 degrees is down in SVG)
-                target_angle = 90
-                return current_angle + (target_angle - current_angle) * 0.1 + base_variation * 0.5
-                
-            case GrowthPattern.SPREADING:
-                # Alternate between left and right growth
-                spread_angle = (depth % 2) * 180 - 90  # Alternates between -90 and 90
-                return current_angle + (spread_angle - current_angle) * 0.1 + base_variation
-                
-            case GrowthPattern.SPIRAL:
-                # Create continuous rotation
-                return current_angle + 15 + base_variation * 0.3
-                
-            case _:
-                return current_angle + base_variation
+        return adjust_growth_angle(current_angle, depth, growth_pattern, base_variation)
 
     @classmethod
     def get_config_schema(cls) -> Dict[str, Any]:
@@ -365,9 +427,9 @@ class VinePattern(Pattern):
 
     def _add_leaf(self, pos: Tuple[float, float], angle: float) -> None:
         """Add a leaf at the specified position"""
-        leaf_type = random.choice(list(LeafType))
-        leaf_angle = angle + random.choice([-90, 90])
-        leaf_size = random.uniform(5, 15)
+        leaf_type = self.rng.choice(list(LeafType))
+        leaf_angle = angle + self.rng.choice([-90, 90])
+        leaf_size = self.rng.uniform(5, 15)
         
         self.leaves.append({
             'pos': pos,
@@ -380,13 +442,13 @@ class VinePattern(Pattern):
 
     def _add_flower(self, pos: Tuple[float, float]) -> None:
         """Add a flower at the specified position"""
-        flower_type = random.choice(list(FlowerType))
-        flower_size = random.uniform(3, 8)
+        flower_type = self.rng.choice(list(FlowerType))
+        flower_size = self.rng.uniform(3, 8)
         
         self.flowers.append({
             'pos': pos,
             'size': flower_size,
             'type': flower_type,
             'color': self.colors.flower_color,
-            'rotation': random.uniform(0, 360)
+            'rotation': self.rng.uniform(0, 360)
         })
\ No newline at end of file
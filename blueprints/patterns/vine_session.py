@@ -0,0 +1,259 @@
+"""Event-sourced vine sessions.
+
+A vine is fully determined by its config, its seed and the number of growth
+steps taken, so a session is stored as just those three values. The full
+segment/leaf/flower state is rebuilt on demand by replaying
+``VinePattern.grow_step``; a per-process cache keeps the live vine plus
+periodic snapshot checkpoints so that replay time stays bounded. Each
+snapshot copies the element lists, so a session keeps at most
+``max_checkpoints`` of them: once there are more, every other one is dropped
+and the session's checkpoints are spaced twice as far apart.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from blueprints.patterns.vine_garden import VineGarden
+from blueprints.patterns.vine_pattern import VinePattern
+
+_SESSION_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+
+
+@dataclass
+class VineSession:
+    config: Dict[str, Any]
+    seed: int
+    step: int = 0
+    kind: str = 'vine'  # 'vine' or 'garden'
+    expires: Optional[float] = None  # time.time() after which the stores forget the session
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {'config': self.config, 'seed': self.seed, 'step': self.step, 'kind': self.kind}
+        if self.expires is not None:
+            data['expires'] = self.expires
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'VineSession':
+        config = dict(data['config'])
+        if 'start_pos' in config:
+            config['start_pos'] = tuple(config['start_pos'])
+        return cls(config, int(data['seed']), int(data['step']), data.get('kind', 'vine'), data.get('expires'))
+
+    def expired(self) -> bool:
+        return self.expires is not None and time.time() >= self.expires
+
+
+class _SessionStore:
+    """Shared expiry handling of the stores.
+
+    `session_cls` is anything with ``to_dict``, ``from_dict`` and ``expired``.
+    An expired session is deleted when it is next read, and at most every
+    `sweep_interval` seconds a put also deletes the expired sessions that
+    nobody reads any more.
+    """
+
+    def __init__(self, session_cls=VineSession, sweep_interval: float = 60.0):
+        self.session_cls = session_cls
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def _session_ids(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def get(self, session_id: str):
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def sweep(self) -> None:
+        """Delete every expired session."""
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        for session_id in list(self._session_ids()):
+            self.get(session_id)
+
+    def _maybe_sweep(self) -> None:
+        if time.monotonic() >= self._next_sweep:
+            self.sweep()
+
+
+class MemoryVineSessionStore(_SessionStore):
+    """Keeps sessions in this process only."""
+
+    def __init__(self, session_cls=VineSession, sweep_interval: float = 60.0):
+        super().__init__(session_cls, sweep_interval)
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+
+    def _session_ids(self) -> Iterable[str]:
+        return self._sessions.keys()
+
+    def get(self, session_id: str):
+        data = self._sessions.get(session_id)
+        session = self.session_cls.from_dict(data) if data else None
+        if session is not None and session.expired():
+            self.delete(session_id)
+            return None
+        return session
+
+    def put(self, session_id: str, session) -> None:
+        self._sessions[session_id] = session.to_dict()
+        self._maybe_sweep()
+
+    def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+
+class FileVineSessionStore(_SessionStore):
+    """Keeps each session as a small JSON file, shared by every worker using the directory."""
+
+    def __init__(self, directory: str, session_cls=VineSession, sweep_interval: float = 60.0):
+        super().__init__(session_cls, sweep_interval)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _session_ids(self) -> Iterable[str]:
+        return [name[:-len('.json')] for name in os.listdir(self.directory) if name.endswith('.json')]
+
+    def _path(self, session_id: str) -> Optional[str]:
+        if not _SESSION_ID.match(session_id):
+            return None
+        return os.path.join(self.directory, session_id + '.json')
+
+    def get(self, session_id: str):
+        path = self._path(session_id)
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                session = self.session_cls.from_dict(json.load(f))
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        if session.expired():
+            self.delete(session_id)
+            return None
+        return session
+
+    def put(self, session_id: str, session) -> None:
+        path = self._path(session_id)
+        if path is None:
+            raise ValueError(f'Invalid session id: {session_id!r}')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(session.to_dict(), f)
+        os.replace(tmp_path, path)
+        self._maybe_sweep()
+
+    def delete(self, session_id: str) -> None:
+        path = self._path(session_id)
+        if path is None:
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@dataclass
+class _CacheEntry:
+    seed: int
+    interval: int
+    pattern: Optional[VinePattern] = None
+    checkpoints: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    # Held while replaying, so a long jump only blocks polls of the same session
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add_checkpoint(self, pattern, max_checkpoints: int) -> None:
+        if pattern.steps % self.interval or pattern.steps in self.checkpoints:
+            return
+        self.checkpoints[pattern.steps] = pattern.snapshot()
+        while len(self.checkpoints) > max_checkpoints:
+            self.interval *= 2
+            self.checkpoints = {step: snapshot for step, snapshot in self.checkpoints.items() if step % self.interval == 0}
+
+
+class VineReplayCache:
+    """Per-process cache of materialized vines and their snapshot checkpoints.
+
+    Sequential polls only advance the cached vine by one step. A request for
+    an earlier step (or a vine last touched by another worker) restarts from
+    the nearest checkpoint instead of from the seed.
+
+    `pattern_cls` is anything with the VinePattern replay protocol:
+    ``replay``, ``steps``, ``grow_step``, ``snapshot`` and ``restore``.
+    """
+
+    def __init__(self, checkpoint_interval: int = 32, max_sessions: int = 256, pattern_cls=VinePattern,
+                 max_checkpoints: int = 64):
+        self.pattern_cls = pattern_cls
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        self.max_sessions = max_sessions
+        self.max_checkpoints = max(1, max_checkpoints)
+        self._entries: 'OrderedDict[str, _CacheEntry]' = OrderedDict()
+        # Guards only _entries; replay happens under the entry's own lock
+        self._lock = threading.Lock()
+
+    def materialize(self, session_id: str, session: VineSession, read: Optional[Callable[[Any], Any]] = None):
+        """Return the vine for `session` advanced to exactly `session.step` steps.
+
+        Replay stops once the vine completes, and `session.step` is then
+        lowered to the step it completed at.
+
+        The vine stays cached and a later request may advance it, so a caller
+        that reads it after returning can see more steps than it asked for.
+        When `read` is given it is called with the vine while the session is
+        still locked, and its result is returned instead.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry.seed != session.seed:
+                entry = _CacheEntry(session.seed, self.checkpoint_interval)
+                self._entries[session_id] = entry
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+        with entry.lock:
+            pattern = self._materialize(entry, session)
+            return read(pattern) if read else pattern
+
+    def _materialize(self, entry: _CacheEntry, session: VineSession):
+        pattern = entry.pattern
+        if pattern is None or pattern.steps > session.step:
+            pattern = self.pattern_cls.replay(session.config, session.seed, 0)
+            base = max((s for s in entry.checkpoints if s <= session.step), default=None)
+            if base is not None:
+                pattern.restore(entry.checkpoints[base])
+
+        while pattern.steps < session.step and not pattern.completed:
+            pattern.grow_step()
+            entry.add_checkpoint(pattern, self.max_checkpoints)
+
+        session.step = min(session.step, pattern.steps)
+        entry.pattern = pattern
+        return pattern
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+
+def init_app(app) -> None:
+    """Create the session store and replay caches for `app`.
+
+    Sessions live in ``VINE_SESSION_DIR`` when it is set, so that every
+    worker (and restarts) can serve any vine; otherwise they are kept in
+    process memory.
+    """
+    directory = app.config.get('VINE_SESSION_DIR')
+    store = FileVineSessionStore(directory) if directory else MemoryVineSessionStore()
+    app.extensions['vine_sessions'] = store
+    checkpoint_interval = app.config.get('VINE_CHECKPOINT_INTERVAL', 32)
+    max_checkpoints = app.config.get('VINE_MAX_CHECKPOINTS', 64)
+    app.extensions['vine_replay_cache'] = VineReplayCache(checkpoint_interval, max_checkpoints=max_checkpoints)
+    app.extensions['garden_replay_cache'] = VineReplayCache(checkpoint_interval, pattern_cls=VineGarden,
+                                                            max_checkpoints=max_checkpoints)
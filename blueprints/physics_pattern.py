@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template
+from flask import Blueprint
+from blueprints.core.assets import render_page
 
 physics_pattern_bp = Blueprint('physics_pattern', __name__)
 
 @physics_pattern_bp.route('/')
 def physics_pattern_index():
-    return render_template('physics_pattern/index.html') 
\ No newline at end of file
+    return render_page('physics_pattern/index.html') 
\ No newline at end of file
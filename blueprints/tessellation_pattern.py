@@ -1,22 +1,98 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 import math
 import random
+from blueprints.core import pattern_store, raster
+from blueprints.core.json_stream import stream_json
+from blueprints.core.assets import render_page
+from blueprints.core.scheduler import scheduled
+from blueprints.patterns.substitution_tiling import MAX_TILES, SubstitutionTiling
 
 tessellation_pattern_bp = Blueprint('tessellation_pattern', __name__)
 
+# Substitution tilings, generated for a viewport (?bbox=x0,y0,x1,y1&zoom=...)
+APERIODIC_TYPES = ('penrose', 'pinwheel')
+DEFAULT_BBOX = '-400,-400,400,400'
+
 @tessellation_pattern_bp.route('/')
 def tessellation_pattern_index():
-    return render_template('tessellation_pattern/index.html')
+    return render_page('tessellation_pattern/index.html')
+
+def _parse_bbox(value):
+    x0, y0, x1, y1 = (float(v) for v in value.split(','))
+    return (x0, y0, x1, y1)
+
+def _estimated_cost():
+    # Aperiodic tilings cost about one unit per thousand visible tiles. Invalid
+    # parameters raise ValueError, which the scheduler charges as 1; the view answers 400
+    params = _pattern_params()
+    if params['pattern_type'] not in APERIODIC_TYPES:
+        return 1
+    x0, y0, x1, y1 = params['bbox']
+    tiles = (x1 - x0) * (y1 - y0) * params['zoom'] ** 2 / params['cell_size'] ** 2
+    return max(1, min(tiles, MAX_TILES) / 1000)
+
+def _positive(name, default):
+    value = float(request.args.get(name, default))
+    if not (math.isfinite(value) and value > 0):
+        raise ValueError(f'{name} must be positive')
+    return value
+
+def _pattern_params():
+    params = {
+        'pattern_type': request.args.get('pattern', 'triangular'),
+        'cell_size': _positive('cellSize', 50),
+        'rotation': float(request.args.get('rotation', 0)),
+        'offset': float(request.args.get('offset', 0)),
+        'color_scheme': request.args.get('colorScheme', 'monochromatic')
+    }
+    if params['pattern_type'] in APERIODIC_TYPES:
+        try:
+            params['bbox'] = _parse_bbox(request.args.get('bbox', DEFAULT_BBOX))
+        except ValueError:
+            raise ValueError('bbox must be x0,y0,x1,y1')
+        params['zoom'] = _positive('zoom', 1)
+    return params
 
 @tessellation_pattern_bp.route('/generate')
+@scheduled('bulk', cost=_estimated_cost)
 def generate_pattern():
-    # Get parameters from request
-    pattern_type = request.args.get('pattern', 'triangular')
-    cell_size = float(request.args.get('cellSize', 50))
-    rotation = float(request.args.get('rotation', 0))
-    offset = float(request.args.get('offset', 0))
-    color_scheme = request.args.get('colorScheme', 'monochromatic')
-    
+    try:
+        params = _pattern_params()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    seed = request.args.get('seed', type=int)
+
+    cached = pattern_store.lookup('tessellation', params, seed)
+    if cached is not None:
+        return current_app.response_class(cached, mimetype='application/json')
+
+    try:
+        pattern_data = generate_tessellation_pattern(seed=seed, **params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return stream_json(pattern_data)
+
+@tessellation_pattern_bp.route('/thumb.png')
+@scheduled('bulk', cost=_estimated_cost)
+def thumbnail():
+    """A PNG preview of the tiling; ?size= is 64, 128 or 256 pixels"""
+    try:
+        params = _pattern_params()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return raster.thumbnail_response('tessellation', params, request.args.get('seed', type=int),
+                                     generate_tessellation_pattern)
+
+def generate_tessellation_pattern(
+    pattern_type='triangular',
+    cell_size=50,
+    rotation=0,
+    offset=0,
+    color_scheme='monochromatic',
+    seed=None,
+    bbox=None,
+    zoom=1.0
+):
     # Generate base pattern unit
     pattern_data = {
         'type': pattern_type,
@@ -25,10 +101,19 @@ def generate_pattern():
         'offset': offset,
         'colorScheme': color_scheme,
         'baseUnit': generate_base_unit(pattern_type, cell_size),
-        'colors': generate_color_scheme(color_scheme)
+        'colors': generate_color_scheme(color_scheme, random.Random(seed))
     }
-    
-    return jsonify(pattern_data)
+    if pattern_type in APERIODIC_TYPES:
+        # Only the tiles inside the viewport are generated, at cell_size pixels across
+        tiling = SubstitutionTiling({
+            'rule': pattern_type,
+            'bbox': bbox or _parse_bbox(DEFAULT_BBOX),
+            'zoom': zoom,
+            'cell_size': cell_size,
+            'rotation': rotation
+        })
+        pattern_data.update(tiling.generate())
+    return pattern_data
 
 def generate_base_unit(pattern_type, cell_size):
     # Generate coordinates for basic tessellation units
@@ -57,11 +142,25 @@ def generate_base_unit(pattern_type, cell_size):
             y = cell_size * math.sin(angle)
             points.append([x, y])
         return {'points': points}
+    elif pattern_type == 'penrose':
+        # Thick rhomb; the thin one has a 36 degree angle instead of 72
+        angle = math.radians(72)
+        return {
+            'points': [
+                [0, 0],
+                [cell_size, 0],
+                [cell_size * (1 + math.cos(angle)), cell_size * math.sin(angle)],
+                [cell_size * math.cos(angle), cell_size * math.sin(angle)]
+            ]
+        }
+    elif pattern_type == 'pinwheel':
+        # Right triangle with legs 1 and 2
+        return {'points': [[0, 0], [0, cell_size], [cell_size * 2, 0]]}
     
     return {'points': [[0, 0], [cell_size, 0], [cell_size, cell_size], [0, cell_size]]}
 
-def generate_color_scheme(scheme_type):
-    base_hue = random.random()
+def generate_color_scheme(scheme_type, rng=random):
+    base_hue = rng.random()
     if scheme_type == 'monochromatic':
         return [
             hsv_to_hex(base_hue, 0.8, 0.9),
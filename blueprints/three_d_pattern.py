@@ -1,14 +1,18 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, request
 import random
 import math
+from blueprints.core.json_stream import stream_json
+from blueprints.core.assets import render_page
+from blueprints.core.scheduler import scheduled
 
 three_d_pattern_bp = Blueprint('three_d_pattern', __name__)
 
 @three_d_pattern_bp.route('/')
 def three_d_pattern_index():
-    return render_template('three_d_pattern/index.html')
+    return render_page('three_d_pattern/index.html')
 
 @three_d_pattern_bp.route('/generate')
+@scheduled('bulk', cost=lambda: max(1, int(request.args.get('complexity', 5)) / 50))
 def generate_pattern():
     pattern_type = request.args.get('type', 'cube')
     complexity = int(request.args.get('complexity', 5))
@@ -23,7 +27,7 @@ def generate_pattern():
         'elements': generate_3d_elements(pattern_type, complexity)
     }
     
-    return jsonify(pattern_data)
+    return stream_json(pattern_data)
 
 def generate_3d_elements(pattern_type, complexity):
     elements = []
@@ -1,23 +1,53 @@
-from flask import Blueprint, render_template, jsonify, request
-import uuid
-from blueprints.patterns.vine_pattern import VinePattern
+from flask import Blueprint, jsonify, request, current_app
+import math
+import random
+import time
+from blueprints.core.json_stream import stream_json
+from blueprints.patterns.vine_garden import VineGarden
+from blueprints.patterns.vine_index import merge_segments
+from blueprints.patterns.vine_pattern import VinePattern, GrowthPattern
+from blueprints.patterns.vine_session import VineSession
 from datetime import datetime
 from typing import Dict, Any, List, Tuple
 import json
+from blueprints.core.assets import render_page
+from blueprints.core.scheduler import scheduled
+from blueprints.core import animation, compact_encoding, raster, sharding
 
 vine_pattern_bp = Blueprint('vine_pattern', __name__)
-active_vines = {}  # Store active vine patterns
+MAX_GARDEN_VINES = 1000
+MAX_GARDEN_STEPS_PER_CALL = 100
+# The page polls /grow every 100 ms
+GROWTH_STEPS_PER_SECOND = 10
+MAX_GROWTH_STEPS_PER_SECOND = 100
+# /view merges chains of segments shorter than this on screen, and drops smaller leaves and flowers
+MIN_SEGMENT_PIXELS = 2.0
+MIN_FEATURE_PIXELS = 0.5
+# /thumb.png grows the vine to completion, which is exponential in max_length
+MAX_THUMBNAIL_LENGTH = 30
 
 @vine_pattern_bp.route('/')
 def vine_pattern_index():
-    return render_template('vine_pattern/index.html')
+    return render_page('vine_pattern/index.html')
 
 @vine_pattern_bp.route('/init')
+@scheduled('interactive')
+@sharding.refuses_while_draining
 def init_vine():
+    config = _vine_config()
+    pattern = VinePattern(config, seed=request.args.get('seed', type=int))
+    pattern_id = sharding.new_session_id()
+    current_app.extensions['vine_sessions'].put(pattern_id, VineSession(config, pattern.seed))
+    
+    initial_state = pattern.init_growth(config['start_pos'])
+    return stream_json({'id': pattern_id, 'pattern': _encode_pattern(_transform_pattern_data(initial_state))})
+
+def _vine_config() -> Dict[str, Any]:
+    """Vine config from the request, shared by /init and /animate"""
     start_x = float(request.args.get('start_x', 0))
     start_y = float(request.args.get('start_y', 0))
     
-    config = {
+    return {
         'growth_pattern': request.args.get('growth_pattern', 'climbing'),
         'growth_speed': float(request.args.get('growth_speed', 1.0)),
         'branch_probability': float(request.args.get('branch_probability', 0.3)),
@@ -27,30 +57,230 @@ def init_vine():
         'season': request.args.get('season', 'summer'),
         'start_pos': (start_x, start_y)
     }
-    
-    pattern = VinePattern(config)
-    pattern_id = str(uuid.uuid4())
-    active_vines[pattern_id] = pattern
-    
-    initial_state = pattern.init_growth((start_x, start_y))
-    return jsonify({'id': pattern_id, 'pattern': _transform_pattern_data(initial_state)})
 
 @vine_pattern_bp.route('/grow/<pattern_id>')
+@scheduled('interactive', cost=0.25)
+@sharding.refuses_while_draining
 def grow_vine(pattern_id):
-    if pattern_id not in active_vines:
+    """Advance a vine one step, or jump straight to ?step=N"""
+    sessions = current_app.extensions['vine_sessions']
+    replay_cache = current_app.extensions['vine_replay_cache']
+    session = sessions.get(pattern_id)
+    if session is None or session.kind != 'vine':
         return jsonify({'error': 'Pattern not found'}), 404
         
-    pattern = active_vines[pattern_id]
-    current_state = pattern.grow_step()
+    session.step = max(0, request.args.get('step', session.step + 1, type=int))
+    if session.step > current_app.config['VINE_MAX_STEPS']:
+        return jsonify({'error': f"step must be at most {current_app.config['VINE_MAX_STEPS']}"}), 400
+    current_state = replay_cache.materialize(pattern_id, session, _current_state)
     
-    if current_state['completed']:
-        del active_vines[pattern_id]
+    # A fully grown vine stays available to /view for a while
+    if current_state['completed'] and session.expires is None:
+        session.expires = time.time() + current_app.config['VINE_COMPLETED_TTL']
+    sessions.put(pattern_id, session)
         
-    return jsonify({
+    return stream_json({
         'completed': current_state['completed'],
-        'pattern': _transform_pattern_data(current_state)
+        'step': session.step,
+        'pattern': _encode_pattern(_transform_pattern_data(current_state))
+    })
+
+@vine_pattern_bp.route('/view/<pattern_id>')
+@scheduled('interactive', cost=0.25)
+@sharding.refuses_while_draining
+def view_vine(pattern_id):
+    """The elements of a vine inside ?bbox=x0,y0,x1,y1 at ?zoom= screen pixels per unit.
+
+    The vine stays at its current step; only elements whose bounds meet the
+    bbox are returned, and detail too small to see at the zoom is merged or
+    left out.
+    """
+    try:
+        x0, y0, x1, y1 = (float(v) for v in request.args['bbox'].split(','))
+        zoom = request.args.get('zoom', 1.0, type=float)
+    except (KeyError, ValueError):
+        return jsonify({'error': 'bbox must be x0,y0,x1,y1'}), 400
+    if not all(math.isfinite(v) for v in (x0, y0, x1, y1)):
+        return jsonify({'error': 'bbox must be finite'}), 400
+    if not (math.isfinite(zoom) and zoom > 0):
+        return jsonify({'error': 'zoom must be positive and finite'}), 400
+
+    session = current_app.extensions['vine_sessions'].get(pattern_id)
+    if session is None or session.kind != 'vine':
+        return jsonify({'error': 'Pattern not found'}), 404
+
+    def query(vine):
+        visible = vine.index.query((x0, y0, x1, y1))
+        min_size = MIN_FEATURE_PIXELS / zoom
+        return {
+            'completed': vine.completed,
+            'segments': merge_segments(vine.segments, visible['segments'].tolist(), MIN_SEGMENT_PIXELS / zoom),
+            'leaves': [leaf for leaf in (vine.leaves[i] for i in visible['leaves']) if leaf['size'] >= min_size],
+            'flowers': [flower for flower in (vine.flowers[i] for i in visible['flowers']) if flower['size'] >= min_size],
+            'colors': vine.colors
+        }
+
+    view = current_app.extensions['vine_replay_cache'].materialize(pattern_id, session, query)
+    return stream_json({
+        'completed': view['completed'],
+        'step': session.step,
+        'bbox': [x0, y0, x1, y1],
+        'zoom': zoom,
+        'pattern': _encode_pattern(_transform_pattern_data(view))
     })
 
+@vine_pattern_bp.route('/animate')
+@scheduled('bulk', cost=lambda: 1 + animation.estimated_cost())
+@sharding.refuses_while_draining
+def animate_vine():
+    """Stream the growth as NDJSON: a keyframe, then the elements each frame adds"""
+    config = _vine_config()
+    compact = request.args.get('encoding') == 'compact'
+    steps_per_second = request.args.get('steps_per_second', GROWTH_STEPS_PER_SECOND, type=float)
+    try:
+        fps, frames = animation.requested_sequence()
+        if not 0 < steps_per_second <= MAX_GROWTH_STEPS_PER_SECOND:
+            raise ValueError(f'steps_per_second must be in (0, {MAX_GROWTH_STEPS_PER_SECOND}]')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    pattern = VinePattern(config, seed=request.args.get('seed', type=int))
+    pattern.init_growth(config['start_pos'])
+
+    def grow_to(step):
+        while pattern.steps < step and not pattern.completed:
+            pattern.grow_step()
+        return {'segments': pattern.segments, 'leaves': pattern.leaves, 'flowers': pattern.flowers}
+
+    def render(elements):
+        pattern_data = _transform_pattern_data(dict(elements, colors=pattern.colors))
+        return compact_encoding.encode(pattern_data, compact_encoding.VINE_TABLES) if compact else pattern_data
+
+    keyframe = {
+        'fps': fps,
+        'frames': frames,
+        'stepsPerSecond': steps_per_second,
+        'seed': pattern.seed,
+        'pattern': render({name: list(elements) for name, elements in grow_to(0).items()})
+    }
+    return animation.stream_frames(keyframe, animation.growth_frames(grow_to, fps, frames, steps_per_second, render, compact))
+
+@vine_pattern_bp.route('/thumb.png')
+@scheduled('bulk', cost=lambda: max(1, request.args.get('max_length', 10, type=int) / 10))
+@sharding.refuses_while_draining
+def thumbnail():
+    """A PNG preview of the fully grown vine; ?size= is 64, 128 or 256 pixels"""
+    max_length = int(request.args.get('max_length', 10))
+    if not 0 <= max_length <= MAX_THUMBNAIL_LENGTH:
+        return jsonify({'error': f'max_length must be between 0 and {MAX_THUMBNAIL_LENGTH}'}), 400
+    params = {
+        'growth_pattern': request.args.get('growth_pattern', 'climbing'),
+        'growth_speed': float(request.args.get('growth_speed', 1.0)),
+        'max_length': max_length,
+        'season': request.args.get('season', 'summer'),
+        'start_x': float(request.args.get('start_x', 0)),
+        'start_y': float(request.args.get('start_y', 0))
+    }
+    return raster.thumbnail_response('vine', params, request.args.get('seed', type=int), generate_vine_pattern)
+
+@vine_pattern_bp.route('/garden/init')
+@scheduled('bulk', cost=lambda: max(1, int(request.args.get('count', 100)) / 100))
+@sharding.refuses_while_draining
+def init_garden():
+    """Start a garden of many vines grown together in one batched simulation"""
+    count = max(1, min(int(request.args.get('count', 100)), MAX_GARDEN_VINES))
+    growth_pattern = request.args.get('growth_pattern', 'mixed')
+    max_length = int(request.args.get('max_length', 10))
+    width = float(request.args.get('width', 800))
+    height = float(request.args.get('height', 800))
+    seed = request.args.get('seed', type=int)
+    
+    layout = random.Random(seed)
+    patterns = [p.value for p in GrowthPattern]
+    config = {
+        'vines': [{
+            'growth_pattern': growth_pattern if growth_pattern in patterns else layout.choice(patterns),
+            'max_length': max_length,
+            'start_pos': (layout.uniform(-width / 2, width / 2), layout.uniform(-height / 2, height / 2))
+        } for _ in range(count)]
+    }
+    
+    garden = VineGarden(config, seed)
+    garden.init_growth()
+    garden_id = sharding.new_session_id()
+    current_app.extensions['vine_sessions'].put(garden_id, VineSession(config, garden.seed, kind='garden'))
+    return stream_json({'id': garden_id, 'count': count, 'pattern': _encode_pattern(garden.get_state())})
+
+@vine_pattern_bp.route('/garden/grow/<garden_id>')
+@scheduled('interactive', cost=lambda: max(0.25, request.args.get('steps', 1, type=int) / 4))
+@sharding.refuses_while_draining
+def grow_garden(garden_id):
+    """Advance every vine in a garden by ?steps=N (default 1) steps.
+
+    Only the elements added by these steps are returned, since clients
+    already hold the rest of the garden.
+    """
+    sessions = current_app.extensions['vine_sessions']
+    replay_cache = current_app.extensions['garden_replay_cache']
+    session = sessions.get(garden_id)
+    if session is None or session.kind != 'garden':
+        return jsonify({'error': 'Garden not found'}), 404
+    
+    steps = max(1, min(request.args.get('steps', 1, type=int), MAX_GARDEN_STEPS_PER_CALL))
+    since = session.step
+    session.step += steps
+    state = replay_cache.materialize(garden_id, session, lambda garden: {
+        'completed': garden.completed,
+        'vinesCompleted': int(garden.vines_completed().sum()),
+        'pattern': garden.get_state(since)
+    })
+    
+    if state['completed']:
+        sessions.delete(garden_id)
+        replay_cache.discard(garden_id)
+    else:
+        sessions.put(garden_id, session)
+    
+    return stream_json({
+        'completed': state['completed'],
+        'step': session.step,
+        'vinesCompleted': state['vinesCompleted'],
+        'pattern': _encode_pattern(state['pattern'])
+    })
+
+def generate_vine_pattern(
+    growth_pattern='climbing',
+    growth_speed=1.0,
+    max_length=10,
+    season='summer',
+    start_x=0,
+    start_y=0,
+    seed=None
+):
+    """Grow a vine to completion and return its elements, for offline tools"""
+    config = {
+        'growth_pattern': growth_pattern,
+        'growth_speed': growth_speed,
+        'max_length': max_length,
+        'season': season,
+        'start_pos': (start_x, start_y)
+    }
+    pattern = VinePattern(config, seed=seed)
+    pattern.init_growth((start_x, start_y))
+    while not pattern.completed:
+        pattern.grow_step()
+
+    pattern_data = vine_elements(pattern.get_current_state())
+    pattern_data['steps'] = pattern.steps
+    return pattern_data
+
+def vine_elements(pattern_data: Dict[str, Any]) -> Dict[str, list]:
+    """A vine state's elements as plain lists in the frontend format, ready for json.dumps"""
+    elements = {name: list(items) for name, items in _transform_pattern_data(pattern_data).items()}
+    for element in elements['leaves'] + elements['flowers']:
+        element['type'] = element['type'].value
+    return elements
+
 def _get_season_from_request() -> str:
     """Get season from request or current date"""
     season = request.args.get('season', None)
@@ -66,49 +296,56 @@ def _get_season_from_request() -> str:
             season = 'winter'
     return season
 
+def _rgb_to_hex(rgb: tuple) -> str:
+    return f'#{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}'
+
+def _encode_pattern(pattern: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply the compact encoding when the client asked for ?encoding=compact"""
+    if request.args.get('encoding') == 'compact':
+        return compact_encoding.encode(pattern, compact_encoding.VINE_TABLES)
+    return pattern
+
+def _current_state(vine: VinePattern) -> Dict[str, Any]:
+    """The vine's state with its element lists copied.
+
+    The cached vine may be grown by another request while this one's
+    response streams, so the lists are cut at the requested step here.
+    """
+    return dict(vine.get_current_state(), segments=list(vine.segments), leaves=list(vine.leaves),
+                flowers=list(vine.flowers))
+
 def _transform_pattern_data(pattern_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Transform pattern data into format expected by frontend"""
-    
-    def _rgb_to_hex(rgb: tuple) -> str:
-        return f'#{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}'
-    
-    transformed = {
-        'segments': [],
-        'leaves': [],
-        'flowers': []
-    }
+    """Transform pattern data into format expected by frontend.
+
+    Elements are produced lazily while the response is streamed, so the vine
+    state is never copied into an intermediate structure. The element lists
+    must not grow while that happens (see _current_state).
+    """
+    flower_color = _rgb_to_hex(pattern_data['colors'].flower_color)
     
-    # Transform segments
-    for segment in pattern_data['segments']:
-        transformed['segments'].append({
+    return {
+        'segments': ({
             'start': segment['start'],
             'end': segment['end'],
             'thickness': segment['thickness'],
             'color': _rgb_to_hex(segment['color'])
-        })
-    
-    # Transform leaves
-    for leaf in pattern_data['leaves']:
-        transformed['leaves'].append({
+        } for segment in pattern_data['segments']),
+        'leaves': ({
             'pos': leaf['pos'],
             'angle': leaf['angle'],
             'size': leaf['size'],
-            'type': leaf['type'].value if hasattr(leaf['type'], 'value') else leaf['type'],
+            'type': leaf['type'],
             'color': _rgb_to_hex(leaf['color']),
             'shape': leaf.get('shape', [])
-        })
-    
-    # Transform flowers
-    for flower in pattern_data['flowers']:
-        transformed['flowers'].append({
+        } for leaf in pattern_data['leaves']),
+        'flowers': ({
             'pos': flower['pos'],
             'size': flower['size'],
-            'type': flower['type'].value if hasattr(flower['type'], 'value') else flower['type'],
-            'color': _rgb_to_hex(pattern_data['colors'].flower_color),
+            'type': flower['type'],
+            'color': flower_color,
             'rotation': flower.get('rotation', 0)
-        })
-    
-    return transformed
+        } for flower in pattern_data['flowers'])
+    }
 
 def _parse_obstacles(obstacles_str: str) -> List[Tuple[Tuple[float, float], float]]:
     """Parse obstacles from request string format"""
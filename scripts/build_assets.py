@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""Build fingerprinted, precompressed static bundles for the pattern pages.
+
+For every template under templates/ this:
+
+* moves inline <style> and <script> blocks into content-hashed bundles
+  (static/dist/pages/<page>.<hash>.css|js),
+* copies the referenced files under static/ into hashed copies,
+* writes .gz copies (and .br copies when the brotli package is installed),
+* writes rewritten templates that load the bundles through asset_url(),
+* records logical name -> hashed file in static/dist/manifest.json.
+
+blueprints/core/assets.py picks the output up at startup and serves the
+bundles under /assets/ with immutable caching.
+
+Usage:
+    python scripts/build_assets.py
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INLINE_STYLE = re.compile(r'<style([^>]*)>(.*?)</style>', re.DOTALL)
+INLINE_SCRIPT = re.compile(r'<script(?![^>]*\bsrc=)([^>]*)>(.*?)</script>', re.DOTALL)
+STATIC_URL = re.compile(r"""\{\{\s*url_for\(\s*'static'\s*,\s*filename\s*=\s*'([^']+)'\s*\)\s*\}\}""")
+
+MANIFEST_NAME = 'manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.html')
+
+
+def fingerprint(name, content):
+    """Return `name` with a short content hash inserted before the extension."""
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{digest}{ext}'
+
+
+def write_bundle(dist_dir, hashed_name, content):
+    path = os.path.join(dist_dir, hashed_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if hashed_name.endswith(COMPRESSIBLE):
+        with open(path + '.gz', 'wb') as f:
+            # mtime=0 keeps the compressed output reproducible
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(content))
+
+
+def extract_inline(html, page, manifest, bundles):
+    """Replace inline style/script blocks in `html` with bundle references."""
+    counters = {'css': 0, 'js': 0}
+
+    def bundle(kind, body):
+        index = counters[kind]
+        counters[kind] += 1
+        suffix = f'.{index}' if index else ''
+        name = f'pages/{page}{suffix}.{kind}'
+        content = body.strip().encode('utf-8') + b'\n'
+        manifest[name] = fingerprint(name, content)
+        bundles[manifest[name]] = content
+        return name
+
+    def replace_style(match):
+        name = bundle('css', match.group(2))
+        return f'<link rel="stylesheet" href="{{{{ asset_url(\'{name}\') }}}}">'
+
+    def replace_script(match):
+        name = bundle('js', match.group(2))
+        return f'<script{match.group(1)} src="{{{{ asset_url(\'{name}\') }}}}"></script>'
+
+    html = INLINE_STYLE.sub(replace_style, html)
+    html = INLINE_SCRIPT.sub(replace_script, html)
+    return html
+
+
+def build(template_dir, static_dir, dist_dir, template_out_dir):
+    """Build all bundles and rewritten templates; return the manifest."""
+    for directory in (dist_dir, template_out_dir):
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+    manifest = {}
+    bundles = {}
+    for root, _, files in os.walk(template_dir):
+        for filename in files:
+            if not filename.endswith('.html'):
+                continue
+            source = os.path.join(root, filename)
+            relative = os.path.relpath(source, template_dir)
+            page = os.path.splitext(relative)[0].replace(os.sep, '_')
+            if page.endswith('_index'):
+                page = page[:-len('_index')]
+
+            with open(source, encoding='utf-8') as f:
+                html = f.read()
+            html = extract_inline(html, page, manifest, bundles)
+
+            for static_name in STATIC_URL.findall(html):
+                static_path = os.path.join(static_dir, static_name)
+                if static_name not in manifest and os.path.isfile(static_path):
+                    with open(static_path, 'rb') as f:
+                        content = f.read()
+                    manifest[static_name] = fingerprint(static_name, content)
+                    bundles[manifest[static_name]] = content
+            html = STATIC_URL.sub(lambda m: f"{{{{ asset_url('{m.group(1)}') }}}}", html)
+
+            target = os.path.join(template_out_dir, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(html)
+
+    for hashed_name, content in bundles.items():
+        write_bundle(dist_dir, hashed_name, content)
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--templates', default=os.path.join(REPO_ROOT, 'templates'))
+    parser.add_argument('--static', default=os.path.join(REPO_ROOT, 'static'))
+    parser.add_argument('--dist', default=os.path.join(REPO_ROOT, 'static', 'dist'))
+    parser.add_argument('--template-out', default=os.path.join(REPO_ROOT, 'build', 'templates'))
+    args = parser.parse_args()
+
+    manifest = build(args.templates, args.static, args.dist, args.template_out)
+    print(f'Wrote {len(manifest)} bundles to {args.dist}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
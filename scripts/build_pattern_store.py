@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""Build the precomputed pattern store served by the generate routes.
+
+Every combination in the parameter grid is generated once per seed and
+written to a single memory-mappable file (see blueprints/core/pattern_store.py).
+
+Usage:
+    python scripts/build_pattern_store.py [--grid scripts/pattern_store_grid.json]
+                                          [--output data/pattern_store.bin]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blueprints.core.pattern_store import build_store  # noqa: E402
+from blueprints.core.registry import PATTERN_GENERATORS, expand_grid  # noqa: E402
+
+DEFAULT_GRID = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pattern_store_grid.json')
+DEFAULT_OUTPUT = os.path.join('data', 'pattern_store.bin')
+
+
+def generate_entries(grid):
+    seeds = range(grid.get('seeds', 1))
+    for pattern_name, params in expand_grid(grid):
+        generator = PATTERN_GENERATORS[pattern_name]
+        for seed in seeds:
+            yield pattern_name, params, seed, generator(seed=seed, **params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--grid', default=DEFAULT_GRID, help='JSON parameter grid')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='store file to write')
+    args = parser.parse_args()
+
+    with open(args.grid) as f:
+        grid = json.load(f)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    try:
+        count = build_store(args.output, generate_entries(grid))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f'Wrote {count} payloads to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
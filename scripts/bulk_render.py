@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""Render a parameter and seed grid of patterns to JSON and SVG files, in parallel.
+
+Every (pattern, params, seed) job in the grid is generated by calling the
+generator functions directly (blueprints/core/registry.py), spread over a
+process pool in batches. Each job's files go to
+
+    <output>/<pattern>/<aa>/<job id>.json|svg
+
+where the job ID is a hash of the pattern, params and seed and <aa> is its
+first two hex digits, so no directory grows past a few thousand files.
+Workers write their own files through large buffers, to a temporary name
+that is renamed into place when complete.
+
+Once a batch's files are written, one line per job is appended to
+<output>/manifest.jsonl. Rerunning the same command skips the jobs already
+in the manifest, so an interrupted run picks up where it stopped and loses
+at most the batches that were in flight.
+
+The grid has the same format as scripts/pattern_store_grid.json; ``seeds``
+is a count or an explicit list.
+
+Usage:
+    python scripts/bulk_render.py --grid grid.json --output data/render
+                                  [--formats json,svg] [--workers N] [--batch-size 16]
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from types import GeneratorType
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blueprints.core.json_stream import iter_json  # noqa: E402
+from blueprints.core.pattern_store import make_key  # noqa: E402
+from blueprints.core.registry import PATTERN_GENERATORS, expand_grid  # noqa: E402
+from blueprints.core.svg import SVG_RENDERERS  # noqa: E402
+
+MANIFEST_NAME = 'manifest.jsonl'
+FORMATS = ('json', 'svg')
+BATCH_SIZE = 16
+# Batches queued per worker, so workers never wait on the parent for work
+BATCHES_PER_WORKER = 2
+WRITE_BUFFER = 256 * 1024
+
+
+def job_id(pattern_name, params, seed):
+    return hashlib.sha1(f'{make_key(pattern_name, params)}#{seed}'.encode('utf-8')).hexdigest()[:20]
+
+
+def iter_jobs(grid):
+    """Yield (pattern_name, params, seed, job_id) for every job in the grid."""
+    seeds = grid.get('seeds', 1)
+    seeds = range(seeds) if isinstance(seeds, int) else seeds
+    for pattern_name, params in expand_grid(grid):
+        for seed in seeds:
+            yield pattern_name, params, seed, job_id(pattern_name, params, seed)
+
+
+def load_manifest(path):
+    """Map the job IDs recorded in a manifest to the formats written for them."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short when a run was killed; its job is redone
+            done.setdefault(record['id'], set()).update(record['files'])
+    return done
+
+
+def _materialize(value):
+    # Generators (tessellation tiles) are consumed once per format, so collect them
+    if isinstance(value, dict):
+        return {key: _materialize(item) for key, item in value.items()}
+    if isinstance(value, GeneratorType):
+        return list(value)
+    return value
+
+
+def _write_file(path, chunks):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
+        f.writelines(chunks)
+    os.replace(tmp_path, path)
+
+
+def render_batch(output, formats, jobs):
+    """Render and write a batch of jobs in a worker; returns their manifest records."""
+    records = []
+    for pattern_name, params, seed, job in jobs:
+        payload = _materialize(PATTERN_GENERATORS[pattern_name](seed=seed, **params))
+        directory = os.path.join(pattern_name, job[:2])
+        os.makedirs(os.path.join(output, directory), exist_ok=True)
+        files = {}
+        for fmt in formats:
+            relative = os.path.join(directory, f'{job}.{fmt}')
+            if fmt == 'json':
+                chunks = iter_json(payload)
+            else:
+                chunks = [SVG_RENDERERS[pattern_name](payload)]
+            _write_file(os.path.join(output, relative), chunks)
+            files[fmt] = relative
+        records.append({'id': job, 'pattern': pattern_name, 'params': params, 'seed': seed, 'files': files})
+    return records
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        if not f.seek(0, os.SEEK_END):
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def _batches(jobs, size):
+    jobs = iter(jobs)
+    while True:
+        batch = list(itertools.islice(jobs, size))
+        if not batch:
+            return
+        yield batch
+
+
+def run(grid, output, formats=FORMATS, workers=None, batch_size=BATCH_SIZE, log=None):
+    """Render every job in `grid` not yet in the manifest under `output`.
+
+    With ``workers=1`` jobs run in this process. Returns (rendered, skipped).
+    """
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f'Unknown formats: {", ".join(sorted(unknown))}')
+    os.makedirs(output, exist_ok=True)
+    manifest_path = os.path.join(output, MANIFEST_NAME)
+    done = load_manifest(manifest_path)
+
+    wanted = set(formats)
+    jobs = list(iter_jobs(grid))
+    pending = [job for job in jobs if not wanted <= done.get(job[3], set())]
+    skipped = len(jobs) - len(pending)
+    rendered = 0
+    started = time.monotonic()
+
+    with open(manifest_path, 'a', encoding='utf-8', buffering=WRITE_BUFFER) as manifest:
+        if not _ends_with_newline(manifest_path):
+            manifest.write('\n')  # start on a fresh line if the last run died mid-record
+
+        def record(records):
+            nonlocal rendered
+            for entry in records:
+                manifest.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            manifest.flush()
+            rendered += len(records)
+            if log:
+                rate = rendered / max(time.monotonic() - started, 1e-9)
+                log(f'{rendered}/{len(pending)} rendered ({rate:.0f}/s), {skipped} already done')
+
+        batches = _batches(pending, batch_size)
+        if workers == 1:
+            for batch in batches:
+                record(render_batch(output, formats, batch))
+            return rendered, skipped
+
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            limit = workers * BATCHES_PER_WORKER
+            in_flight = {pool.submit(render_batch, output, formats, batch)
+                         for batch in itertools.islice(batches, limit)}
+            while in_flight:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(future.result())
+                for batch in itertools.islice(batches, len(finished)):
+                    in_flight.add(pool.submit(render_batch, output, formats, batch))
+    return rendered, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--grid', required=True, help='JSON parameter grid')
+    parser.add_argument('--output', default=os.path.join('data', 'render'), help='output directory')
+    parser.add_argument('--formats', default=','.join(FORMATS), help='comma-separated: json, svg')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='jobs per worker task')
+    args = parser.parse_args()
+
+    with open(args.grid) as f:
+        grid = json.load(f)
+
+    try:
+        rendered, skipped = run(grid, args.output, tuple(args.formats.split(',')), args.workers,
+                                args.batch_size, log=lambda message: print(message, file=sys.stderr))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f'Rendered {rendered} jobs to {args.output} ({skipped} already done)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+"""Load generator and access-log replayer for the pattern generator app.
+
+Models the two kinds of traffic the site sees:
+
+* gallery clients fetching ``/<pattern>/generate`` back to back, and
+* vine clients calling ``/vine/init`` and then polling ``/vine/grow/<id>``
+  every 100 ms (the cadence used by templates/vine_pattern/index.html)
+  until the vine completes.
+
+It reports throughput, latency percentiles and error rates per endpoint
+group. A ``/vine/grow`` 404 is reported separately because it usually means
+the poll landed on a worker that does not hold the vine.
+
+Usage:
+    # against an already running server (gunicorn, or nginx via https://localhost)
+    python scripts/loadtest.py --url http://127.0.0.1:8000 --duration 30
+
+    # start a local gunicorn with the Dockerfile's worker settings first
+    python scripts/loadtest.py --spawn-gunicorn --workers 3
+
+    # replay a recorded nginx/gunicorn access log at twice the original speed
+    python scripts/loadtest.py --replay access.log --replay-speed 2
+"""
+import argparse
+import collections
+import http.client
+import json
+import math
+import os
+import random
+import re
+import socket
+import ssl
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GALLERY_PATHS = [
+    '/circular/generate?circles=8&points=12&density=0.7&symmetry=1&hue=0.5&palette=complementary',
+    '/geometric/generate?symmetry=6&layers=3&complexity=0.7&rotation=0&hue=0.5&palette=monochromatic',
+    '/tessellation/generate?pattern=triangular&cellSize=50&rotation=0&offset=0&colorScheme=monochromatic',
+    '/tessellation/generate?pattern=square&cellSize=50&rotation=0&offset=0&colorScheme=monochromatic',
+    '/tessellation/generate?pattern=hexagonal&cellSize=50&rotation=0&offset=0&colorScheme=monochromatic',
+    '/three_d/generate?type=cube&complexity=5&rotation_speed=0.01&color_scheme=rainbow',
+    '/basic/generate',
+]
+
+GROWTH_PATTERNS = ['climbing', 'hanging', 'spreading', 'spiral']
+
+# Common and combined log formats, as written by nginx and gunicorn
+LOG_LINE = re.compile(
+    r'\[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+)[^"]*" (?P<status>\d{3})'
+)
+LOG_TIME_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+VINE_GROW_PATH = re.compile(r'^/vine/grow/(?P<id>[^/?]+)')
+
+
+def endpoint_group(path):
+    """Collapse a request path into the group it is reported under."""
+    path = path.split('?', 1)[0]
+    if path.startswith('/vine/grow/'):
+        return '/vine/grow/<id>'
+    return path
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def parse_log_line(line):
+    """Return (timestamp, method, path) for an access log line, or None."""
+    match = LOG_LINE.search(line)
+    if not match:
+        return None
+    try:
+        timestamp = datetime.strptime(match.group('time'), LOG_TIME_FORMAT).timestamp()
+    except ValueError:
+        return None
+    return timestamp, match.group('method'), match.group('path')
+
+
+class Stats:
+    """Thread-safe collection of request outcomes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.defaultdict(collections.Counter)
+
+    def record(self, group, status, elapsed):
+        with self._lock:
+            self.latencies[group].append(elapsed)
+            if status is None:
+                self.errors[group]['connection'] += 1
+            elif group == '/vine/grow/<id>' and status == 404:
+                self.errors[group]['vine_404'] += 1
+            elif status >= 400:
+                self.errors[group][str(status)] += 1
+
+    def summary(self, elapsed):
+        groups = {}
+        total = 0
+        total_errors = 0
+        for group, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            errors = sum(self.errors[group].values())
+            total += len(values)
+            total_errors += errors
+            groups[group] = {
+                'requests': len(values),
+                'rps': len(values) / elapsed if elapsed else 0.0,
+                'p50_ms': percentile(values, 0.50) * 1000,
+                'p90_ms': percentile(values, 0.90) * 1000,
+                'p99_ms': percentile(values, 0.99) * 1000,
+                'max_ms': values[-1] * 1000,
+                'error_rate': errors / len(values),
+                'errors': dict(self.errors[group]),
+            }
+        return {
+            'elapsed_s': elapsed,
+            'requests': total,
+            'rps': total / elapsed if elapsed else 0.0,
+            'error_rate': total_errors / total if total else 0.0,
+            'groups': groups,
+        }
+
+
+class Client:
+    """A keep-alive HTTP(S) client bound to one thread."""
+
+    def __init__(self, base_url, stats, insecure=False, timeout=30, client_ip=None):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.https = parsed.scheme == 'https'
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if self.https else 80)
+        self.stats = stats
+        self.timeout = timeout
+        self.context = None
+        if self.https:
+            self.context = ssl.create_default_context()
+            if insecure:
+                self.context.check_hostname = False
+                self.context.verify_mode = ssl.CERT_NONE
+        self.conn = None
+        # Lets each synthetic client get its own scheduler bucket when hitting
+        # gunicorn directly; nginx overwrites the header with the real address
+        self.headers = {'X-Real-IP': client_ip} if client_ip else {}
+
+    def _connect(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self.context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def get(self, path):
+        """GET a path; return (status, body) or (None, None) on connection failure."""
+        start = time.perf_counter()
+        status = body = None
+        try:
+            if self.conn is None:
+                self.conn = self._connect()
+            self.conn.request('GET', path, headers=self.headers)
+            response = self.conn.getresponse()
+            status, body = response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+        self.stats.record(endpoint_group(path), status, time.perf_counter() - start)
+        return status, body
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def _json(body):
+    try:
+        return json.loads(body)
+    except (TypeError, ValueError):
+        return None
+
+
+def vine_init_path(rng):
+    params = {
+        'start_x': rng.uniform(-200, 200),
+        'start_y': rng.uniform(-200, 200),
+        'growth_pattern': rng.choice(GROWTH_PATTERNS),
+        'growth_speed': 1.0,
+        'branch_probability': 0.3,
+        'leaf_probability': 0.4,
+        'flower_probability': 0.2,
+        'max_length': rng.randint(5, 30),
+        'season': 'summer',
+    }
+    return '/vine/init?' + urllib.parse.urlencode(params)
+
+
+def gallery_worker(client, deadline, rng, think_time):
+    while time.monotonic() < deadline:
+        client.get(rng.choice(GALLERY_PATHS))
+        if think_time:
+            time.sleep(rng.uniform(0, think_time))
+
+
+def vine_worker(client, deadline, rng, interval):
+    while time.monotonic() < deadline:
+        status, body = client.get(vine_init_path(rng))
+        data = _json(body) if status == 200 else None
+        if not data:
+            time.sleep(interval)
+            continue
+        path = f"/vine/grow/{data['id']}"
+        next_poll = time.monotonic()
+        while time.monotonic() < deadline:
+            # Keep the browser's fixed setInterval cadence
+            next_poll += interval
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+            status, body = client.get(path)
+            if status != 200:
+                break
+            data = _json(body)
+            if not data or data.get('completed'):
+                break
+
+
+def run_synthetic(args, stats):
+    deadline = time.monotonic() + args.duration
+    threads = []
+    for i in range(args.gallery_clients + args.vine_clients):
+        rng = random.Random(args.seed + i)
+        client = Client(args.url, stats, insecure=args.insecure, client_ip=f'10.0.{i // 256}.{i % 256}')
+        if i < args.gallery_clients:
+            target, extra = gallery_worker, args.think_time
+        else:
+            target, extra = vine_worker, args.grow_interval
+        thread = threading.Thread(target=target, args=(client, deadline, rng, extra), daemon=True)
+        threads.append((thread, client))
+    for thread, _ in threads:
+        thread.start()
+    for thread, client in threads:
+        thread.join()
+        client.close()
+
+
+def run_replay(args, stats):
+    """Replay GET requests from an access log, keeping their relative timing.
+
+    Vine IDs in the log belong to sessions that no longer exist, so each
+    replayed ``/vine/init`` creates a fresh session and the first grow of an
+    unseen logged ID is bound to the oldest unclaimed fresh session.
+    """
+    with open(args.replay) as f:
+        entries = [e for e in map(parse_log_line, f) if e and e[1] == 'GET']
+    if not entries:
+        raise SystemExit(f'No GET requests found in {args.replay}')
+
+    lock = threading.Lock()
+    id_map = {}
+    unclaimed = collections.deque()
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = Client(args.url, stats, insecure=args.insecure)
+        return local.client
+
+    def send(path):
+        match = VINE_GROW_PATH.match(path)
+        if match:
+            with lock:
+                old_id = match.group('id')
+                if old_id not in id_map:
+                    if not unclaimed:
+                        return
+                    id_map[old_id] = unclaimed.popleft()
+                path = f'/vine/grow/{id_map[old_id]}'
+        status, body = client().get(path)
+        if path.startswith('/vine/init') and status == 200:
+            data = _json(body)
+            if data:
+                with lock:
+                    unclaimed.append(data['id'])
+
+    pending = collections.deque()
+    start_wall = time.monotonic()
+    first = entries[0][0]
+    semaphore = threading.Semaphore(args.replay_concurrency)
+
+    def dispatch(path):
+        try:
+            send(path)
+        finally:
+            semaphore.release()
+
+    for timestamp, _, path in entries:
+        delay = (timestamp - first) / args.replay_speed - (time.monotonic() - start_wall)
+        if delay > 0:
+            time.sleep(delay)
+        semaphore.acquire()
+        thread = threading.Thread(target=dispatch, args=(path,), daemon=True)
+        thread.start()
+        pending.append(thread)
+        while pending and not pending[0].is_alive():
+            pending.popleft().join()
+    for thread in pending:
+        thread.join()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_gunicorn(workers, threads):
+    port = _free_port()
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--timeout', '60',
+        'app:app',
+    ]
+    if threads > 1:
+        command[-1:-1] = ['--threads', str(threads)]
+    process = subprocess.Popen(command, cwd=REPO_ROOT)
+    url = f'http://127.0.0.1:{port}'
+    probe = Client(url, Stats())
+    for _ in range(100):
+        status, _ = probe.get('/health')
+        if status == 200:
+            probe.close()
+            return process, url
+        if process.poll() is not None:
+            break
+        time.sleep(0.1)
+    process.terminate()
+    raise SystemExit('gunicorn did not become healthy')
+
+
+def print_report(summary):
+    print(f"\n{summary['requests']} requests in {summary['elapsed_s']:.1f}s "
+          f"({summary['rps']:.1f} req/s, error rate {summary['error_rate']:.2%})\n")
+    header = f"{'endpoint':<28}{'reqs':>8}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>9}"
+    print(header)
+    print('-' * len(header))
+    for group, row in summary['groups'].items():
+        print(f"{group:<28}{row['requests']:>8}{row['rps']:>9.1f}{row['p50_ms']:>9.1f}"
+              f"{row['p90_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}{row['error_rate']:>9.2%}")
+        for kind, count in sorted(row['errors'].items()):
+            print(f"    {kind}: {count}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='base URL of the app or nginx')
+    parser.add_argument('--insecure', action='store_true', help='skip TLS verification (self-signed nginx certs)')
+    parser.add_argument('--duration', type=float, default=30, help='synthetic run length in seconds')
+    parser.add_argument('--gallery-clients', type=int, default=8)
+    parser.add_argument('--vine-clients', type=int, default=4)
+    parser.add_argument('--grow-interval', type=float, default=0.1, help='vine poll interval in seconds')
+    parser.add_argument('--think-time', type=float, default=0.0, help='max pause between gallery fetches')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--replay', help='access log to replay instead of synthetic traffic')
+    parser.add_argument('--replay-speed', type=float, default=1.0)
+    parser.add_argument('--replay-concurrency', type=int, default=64)
+    parser.add_argument('--spawn-gunicorn', action='store_true', help='start a local gunicorn for the run')
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args(argv)
+
+    process = None
+    if args.spawn_gunicorn:
+        process, args.url = spawn_gunicorn(args.workers, args.threads)
+
+    stats = Stats()
+    start = time.monotonic()
+    try:
+        if args.replay:
+            run_replay(args, stats)
+        else:
+            run_synthetic(args, stats)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    summary = stats.summary(time.monotonic() - start)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+// Decoder for the ?encoding=compact pattern payloads (blueprints/core/compact_encoding.py).
+//
+// decodeCompact(payload) walks a parsed JSON response and replaces every
+// object marked {encoding: 'compact-v1'} with the verbose structure the
+// drawing code expects. Anything else is returned unchanged, so it is safe
+// to call on every response.
+
+(function (global) {
+    const ENCODING = 'compact-v1';
+
+    // Base64 -> bytes -> zigzag varints -> running sum of deltas
+    function unpackInts(packed) {
+        const binary = atob(packed || '');
+        const values = [];
+        let current = 0;
+        let scale = 1;
+        let last = 0;
+        for (let i = 0; i < binary.length; i++) {
+            const byte = binary.charCodeAt(i);
+            // Arithmetic rather than bit operators, which truncate to 32 bits
+            current += (byte & 0x7f) * scale;
+            scale *= 128;
+            if (!(byte & 0x80)) {
+                last += current % 2 ? -(current + 1) / 2 : current / 2;
+                values.push(last);
+                current = 0;
+                scale = 1;
+            }
+        }
+        return values;
+    }
+
+    function decodePoints(column) {
+        const xs = unpackInts(column.x);
+        const ys = unpackInts(column.y);
+        return xs.map((x, i) => [x / column.scale, ys[i] / column.scale]);
+    }
+
+    function splitByCounts(items, counts) {
+        const groups = [];
+        let start = 0;
+        for (const count of counts) {
+            groups.push(items.slice(start, start + count));
+            start += count;
+        }
+        return groups;
+    }
+
+    function decodeColumn(column, palette) {
+        switch (column.kind) {
+            case 'number':
+                return unpackInts(column.data).map(v => v / column.scale);
+            case 'int':
+                return unpackInts(column.data);
+            case 'color':
+                return unpackInts(column.data).map(i => palette[i]);
+            case 'enum':
+                return unpackInts(column.data).map(i => column.values[i]);
+            case 'point':
+                return decodePoints(column);
+            case 'points':
+                return splitByCounts(decodePoints(column), unpackInts(column.count));
+            case 'records':
+                return splitByCounts(decodeTable(column.table, palette), unpackInts(column.count));
+            default:
+                throw new Error(`Unknown compact field kind: ${column.kind}`);
+        }
+    }
+
+    function decodeTable(table, palette) {
+        const records = Array.from({ length: table.count }, () => ({}));
+        for (const column of table.fields) {
+            const values = decodeColumn(column, palette);
+            let targets = records;
+            if (column.mask !== undefined) {
+                const mask = unpackInts(column.mask);
+                targets = records.filter((_, i) => mask[i]);
+            }
+            const path = column.name.split('.');
+            const leaf = path.pop();
+            targets.forEach((record, i) => {
+                for (const part of path) {
+                    record = record[part] || (record[part] = {});
+                }
+                record[leaf] = values[i];
+            });
+        }
+        return records;
+    }
+
+    function decodeCompact(payload) {
+        if (Array.isArray(payload)) return payload.map(decodeCompact);
+        if (payload === null || typeof payload !== 'object') return payload;
+
+        const result = {};
+        if (payload.encoding === ENCODING) {
+            for (const [key, value] of Object.entries(payload)) {
+                if (key === 'encoding' || key === 'palette') continue;
+                result[key] = value && value.fields ? decodeTable(value, payload.palette) : value;
+            }
+            return result;
+        }
+        for (const [key, value] of Object.entries(payload)) {
+            result[key] = decodeCompact(value);
+        }
+        return result;
+    }
+
+    global.decodeCompact = decodeCompact;
+})(window);
@@ -0,0 +1,143 @@
+// Client for the circular and geometric edit sessions (blueprints/patterns/pattern_edits.py).
+//
+// const editor = new EditSession('geometric');
+// const pattern = await editor.update(params);
+//
+// The first update starts a session and receives the whole pattern; later
+// updates send the new params with the revision this client holds and apply
+// the returned ops. Patterns come back with palette colours filled in.
+// reset() forgets the session, so the next update starts one with a new seed.
+// Replies are requested with ?encoding=compact and decoded with decodeCompact
+// (compact_decoder.js, which must be loaded first); a compact pattern's
+// palette arrives next to it.
+// Busy (429/503) replies are retried after their Retry-After; other errors
+// reject the update with the server's message.
+
+(function (global) {
+    const MAX_RETRIES = 3;
+
+    async function fetchJSON(url) {
+        for (let attempt = 0; ; attempt++) {
+            const response = await fetch(url);
+            if (response.ok) {
+                return response.json();
+            }
+            if ((response.status === 429 || response.status === 503) && attempt < MAX_RETRIES) {
+                const seconds = Number(response.headers.get('Retry-After')) || 1;
+                await new Promise(resolve => setTimeout(resolve, seconds * 1000));
+                continue;
+            }
+            const body = await response.json().catch(() => ({}));
+            const error = new Error(body.error || `${response.status} ${response.statusText}`);
+            error.status = response.status;
+            throw error;
+        }
+    }
+
+    function rotatePoint(point, degrees) {
+        const a = degrees * Math.PI / 180;
+        const c = Math.cos(a);
+        const s = Math.sin(a);
+        return [point[0] * c - point[1] * s, point[0] * s + point[1] * c];
+    }
+
+    function rotateShape(shape, degrees) {
+        if (shape.points) {
+            return { ...shape, points: shape.points.map(p => rotatePoint(p, degrees)) };
+        }
+        return { ...shape, start: rotatePoint(shape.start, degrees), end: rotatePoint(shape.end, degrees) };
+    }
+
+    function withPalette(pattern, palette) {
+        return palette ? { ...pattern, palette } : pattern;
+    }
+
+    function applyEditOps(pattern, ops) {
+        for (const { op, ...args } of ops) {
+            switch (op) {
+                case 'replace':
+                    pattern = withPalette(args.pattern, args.palette);
+                    break;
+                case 'palette':
+                    pattern = { ...pattern, palette: args.palette };
+                    break;
+                case 'rotate':
+                    pattern = { ...pattern, shapes: pattern.shapes.map(s => rotateShape(s, args.degrees)) };
+                    break;
+                case 'truncate':
+                    pattern = { ...pattern };
+                    for (const [name, count] of Object.entries(args)) pattern[name] = pattern[name].slice(0, count);
+                    break;
+                case 'append':
+                    pattern = { ...pattern };
+                    for (const [name, items] of Object.entries(args)) pattern[name] = pattern[name].concat(items);
+                    break;
+                default:
+                    throw new Error(`Unknown edit op: ${op}`);
+            }
+        }
+        return pattern;
+    }
+
+    // Elements carry palette indices; look them up for drawing
+    function resolvePalette(pattern) {
+        const palette = pattern.palette;
+        const color = element => ({ ...element, color: palette[element.color] });
+        const resolved = { ...pattern, colors: palette };
+        if (pattern.circles) {
+            resolved.circles = pattern.circles.map(circle => ({ ...color(circle), points: circle.points.map(color) }));
+            resolved.connections = pattern.connections.map(color);
+        }
+        if (pattern.shapes) {
+            resolved.shapes = pattern.shapes.map(color);
+        }
+        return resolved;
+    }
+
+    class EditSession {
+        constructor(kind) {
+            this.kind = kind;
+            this.reset();
+        }
+
+        reset() {
+            this.id = null;
+            this.revision = 0;
+            this.pattern = null;
+        }
+
+        // Edits are sent one at a time, so each applies to the revision before it
+        update(params) {
+            const next = (this.pending || Promise.resolve()).catch(() => {}).then(() => this._update(params));
+            this.pending = next;
+            return next;
+        }
+
+        async _update(params) {
+            const query = new URLSearchParams(params);
+            query.set('encoding', 'compact');
+            if (this.id === null) {
+                const data = decodeCompact(await fetchJSON(`/${this.kind}/edit?${query}`));
+                this.id = data.id;
+                this.revision = data.revision;
+                this.pattern = withPalette(data.pattern, data.palette);
+            } else {
+                query.set('revision', this.revision);
+                let data;
+                try {
+                    data = decodeCompact(await fetchJSON(`/${this.kind}/edit/${this.id}?${query}`));
+                } catch (error) {
+                    if (error.status !== 404) throw error;
+                    this.reset();
+                    return this._update(params);
+                }
+                this.revision = data.revision;
+                this.pattern = applyEditOps(this.pattern, data.ops);
+            }
+            return resolvePalette(this.pattern);
+        }
+    }
+
+    global.applyEditOps = applyEditOps;
+    global.EditSession = EditSession;
+})(window);
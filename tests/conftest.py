@@ -18,4 +18,11 @@ def client(app):
 @pytest.fixture
 def runner(app):
     """Create test CLI runner."""
-    return app.test_cli_runner() 
\ No newline at end of file
+    return app.test_cli_runner() 
+
+@pytest.fixture(autouse=True)
+def scheduler_disabled():
+    """Keep per-client rate limits from carrying over between tests."""
+    flask_app.config['SCHEDULER_ENABLED'] = False
+    yield
+    flask_app.config['SCHEDULER_ENABLED'] = True
@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+import pytest
+from app import app
+from blueprints.core.compact_encoding import unpack_ints
+from blueprints.patterns.vine_pattern import VinePattern
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _lines(response):
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_rotation_deltas_reproduce_browser_rotation(client):
+    """Test summed deltas give every frame's angle at the browser's speed, without drift"""
+    lines = _lines(client.get('/circular/animate?seed=1&fps=30&duration=20'))
+    keyframe, batches = lines[0], lines[1:]
+    assert keyframe['type'] == 'keyframe' and keyframe['frames'] == 600
+    speed = keyframe['pattern']['rotationSpeed']
+
+    angle = keyframe['transform']['rotate']
+    frame = 1
+    for batch in batches:
+        assert batch['start'] == frame
+        assert batch['base']['rotate'] == pytest.approx(angle % 360)
+        for delta in batch['deltas']['rotate']:
+            angle += delta
+            assert angle == pytest.approx(frame * speed * 60 / 30, abs=1e-4)
+            frame += 1
+    assert frame == 600
+
+def test_compact_deltas(client):
+    """Test ?encoding=compact packs the keyframe and the deltas"""
+    plain = _lines(client.get('/geometric/animate?seed=3&duration=10'))
+    compact = _lines(client.get('/geometric/animate?seed=3&duration=10&encoding=compact'))
+    assert compact[0]['pattern']['encoding'] == 'compact-v1'
+    for a, b in zip(plain[1:], compact[1:]):
+        rotate = b['deltas']['rotate']
+        assert (unpack_ints(rotate['data']) / rotate['scale']).tolist() == pytest.approx(a['deltas']['rotate'])
+
+def test_vine_frames_add_the_grown_elements(client):
+    """Test vine frames add exactly the elements grown by each frame's step"""
+    lines = _lines(client.get('/vine/animate?seed=5&fps=20&duration=4&steps_per_second=10&max_length=6'))
+    keyframe, batches = lines[0], lines[1:]
+    assert keyframe['pattern']['segments'] == []
+
+    totals = {'segments': 0, 'leaves': 0, 'flowers': 0}
+    config = {'growth_pattern': 'climbing', 'max_length': 6, 'start_pos': (0.0, 0.0)}
+    for batch in batches:
+        for name in totals:
+            assert len(batch['added'][name]) == sum(batch['deltas'][name])
+        counts = np.array([batch['deltas'][name] for name in totals])
+        for i, frame in enumerate(range(batch['start'], batch['start'] + batch['count'])):
+            totals = {name: totals[name] + int(counts[j, i]) for j, name in enumerate(totals)}
+            vine = VinePattern.replay(config, 5, frame // 2)
+            assert totals == {'segments': len(vine.segments), 'leaves': len(vine.leaves), 'flowers': len(vine.flowers)}
+
+def test_rejects_bad_sequences(client):
+    """Test out-of-range fps, durations and growth rates answer 400"""
+    assert client.get('/circular/animate?fps=0').status_code == 400
+    assert client.get('/geometric/animate?duration=100000').status_code == 400
+    assert client.get('/vine/animate?steps_per_second=-1').status_code == 400
@@ -0,0 +1,85 @@
+import gzip
+import os
+import pytest
+from flask import Flask
+from jinja2 import ChoiceLoader
+from app import app
+from blueprints.core import assets
+from scripts.build_assets import build
+
+@pytest.fixture
+def built(tmp_path):
+    templates = tmp_path / 'templates'
+    (templates / 'demo').mkdir(parents=True)
+    (templates / 'demo' / 'index.html').write_text(
+        '<html><head><style>body { color: red; }</style></head>'
+        '<body><script src="https://d3js.org/d3.v7.min.js"></script>'
+        '<script>console.log("demo");</script></body></html>'
+    )
+    dist = tmp_path / 'dist'
+    out = tmp_path / 'out'
+    manifest = build(str(templates), str(tmp_path / 'static'), str(dist), str(out))
+    return manifest, dist, out
+
+@pytest.fixture
+def client(built):
+    _, dist, _ = built
+    app.config['TESTING'] = True
+    previous = app.config['ASSET_DIST_DIR']
+    app.config['ASSET_DIST_DIR'] = str(dist)
+    with app.test_client() as client:
+        yield client
+    app.config['ASSET_DIST_DIR'] = previous
+
+def test_inline_blocks_become_hashed_bundles(built):
+    """Test inline styles and scripts are moved into fingerprinted, gzipped bundles"""
+    manifest, dist, out = built
+    assert set(manifest) == {'pages/demo.css', 'pages/demo.js'}
+    js_path = dist / manifest['pages/demo.js']
+    assert gzip.decompress((dist / (manifest['pages/demo.js'] + '.gz')).read_bytes()) == js_path.read_bytes()
+    html = (out / 'demo' / 'index.html').read_text()
+    assert "{{ asset_url('pages/demo.js') }}" in html
+    assert 'https://d3js.org/d3.v7.min.js' in html
+    assert 'console.log' not in html
+
+def test_bundles_are_served_immutable_and_precompressed(built, client):
+    """Test bundles are served with immutable caching and the gzip copy when accepted"""
+    manifest, _, _ = built
+    rv = client.get('/assets/' + manifest['pages/demo.css'], headers={'Accept-Encoding': 'gzip'})
+    assert rv.status_code == 200
+    assert rv.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in rv.headers['Cache-Control']
+
+def test_assets_outside_dist_are_refused(client):
+    """Test an encoded ../ cannot reach files next to the dist directory"""
+    # The fixture's source templates sit beside dist
+    assert client.get('/assets/%2e%2e/templates/demo/index.html').status_code == 404
+    assert client.get('/assets/..%2ftemplates/demo/index.html').status_code == 404
+
+def test_pages_are_cached_with_etag(client):
+    """Test pattern pages answer revalidation with 304"""
+    rv = client.get('/vine/')
+    assert rv.status_code == 200
+    etag = rv.headers['ETag'].strip('"')
+    assert client.get('/vine/', headers={'If-None-Match': etag}).status_code == 304
+
+def _site(tmp_path, debug=False):
+    site = Flask('site', root_path=str(tmp_path))
+    site.debug = debug
+    site.config['ASSET_DIST_DIR'] = str(tmp_path / 'dist')
+    site.config['ASSET_TEMPLATE_DIR'] = str(tmp_path / 'out')
+    assets.init_app(site)
+    return site
+
+def test_build_is_ignored_when_stale_or_debugging(built, tmp_path):
+    """Test a leftover build never hides edited templates or applies in debug mode"""
+    manifest, _, _ = built
+    assert _site(tmp_path).extensions['asset_manifest'] == manifest
+    assert _site(tmp_path, debug=True).extensions['asset_manifest'] == {}
+
+    source = tmp_path / 'templates' / 'demo' / 'index.html'
+    later = os.path.getmtime(tmp_path / 'dist' / 'manifest.json') + 10
+    os.utime(source, (later, later))
+    site = _site(tmp_path)
+    assert site.extensions['asset_manifest'] == {}
+    assert not isinstance(site.jinja_env.loader, ChoiceLoader)
@@ -0,0 +1,71 @@
+import json
+import numpy as np
+import pytest
+from app import app
+from blueprints.core.compact_encoding import Field, decode, encode, pack_ints, unpack_ints
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _close(a, b, tolerance):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_close(a[k], b[k], tolerance) for k in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_close(x, y, tolerance) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return abs(a - b) <= tolerance
+    return a == b
+
+def test_varint_round_trip():
+    """Test delta varints round-trip small, negative and 64-bit values"""
+    values = [0, 1, -1, 63, -64, 300, -70000, 2 ** 40, -(2 ** 62), 5, 5, 5]
+    assert unpack_ints(pack_ints(values)).tolist() == values
+    assert unpack_ints(pack_ints([])).tolist() == []
+    # Slowly changing values cost one byte each
+    assert len(pack_ints(range(1000, 1300))) < 300 * 4 / 3 + 8
+
+def test_optional_and_nested_fields():
+    """Test masked fields, dotted names and nested records survive a round trip"""
+    tables = {'items': (
+        Field('kind', 'enum'),
+        Field('at.x', 'number', 4),
+        Field('end', 'point', 4),
+        Field('children', 'records', fields=(Field('color', 'color'),)),
+    )}
+    items = [
+        {'kind': 'line', 'at': {'x': 1.26}, 'end': (3, -4), 'children': [{'color': '#fff'}]},
+        {'kind': 'dot', 'at': {'x': -2.0}, 'children': []},
+    ]
+    encoded = json.loads(json.dumps(encode({'items': iter(items), 'speed': 0.3}, tables)))
+    decoded = decode(encoded)
+    assert decoded['speed'] == 0.3
+    assert decoded['items'][0] == {'kind': 'line', 'at': {'x': 1.25}, 'end': [3.0, -4.0], 'children': [{'color': '#fff'}]}
+    assert decoded['items'][1] == {'kind': 'dot', 'at': {'x': -2.0}, 'children': []}
+
+@pytest.mark.parametrize('url, tolerance', [
+    ('/circular/generate?circles=16&points=36&density=0.9&seed=3', 0.125),
+    ('/geometric/generate?layers=5&symmetry=8&seed=3', 0.125),
+])
+def test_compact_payload_matches_verbose(client, url, tolerance):
+    """Test compact payloads decode to the verbose payload within the grid and are much smaller"""
+    verbose = client.get(url).get_data()
+    compact = client.get(url + '&encoding=compact').get_data()
+    assert _close(json.loads(verbose), decode(json.loads(compact)), tolerance)
+    assert len(compact) * 5 < len(verbose)
+
+def test_compact_vine_growth(client):
+    """Test vine and garden grow responses support the compact encoding"""
+    vine_id = client.get('/vine/init?seed=4&max_length=20').get_json()['id']
+    verbose = client.get(f'/vine/grow/{vine_id}?step=150').get_json()
+    compact = client.get(f'/vine/grow/{vine_id}?step=150&encoding=compact').get_json()
+    assert compact['pattern']['encoding'] == 'compact-v1'
+    assert _close(verbose['pattern'], decode(compact['pattern']), 0.05)
+
+    garden_id = client.get('/vine/garden/init?count=20&seed=1&encoding=compact').get_json()['id']
+    data = client.get(f'/vine/garden/grow/{garden_id}?steps=5&encoding=compact').get_json()
+    segments = decode(data['pattern'])['segments']
+    assert segments and {'start', 'end', 'thickness', 'color', 'vine'} == set(segments[0])
+    assert np.isin([s['vine'] for s in segments], range(20)).all()
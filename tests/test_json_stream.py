@@ -0,0 +1,37 @@
+import json
+import numpy as np
+from app import app
+from blueprints.core.json_stream import iter_json
+from blueprints.patterns.vine_pattern import LeafType
+
+def test_encodes_numpy_enums_and_generators():
+    """Test NumPy values, enums and generators are encoded natively"""
+    value = {
+        'array': np.arange(6, dtype=np.float64).reshape(3, 2),
+        'scalar': np.int64(7),
+        'type': LeafType.MAPLE,
+        'items': ({'i': i} for i in range(3)),
+        'pos': (1.5, -2.0)
+    }
+    assert json.loads(''.join(iter_json(value))) == {
+        'array': [[0.0, 1.0], [2.0, 3.0], [4.0, 5.0]],
+        'scalar': 7,
+        'type': 'maple',
+        'items': [{'i': 0}, {'i': 1}, {'i': 2}],
+        'pos': [1.5, -2.0]
+    }
+
+def test_large_payloads_are_chunked():
+    """Test large lists are emitted incrementally and still decode identically"""
+    value = {'points': [{'x': i, 'y': [i] * 300} for i in range(2000)], 'empty': []}
+    chunks = list(iter_json(value, chunk_size=4096))
+    assert len(chunks) > 1
+    assert json.loads(''.join(chunks)) == value
+
+def test_generate_route_is_streamed():
+    """Test generate routes send a streamed JSON body"""
+    with app.test_client() as client:
+        rv = client.get('/circular/generate?circles=4&points=8')
+        assert rv.is_streamed
+        assert rv.mimetype == 'application/json'
+        assert len(rv.json['circles']) == 4
@@ -0,0 +1,27 @@
+from scripts.loadtest import Stats, endpoint_group, parse_log_line, percentile
+
+def test_parse_combined_log_line():
+    """Test nginx combined log lines yield the request path"""
+    line = ('172.18.0.1 - - [10/Oct/2024:13:55:36 +0000] "GET /vine/grow/abc HTTP/1.1" '
+            '200 512 "-" "Mozilla/5.0"')
+    timestamp, method, path = parse_log_line(line)
+    assert method == 'GET'
+    assert path == '/vine/grow/abc'
+    assert parse_log_line('not a log line') is None
+
+def test_percentile_nearest_rank():
+    """Test percentiles use the nearest-rank definition"""
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) == 0.0
+
+def test_vine_404s_are_reported_separately():
+    """Test grow 404s are classified as cross-worker vine misses"""
+    stats = Stats()
+    stats.record(endpoint_group('/vine/grow/abc'), 404, 0.01)
+    stats.record(endpoint_group('/vine/grow/def'), 200, 0.01)
+    summary = stats.summary(1.0)
+    grow = summary['groups']['/vine/grow/<id>']
+    assert grow['errors'] == {'vine_404': 1}
+    assert grow['error_rate'] == 0.5
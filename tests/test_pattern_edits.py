@@ -0,0 +1,222 @@
+import json
+import math
+import time
+
+import pytest
+from app import app
+from blueprints.core.compact_encoding import ENCODING, decode
+from blueprints.circular_pattern import generate_circular_pattern
+from blueprints.geometric_pattern import generate_geometric_pattern
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _get(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return json.loads(response.get_data(as_text=True))
+
+def _rotate(point, degrees):
+    c, s = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+    return [point[0] * c - point[1] * s, point[0] * s + point[1] * c]
+
+def _apply(pattern, ops):
+    """Apply edit ops the way the pages do"""
+    for op in ops:
+        if op['op'] == 'replace':
+            pattern = op['pattern']
+        elif op['op'] == 'palette':
+            pattern = dict(pattern, palette=op['palette'])
+        elif op['op'] == 'rotate':
+            shapes = []
+            for shape in pattern['shapes']:
+                if 'points' in shape:
+                    shape = dict(shape, points=[_rotate(p, op['degrees']) for p in shape['points']])
+                else:
+                    shape = dict(shape, start=_rotate(shape['start'], op['degrees']), end=_rotate(shape['end'], op['degrees']))
+                shapes.append(shape)
+            pattern = dict(pattern, shapes=shapes)
+        elif op['op'] == 'truncate':
+            pattern = dict(pattern, **{name: pattern[name][:n] for name, n in op.items() if name != 'op'})
+        elif op['op'] == 'append':
+            pattern = dict(pattern, **{name: pattern[name] + items for name, items in op.items() if name != 'op'})
+    return pattern
+
+def _resolve(pattern):
+    palette = pattern['palette']
+    resolved = json.loads(json.dumps(pattern))
+    for element in resolved.get('circles', []) + resolved.get('connections', []) + resolved.get('shapes', []):
+        element['color'] = palette[element['color']]
+        for point in element.get('points', []):
+            if isinstance(point, dict):
+                point['color'] = palette[point['color']]
+    return resolved
+
+def _assert_close(a, b, tolerance=1e-9):
+    if isinstance(a, dict):
+        assert a.keys() == b.keys()
+        for key in a:
+            _assert_close(a[key], b[key], tolerance)
+    elif isinstance(a, (list, tuple)):
+        assert len(a) == len(b)
+        for x, y in zip(a, b):
+            _assert_close(x, y, tolerance)
+    elif isinstance(a, float) or isinstance(b, float):
+        assert a == pytest.approx(b, abs=tolerance)
+    else:
+        assert a == b
+
+def _decoded(data):
+    """Decode compact objects anywhere in a reply, as decodeCompact does"""
+    if isinstance(data, list):
+        return [_decoded(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    if data.get('encoding') == ENCODING:
+        return decode(data)
+    return {key: _decoded(value) for key, value in data.items()}
+
+def _edit(client, base, session, query):
+    result = _get(client, f"/{base}/edit/{session['id']}?{query}&revision={session['revision']}")
+    session['pattern'] = _apply(session['pattern'], result['ops'])
+    session['revision'] = result['revision']
+    return result['ops']
+
+def test_circular_edits_match_fresh_patterns(client):
+    """Test patched circular patterns equal generating the new params from scratch"""
+    session = _get(client, '/circular/edit?seed=7&circles=4&points=12')
+    edits = [
+        ('circles=4&points=12&hue=0.2', ['palette']),
+        ('circles=6&points=12&hue=0.2', ['append']),
+        ('circles=2&points=12&hue=0.2', ['truncate']),
+        ('circles=5&points=12&hue=0.9&palette=analogous', ['palette', 'append']),
+        ('circles=5&points=8&hue=0.9&palette=analogous', ['replace']),
+    ]
+    for query, kinds in edits:
+        ops = _edit(client, 'circular', session, query)
+        assert [op['op'] for op in ops] == kinds
+
+        args = dict(part.split('=') for part in query.split('&'))
+        expected = generate_circular_pattern(
+            num_circles=int(args['circles']), num_points=int(args['points']), base_hue=float(args['hue']),
+            palette_type=args.get('palette', 'complementary'), seed=7)
+        pattern = _resolve(session['pattern'])
+        del pattern['palette']
+        _assert_close(pattern, expected)
+
+def test_geometric_edits_match_fresh_patterns(client):
+    """Test layer and rotation edits patch geometric patterns to what a fresh generate gives"""
+    session = _get(client, '/geometric/edit?seed=3&layers=3')
+    assert [op['op'] for op in _edit(client, 'geometric', session, 'layers=4')] == ['append']
+    assert [op['op'] for op in _edit(client, 'geometric', session, 'layers=2&rotation=30')] == ['rotate', 'truncate']
+
+    expected = generate_geometric_pattern(layers=2, rotation=30, seed=3)
+    pattern = _resolve(session['pattern'])
+    assert pattern.pop('palette') == expected.pop('colors')
+    _assert_close(pattern, expected)
+
+def test_recolor_sends_only_the_palette(client):
+    """Test a hue change is a palette op, much smaller than the pattern"""
+    session = _get(client, '/circular/edit?seed=1&circles=10&points=24')
+    response = client.get(f"/circular/edit/{session['id']}?circles=10&points=24&hue=0.1&revision=0")
+    ops = json.loads(response.get_data(as_text=True))['ops']
+    assert ops == [{'op': 'palette', 'palette': ops[0]['palette']}]
+    assert len(response.get_data()) * 20 < len(json.dumps(session['pattern']))
+
+def test_stale_revision_gets_a_replace(client):
+    """Test a client that missed a patch is sent the whole pattern"""
+    session = _get(client, '/geometric/edit?seed=5')
+    _get(client, f"/geometric/edit/{session['id']}?layers=4&revision=0")
+    result = _get(client, f"/geometric/edit/{session['id']}?layers=5&revision=0")
+    assert result['revision'] == 2
+    assert [op['op'] for op in result['ops']] == ['replace']
+    assert len({shape['layer'] for shape in result['ops'][0]['pattern']['shapes']}) <= 5
+
+def test_edit_session_rebuilt_from_store(client):
+    """Test another worker (an empty state cache) serves the session from its record"""
+    session = _get(client, '/circular/edit?seed=2&circles=3')
+    _edit(client, 'circular', session, 'circles=5')
+    cache = app.extensions['edit_states']
+    cache._states.clear()
+    _edit(client, 'circular', session, 'circles=6&hue=0.3')
+
+    pattern = _resolve(session['pattern'])
+    del pattern['palette']
+    _assert_close(pattern, generate_circular_pattern(num_circles=6, base_hue=0.3, seed=2))
+
+def test_unknown_edit_session(client):
+    """Test unknown sessions, and sessions of another kind, are 404s"""
+    assert client.get('/circular/edit/missing?revision=0').status_code == 404
+    session = _get(client, '/geometric/edit?seed=1')
+    assert client.get(f"/circular/edit/{session['id']}?revision=0").status_code == 404
+
+@pytest.mark.parametrize('base, start, queries', [
+    ('circular', 'circles=4&points=12', ['circles=6&points=12&hue=0.2', 'circles=3&points=12', 'circles=3&points=8']),
+    ('geometric', 'layers=3', ['layers=5', 'layers=4&rotation=30', 'layers=4&symmetry=5']),
+])
+def test_compact_edits_match_verbose(client, base, start, queries):
+    """Test compact start and edit replies decode to the verbose ones, keeping colour indices and the palette"""
+    verbose = _get(client, f'/{base}/edit?seed=6&{start}')
+    compact = _decoded(_get(client, f'/{base}/edit?seed=6&{start}&encoding=compact'))
+    assert compact['palette'] == verbose['pattern']['palette']
+    _assert_close(dict(compact['pattern'], palette=compact['palette']), verbose['pattern'], 0.13)
+
+    for revision, query in enumerate(queries):
+        expected = _get(client, f"/{base}/edit/{verbose['id']}?{query}&revision={revision}")['ops']
+        ops = _decoded(_get(client, f"/{base}/edit/{compact['id']}?{query}&revision={revision}&encoding=compact"))['ops']
+        for op in ops:
+            if op['op'] == 'replace':
+                op['pattern']['palette'] = op.pop('palette')
+        _assert_close(ops, expected, 0.13)
+
+def test_rebuilding_edits_cost_a_full_render(client):
+    """Test patches are charged a fraction of a render, and rebuilds what generating the pattern costs"""
+    session = _get(client, '/circular/edit?seed=4&circles=8&points=96')
+    cache = app.extensions['edit_states']
+    record = app.extensions['edit_sessions'].get(session['id'])
+    params = dict(record.params)
+
+    def cost(revision=0, **changes):
+        return cache.edit_cost(session['id'], record, 'circular', dict(params, **changes), revision, 10)
+
+    assert cost(base_hue=0.2) == 0.25
+    assert cost(num_circles=4) == 0.25
+    assert cost(num_circles=16) == 5
+    assert cost(num_points=48) == 10
+    assert cost(revision=1, base_hue=0.2) == 10
+    assert cache.edit_cost(session['id'], record, 'geometric', params, 0, 10) == 0.25
+    assert cache.edit_cost('missing', None, 'circular', params, 0, 10) == 0.25
+
+def test_rebuilding_edits_are_rate_limited(client):
+    """Test repeated rebuilds of a large pattern drain the client's bucket while recolours do not"""
+    session = _get(client, '/circular/edit?seed=4&circles=40&points=96')
+    app.config['SCHEDULER_ENABLED'] = True
+    for revision in range(20):
+        response = client.get(f"/circular/edit/{session['id']}?circles=40&points=96&hue={revision / 20}"
+                              f"&revision={revision}", buffered=True)
+        assert response.status_code == 200
+    statuses = {client.get(f"/circular/edit/{session['id']}?circles=40&points={points}&revision=20",
+                           buffered=True).status_code for points in range(90, 110)}
+    assert 429 in statuses
+
+def test_edit_sessions_expire_after_their_last_edit(client):
+    """Test edit sessions are kept in their own store for EDIT_SESSION_TTL after each edit"""
+    session = _get(client, '/circular/edit?seed=3&circles=3')
+    store = app.extensions['edit_sessions']
+    assert app.extensions['vine_sessions'].get(session['id']) is None
+    record = store.get(session['id'])
+    assert record.kind == 'circular' and record.revision == 0
+    assert record.expires == pytest.approx(time.time() + app.config['EDIT_SESSION_TTL'], abs=5)
+
+    record.expires = time.time() + 1
+    store.put(session['id'], record)
+    _edit(client, 'circular', session, 'circles=4')
+    assert store.get(session['id']).expires > time.time() + 60
+
+    record = store.get(session['id'])
+    record.expires = 0
+    store.put(session['id'], record)
+    assert client.get(f"/circular/edit/{session['id']}?circles=5&revision=1").status_code == 404
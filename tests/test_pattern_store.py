@@ -0,0 +1,53 @@
+import pytest
+from app import app
+from blueprints.circular_pattern import generate_circular_pattern
+from blueprints.core.pattern_store import PatternStore, build_store
+
+CIRCULAR_DEFAULTS = {
+    'num_circles': 8,
+    'num_points': 12,
+    'connection_density': 0.7,
+    'symmetry': 1,
+    'base_hue': 0.5,
+    'palette_type': 'complementary'
+}
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = str(tmp_path / 'store.bin')
+    build_store(path, [
+        ('circular', CIRCULAR_DEFAULTS, seed, generate_circular_pattern(seed=seed, **CIRCULAR_DEFAULTS))
+        for seed in range(2)
+    ])
+    return path
+
+@pytest.fixture
+def client(store_path):
+    app.config['TESTING'] = True
+    previous = app.extensions.get('pattern_store')
+    app.extensions['pattern_store'] = PatternStore(store_path)
+    with app.test_client() as client:
+        yield client
+    app.extensions['pattern_store'].close()
+    app.extensions['pattern_store'] = previous
+
+def test_seeded_generation_is_reproducible():
+    """Test the same seed always produces the same pattern"""
+    assert generate_circular_pattern(seed=3) == generate_circular_pattern(seed=3)
+
+def test_lookup_normalises_numbers(store_path):
+    """Test ints and floats map to the same store entry"""
+    store = PatternStore(store_path)
+    params = dict(CIRCULAR_DEFAULTS, num_circles=8.0, base_hue=0.5)
+    assert store.lookup('circular', params, seed=1) is not None
+    assert store.lookup('circular', params, seed=5) is None
+    assert store.lookup('circular', dict(CIRCULAR_DEFAULTS, num_circles=9)) is None
+    store.close()
+
+def test_generate_route_serves_stored_payload(client):
+    """Test a default request is answered from the store"""
+    rv = client.get('/circular/generate?seed=1')
+    assert rv.status_code == 200
+    expected = generate_circular_pattern(seed=1, **CIRCULAR_DEFAULTS)
+    assert rv.json['rotationSpeed'] == expected['rotationSpeed']
+    assert len(rv.json['circles']) == 8
@@ -0,0 +1,111 @@
+import pytest
+from app import app
+from blueprints.composite_pattern import _estimated_cost
+from blueprints.core.pipeline import Pipeline, Stage, StageCache
+from blueprints.patterns.composite import CircularMotif, MotifFill, PaletteStage, TessellationCells
+
+class Counter(Stage):
+    pattern_type = 'counter'
+    defaults = {'value': 0}
+
+    def run(self, **inputs):
+        return {'value': self.config['value'] + sum(i['value'] for i in inputs.values())}
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    previous = app.extensions['pipeline_cache']
+    app.extensions['pipeline_cache'] = StageCache()
+    with app.test_client() as client:
+        yield client
+    app.extensions['pipeline_cache'] = previous
+
+def test_downstream_change_reuses_upstream_outputs():
+    """Test changing a downstream stage only reruns that stage"""
+    cache = StageCache()
+    base = Counter({'value': 1})
+    assert Pipeline(cache).evaluate(Counter({'value': 10}, base=base)) == {'value': 11}
+
+    pipeline = Pipeline(cache)
+    assert pipeline.evaluate(Counter({'value': 20}, base=Counter({'value': 1}))) == {'value': 21}
+    assert pipeline.runs == ['counter']
+
+    # Upstream changes propagate through the keys
+    pipeline = Pipeline(cache)
+    assert pipeline.evaluate(Counter({'value': 20}, base=Counter({'value': 2}))) == {'value': 22}
+    assert pipeline.runs == ['counter', 'counter']
+
+def test_shared_subgraphs_run_once_per_batch():
+    """Test a batch computes each distinct stage once, even across separately built graphs"""
+    pipeline = Pipeline()
+    stages = [Counter({'value': v}, base=Counter({'value': 1})) for v in (1, 2, 3, 1)]
+    assert [out['value'] for out in pipeline.evaluate_many(stages)] == [2, 3, 4, 2]
+    assert len(pipeline.runs) == 4  # the shared base plus three distinct tops
+
+def test_cache_evicts_least_recently_used():
+    """Test the stage cache stays within its size"""
+    cache = StageCache(max_entries=2)
+    for v in range(3):
+        Pipeline(cache).evaluate(Counter({'value': v}))
+    assert cache.stats()['entries'] == 2
+    pipeline = Pipeline(cache)
+    pipeline.evaluate(Counter({'value': 0}))
+    assert pipeline.runs == ['counter']
+
+def test_unknown_options_are_rejected():
+    """Test stages reject config keys they do not know"""
+    with pytest.raises(ValueError):
+        Counter({'valeu': 1})
+
+def test_motif_fill_scales_motif_into_cells():
+    """Test every cell gets a placement that keeps the motif inside its inner circle"""
+    palette = PaletteStage({'palette_type': 'triadic'})
+    output = MotifFill(
+        cells=TessellationCells({'pattern_type': 'square', 'cell_size': 100, 'width': 400, 'height': 400}),
+        motif=CircularMotif({'num_circles': 3, 'seed': 1}, palette=palette)
+    ).generate()
+    cells = output['tiling']['cells']
+    assert len(cells) == len(output['placements']) == 25
+    assert all(cell['radius'] == pytest.approx(50) for cell in cells)
+    assert output['placements'][0]['scale'] == pytest.approx(50 * 0.9 / 110)
+    colors = set(palette.generate()['colors'])
+    assert {point['color'] for circle in output['motif']['circles'] for point in circle['points']} <= colors
+
+def test_composite_route_batches_share_stages(client):
+    """Test a batch of seeds shares the palette and tiling stages through the route"""
+    response = client.get('/composite/generate?recipe=tiled_motifs&seeds=1,2,3&tiling=triangular')
+    data = response.get_json()
+    assert response.status_code == 200
+    assert [p['seed'] for p in data['patterns']] == [1, 2, 3]
+    assert data['stagesRun'].count('palette') == 1
+    assert data['stagesRun'].count('tessellation_cells') == 1
+    assert data['stagesRun'].count('circular_motif') == 3
+
+    data = client.get('/composite/generate?recipe=vine_outline&seed=4').get_json()
+    assert data['patterns'][0]['vines']['segments']
+    assert client.get('/composite/generate?recipe=vine_outline&seed=4').get_json()['stagesRun'] == []
+    assert client.get('/composite/generate?recipe=unknown').status_code == 400
+
+@pytest.mark.parametrize('query', [
+    'recipe=tiled_motifs&tiling=square&cell_size=1',
+    'recipe=tiled_motifs&tiling=hexagonal&width=1e9',
+    'recipe=tiled_motifs&tiling=triangular&cell_size=inf',
+    'recipe=vine_outline&max_length=40',
+    'recipe=vine_outline&max_length=100000',
+    'recipe=vine_outline&layers=200&symmetry=12',
+    'recipe=tiled_motifs&circles=200&points=200',
+    'recipe=tiled_motifs&cell_size=0',
+    'recipe=vine_outline&max_length=20&seeds=' + ','.join(map(str, range(32))),
+])
+def test_composite_route_refuses_oversized_work(client, query):
+    """Test oversized tilings, motifs, outlines and sprigs get 400 instead of running"""
+    assert client.get(f'/composite/generate?seed=1&{query}').status_code == 400
+
+def test_composite_cost_follows_the_work(client):
+    """Test the scheduler charges by motif, outline and batch size, with the defaults costing 1"""
+    with app.test_request_context('/composite/generate?seed=1'):
+        assert _estimated_cost() == pytest.approx(1)
+    with app.test_request_context('/composite/generate?recipe=vine_outline&seed=1'):
+        assert _estimated_cost() == pytest.approx(1)
+    with app.test_request_context('/composite/generate?recipe=vine_outline&layers=6&seeds=1,2'):
+        assert _estimated_cost() == pytest.approx(2 * 6 * 6 * 9 / 108)
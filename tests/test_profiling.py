@@ -0,0 +1,50 @@
+import pytest
+from app import app
+
+@pytest.fixture
+def client(tmp_path):
+    app.config['TESTING'] = True
+    keys = ('PROFILING_ENABLED', 'PROFILING_TOKEN', 'PROFILING_MODE', 'PROFILING_DIR')
+    previous = {key: app.config[key] for key in keys}
+    app.config.update(PROFILING_ENABLED=True, PROFILING_TOKEN='secret',
+                      PROFILING_MODE='sampling', PROFILING_DIR=str(tmp_path))
+    with app.test_client() as client:
+        yield client
+    app.config.update(previous)
+
+def test_requests_without_token_are_not_profiled(client, tmp_path):
+    """Test profiling needs the feature flag and the right token"""
+    for headers in ({}, {'X-Profile': 'wrong'}):
+        response = client.get('/circular/generate?seed=1', headers=headers)
+        assert response.status_code == 200
+        assert 'X-Profile-Report' not in response.headers
+
+    app.config['PROFILING_ENABLED'] = False
+    response = client.get('/circular/generate?seed=1', headers={'X-Profile': 'secret'})
+    assert 'X-Profile-Report' not in response.headers
+    assert not list(tmp_path.iterdir())
+
+def test_sampling_profile_writes_collapsed_stacks(client, tmp_path):
+    """Test a profiled request returns its body and writes a flamegraph and allocation report"""
+    plain = client.get('/circular/generate?seed=1&circles=20').get_json()
+    response = client.get('/circular/generate?seed=1&circles=20', headers={'X-Profile': 'secret'})
+    assert response.status_code == 200
+    assert response.get_json() == plain
+
+    name = response.headers['X-Profile-Report']
+    assert (tmp_path / f'{name}.collapsed').exists()
+    for line in (tmp_path / f'{name}.collapsed').read_text().splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert stack and int(count) > 0
+    alloc = (tmp_path / f'{name}.alloc.txt').read_text()
+    assert alloc.startswith('GET /circular/generate?seed=1&circles=20')
+    assert 'peak traced memory' in alloc
+
+def test_cprofile_mode(client, tmp_path):
+    """Test X-Profile-Mode selects cProfile and writes its stats"""
+    response = client.get('/geometric/generate?seed=1',
+                          headers={'X-Profile': 'secret', 'X-Profile-Mode': 'cprofile'})
+    name = response.headers['X-Profile-Report']
+    assert (tmp_path / f'{name}.prof').exists()
+    assert 'cumulative' in (tmp_path / f'{name}.top.txt').read_text()
+    assert not (tmp_path / f'{name}.collapsed').exists()
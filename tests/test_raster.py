@@ -0,0 +1,88 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+from app import app
+from blueprints.core.raster import Canvas, encode_png
+from blueprints.core.svg import PADDING
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _decode_png(data):
+    """Decode the 8-bit RGB PNGs encode_png writes (Sub filter on every row)"""
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    pos, idat = 8, b''
+    while pos < len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        assert struct.unpack('>I', data[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(kind + chunk)
+        if kind == b'IHDR':
+            width, height = struct.unpack('>II', chunk[:8])
+        elif kind == b'IDAT':
+            idat += chunk
+        pos += 12 + length
+    rows = np.frombuffer(zlib.decompress(idat), dtype=np.uint8).reshape(height, width * 3 + 1)
+    assert (rows[:, 0] == 1).all()
+    pixels = rows[:, 1:].reshape(height, width, 3).astype(np.int64)
+    return (np.cumsum(pixels, axis=1) % 256).astype(np.uint8)
+
+def test_encode_png_round_trip():
+    """Test encoded PNGs decode to the original pixels"""
+    pixels = np.random.default_rng(0).integers(0, 256, (17, 23, 3), dtype=np.uint8)
+    assert (_decode_png(encode_png(pixels)) == pixels).all()
+
+def test_edges_are_anti_aliased():
+    """Test a polygon edge through the middle of a pixel half covers it"""
+    # Bounds that map world units to pixels one to one once padded
+    canvas = Canvas(10, (PADDING, PADDING, 10 - PADDING, 10 - PADDING))
+    canvas.polygons([[(2, 2), (5.5, 2), (5.5, 8), (2, 8)]], ['#000000'])
+    assert canvas.pixels[4, 4] == pytest.approx([0, 0, 0])
+    assert canvas.pixels[4, 5] == pytest.approx([0.5, 0.5, 0.5])
+    assert canvas.pixels[4, 6] == pytest.approx([1, 1, 1])
+
+@pytest.mark.parametrize('url', [
+    '/circular/thumb.png?seed=1',
+    '/geometric/thumb.png?seed=2&layers=5',
+    '/tessellation/thumb.png?seed=3&pattern=hexagonal',
+    '/tessellation/thumb.png?seed=3&pattern=penrose',
+    '/vine/thumb.png?seed=4',
+])
+def test_thumbnails(client, url):
+    """Test every 2D pattern renders a small PNG of the requested size"""
+    response = client.get(url + '&size=64')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert len(response.data) < 20000
+    pixels = _decode_png(response.data)
+    assert pixels.shape == (64, 64, 3)
+    # Something was drawn on the white background
+    assert (pixels != 255).any()
+
+def test_thumbnails_are_cached(client):
+    """Test seeded thumbnails come from the cache and revalidate by ETag"""
+    cache = app.extensions['thumbnail_cache']
+    first = client.get('/circular/thumb.png?seed=11&circles=5')
+    hits = cache.stats()['hits']
+    second = client.get('/circular/thumb.png?seed=11&circles=5')
+    assert second.data == first.data
+    assert cache.stats()['hits'] == hits + 1
+    assert 'max-age' in second.headers['Cache-Control']
+
+    revalidated = client.get('/circular/thumb.png?seed=11&circles=5', headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304
+
+    unseeded = client.get('/circular/thumb.png?circles=5')
+    assert unseeded.status_code == 200 and 'ETag' not in unseeded.headers
+
+def test_thumbnail_size_is_validated(client):
+    """Test only the fixed thumbnail sizes are accepted"""
+    assert client.get('/geometric/thumb.png?size=1000').status_code == 400
+
+def test_vine_thumbnail_depth_is_bounded(client):
+    """Test vines too deep to grow to completion in a request are refused"""
+    assert client.get('/vine/thumb.png?seed=1&max_length=200').status_code == 400
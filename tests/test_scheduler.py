@@ -0,0 +1,96 @@
+import threading
+import pytest
+from app import app
+from blueprints.core.scheduler import FairScheduler, Lane, TokenBucket
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SCHEDULER_ENABLED'] = True
+    previous = app.extensions['scheduler']
+    app.extensions['scheduler'] = FairScheduler(
+        rate=1.0, burst=3.0,
+        lanes={'interactive': {'concurrency': 1, 'queue': 1, 'timeout': 0.05},
+               'bulk': {'concurrency': 1, 'queue': 0, 'timeout': 0.05}}
+    )
+    with app.test_client() as client:
+        yield client
+    app.extensions['scheduler'] = previous
+
+def test_token_bucket_refills_over_time():
+    """Test the bucket charges cost and reports how long to wait"""
+    bucket = TokenBucket(rate=2.0, burst=4.0, now=0.0)
+    assert bucket.take(3, now=0.0) == 0
+    assert bucket.take(3, now=0.0) == pytest.approx(1.0)
+    assert bucket.take(3, now=1.0) == 0
+    # Requests larger than the burst still get through once the bucket is full
+    assert bucket.take(10, now=100.0) == 0
+
+def test_expensive_requests_are_rate_limited_per_client(client):
+    """Test costly requests drain a client's bucket faster and get 429"""
+    # buffered=True closes each response, as the server does once it is sent
+    assert client.get('/circular/generate?circles=12&points=16&seed=1', buffered=True).status_code == 200
+    response = client.get('/circular/generate?circles=12&points=16&seed=1', buffered=True)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    # Other clients have their own bucket
+    other = client.get('/circular/generate?seed=1', headers={'X-Real-IP': '10.0.0.2'}, buffered=True)
+    assert other.status_code == 200
+
+def test_unscheduled_routes_are_not_charged(client):
+    """Test pages and health checks bypass the scheduler"""
+    for _ in range(10):
+        assert client.get('/health').status_code == 200
+    assert app.extensions['scheduler'].stats()['clients'] == 0
+
+def test_full_lane_rejects_fast():
+    """Test a lane with no free slot and a full queue refuses immediately"""
+    lane = Lane('bulk', concurrency=1, queue=1, timeout=1.0)
+    assert lane.acquire() == 'ok'
+    waiter = threading.Thread(target=lambda: lane.acquire() == 'ok' and lane.release())
+    waiter.start()
+    while lane.stats()['waiting'] == 0:
+        pass
+    assert lane.acquire() == 'full'
+    lane.release()
+    waiter.join()
+    stats = lane.stats()
+    assert stats['active'] == 0
+    assert stats['rejected_full'] == 1
+    assert stats['max_waiting'] == 1
+
+def test_busy_lane_times_out_with_503(client):
+    """Test bulk requests get 503 while the bulk lane is busy, without blocking polls"""
+    scheduler = app.extensions['scheduler']
+    assert scheduler.lanes['bulk'].acquire() == 'ok'
+    try:
+        response = client.get('/tessellation/generate?seed=1')
+        assert response.status_code == 503
+        assert client.get('/vine/init?seed=1', buffered=True).status_code == 200
+    finally:
+        scheduler.lanes['bulk'].release()
+    assert client.get('/tessellation/generate?seed=1', buffered=True).status_code == 200
+
+def test_metrics_report_lane_depths(client):
+    """Test /metrics exposes per-lane queue depth and rejection counts"""
+    client.get('/vine/init?seed=1', buffered=True)
+    data = client.get('/metrics').get_json()
+    lanes = data['scheduler']['lanes']
+    assert set(lanes) == {'interactive', 'bulk'}
+    assert lanes['interactive']['admitted'] == 1
+    assert lanes['interactive']['active'] == 0
+    assert {'waiting', 'max_waiting', 'rejected_full', 'rejected_timeout'} <= set(lanes['bulk'])
+
+def test_streamed_responses_hold_their_slot(client):
+    """Test a streamed body keeps its lane slot until the server closes it"""
+    bulk = app.extensions['scheduler'].lanes['bulk']
+    response = client.get('/circular/animate?seed=1&frames=4', buffered=False)
+    assert response.status_code == 200
+    assert bulk.stats()['active'] == 1
+    b''.join(response.response)
+    assert bulk.stats()['active'] == 1
+    response.close()
+    assert bulk.stats()['active'] == 0
+    # Error responses are not streamed and are released at teardown
+    assert client.get('/circular/animate?fps=0').status_code == 400
+    assert bulk.stats()['active'] == 0
@@ -0,0 +1,71 @@
+import pytest
+from app import app
+from blueprints.core.scheduler import DEFAULT_LANES, FairScheduler
+from blueprints.core.sharding import node_of
+from blueprints.patterns.pattern_edits import EditSession
+from blueprints.patterns.vine_session import FileVineSessionStore, VineReplayCache
+
+@pytest.fixture
+def client(tmp_path):
+    app.config['TESTING'] = True
+    previous = (app.config['NODE_ID'], app.config['NODE_DRAIN_FILE'], app.extensions['vine_sessions'],
+                app.extensions['edit_sessions'], app.extensions['vine_replay_cache'])
+    app.config['NODE_ID'] = 'web1'
+    app.config['NODE_DRAIN_FILE'] = str(tmp_path / 'drain')
+    app.extensions['vine_sessions'] = FileVineSessionStore(str(tmp_path / 'sessions'))
+    app.extensions['edit_sessions'] = FileVineSessionStore(str(tmp_path / 'sessions' / 'edits'), EditSession)
+    with app.test_client() as client:
+        yield client
+    (app.config['NODE_ID'], app.config['NODE_DRAIN_FILE'], app.extensions['vine_sessions'],
+     app.extensions['edit_sessions'], app.extensions['vine_replay_cache']) = previous
+
+def test_session_ids_name_their_node(client):
+    """Test vine and garden IDs carry the issuing node's ID"""
+    vine_id = client.get('/vine/init?seed=1').get_json()['id']
+    garden_id = client.get('/vine/garden/init?count=3&seed=1').get_json()['id']
+    assert node_of(vine_id) == 'web1'
+    assert node_of(garden_id) == 'web1'
+    assert node_of('3f2b8c1e-0000-4000-8000-000000000000') is None
+
+def test_draining_node_hands_off_without_advancing(client, tmp_path):
+    """Test a draining node refuses vine calls and another node continues the session"""
+    vine_id = client.get('/vine/init?seed=1&max_length=20').get_json()['id']
+    assert client.get(f'/vine/grow/{vine_id}').get_json()['step'] == 1
+
+    (tmp_path / 'drain').touch()
+    response = client.get(f'/vine/grow/{vine_id}')
+    assert response.status_code == 503
+    assert client.get('/vine/init').status_code == 503
+    assert client.get('/health').get_json()['draining'] is True
+
+    # Another node shares the session directory but starts with a cold replay cache
+    (tmp_path / 'drain').unlink()
+    app.config['NODE_ID'] = 'web2'
+    app.extensions['vine_replay_cache'] = VineReplayCache()
+    data = client.get(f'/vine/grow/{vine_id}').get_json()
+    assert data['step'] == 2
+
+def test_edit_sessions_are_routed_like_vines(client, tmp_path):
+    """Test edit session IDs name their node and a draining node hands edits off"""
+    started = client.get('/geometric/edit?seed=1').get_json()
+    assert node_of(started['id']) == 'web1'
+
+    (tmp_path / 'drain').touch()
+    assert client.get(f"/geometric/edit/{started['id']}?revision=0&layers=4").status_code == 503
+    (tmp_path / 'drain').unlink()
+    app.config['NODE_ID'] = 'web2'
+    edited = client.get(f"/geometric/edit/{started['id']}?revision=0&layers=4").get_json()
+    assert edited['revision'] == 1
+
+def test_draining_node_does_not_charge_refused_requests(client, tmp_path):
+    """Test requests a draining node hands off are not billed to the client"""
+    previous = app.extensions['scheduler']
+    app.extensions['scheduler'] = FairScheduler(rate=1.0, burst=1.0, lanes=DEFAULT_LANES)
+    app.config['SCHEDULER_ENABLED'] = True
+    try:
+        (tmp_path / 'drain').touch()
+        for _ in range(3):
+            assert client.get('/vine/init?seed=1').status_code == 503
+        assert app.extensions['scheduler'].stats()['clients'] == 0
+    finally:
+        app.extensions['scheduler'] = previous
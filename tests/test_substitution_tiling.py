@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from app import app
+from blueprints.patterns import substitution_tiling
+from blueprints.patterns.substitution_tiling import RULES, SubstitutionTiling, _expansion, substitute
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _area(verts):
+    edges = verts[:, 1:] - verts[:, :1]
+    return np.abs(edges[:, 0, 0] * edges[:, 1, 1] - edges[:, 0, 1] * edges[:, 1, 0]).sum() / 2
+
+def _centroids(chunks):
+    return {tuple(c) for _, verts in chunks for c in np.round(verts.mean(axis=1), 6).tolist()}
+
+@pytest.mark.parametrize('rule', list(RULES))
+def test_substitution_covers_parent(rule):
+    """Test every level of substitution exactly covers the prototiles"""
+    _, _, (kinds, verts), _ = RULES[rule]
+    for depth in range(4):
+        _, children = substitute(rule, kinds, verts, depth)
+        assert _area(children) == pytest.approx(_area(verts))
+
+@pytest.mark.parametrize('rule', list(RULES))
+def test_lazy_subdivision_matches_full_expansion(rule, monkeypatch):
+    """Test culled subdivision yields exactly the visible tiles of the full tiling"""
+    monkeypatch.setattr(substitution_tiling, 'PLANE_SIZE', 200.0)
+    bbox = (-90.0, -60.0, 40.0, 75.0)
+    tiling = SubstitutionTiling({'rule': rule, 'bbox': bbox, 'zoom': 1.0, 'cell_size': 15})
+    lazy = _centroids(tiling.iter_tile_arrays())
+
+    _, _, (kinds, verts), _ = RULES[rule]
+    kinds, verts = substitute(rule, kinds, verts * 200.0, tiling.depth)
+    lo, hi = verts.min(axis=1), verts.max(axis=1)
+    hit = (hi[:, 0] >= bbox[0]) & (lo[:, 0] <= bbox[2]) & (hi[:, 1] >= bbox[1]) & (lo[:, 1] <= bbox[3])
+    assert lazy == _centroids([(kinds[hit], verts[hit])])
+    assert 0 < len(lazy) < len(kinds)
+
+def test_deep_zoom_cost_tracks_visible_tiles():
+    """Test zooming far into the plane yields a viewport's worth of tiles, not the whole plane"""
+    counts = []
+    for zoom in (1.0, 1e6):
+        half = 400 / zoom
+        tiling = SubstitutionTiling({'rule': 'penrose', 'bbox': (1234 - half, -half, 1234 + half, half), 'zoom': zoom})
+        counts.append(sum(len(kinds) for kinds, _ in tiling.iter_tile_arrays()))
+    assert tiling.depth > 40
+    assert counts[1] < 3 * counts[0]
+
+def test_expansions_are_memoized():
+    """Test expansions are cached per prototile and depth and cannot be modified"""
+    _expansion.cache_clear()
+    SubstitutionTiling({'rule': 'pinwheel'}).generate()
+    kinds, weights = _expansion('pinwheel', 0, 3)
+    assert _expansion.cache_info().hits > 0
+    assert len(kinds) == 5 ** 3
+    assert not weights.flags.writeable
+
+def test_aperiodic_tessellation_route(client):
+    """Test the tessellation route serves viewport tiles for aperiodic types"""
+    data = client.get('/tessellation/generate?pattern=pinwheel&bbox=-100,-100,100,100&zoom=4&seed=1').get_json()
+    assert data['type'] == 'pinwheel'
+    assert data['tiles'] and len(data['tiles'][0]['points']) == 3
+    assert {tile['kind'] for tile in data['tiles']} == {0, 1}
+    assert client.get('/tessellation/generate?pattern=penrose&bbox=1,2,3').status_code == 400
+    assert client.get('/tessellation/generate?pattern=penrose&zoom=inf').status_code == 400
+
+@pytest.mark.parametrize('url', ['/tessellation/generate', '/tessellation/thumb.png'])
+@pytest.mark.parametrize('cell_size', ['0', '-5', 'nan'])
+def test_non_positive_cell_size_is_rejected(client, url, cell_size):
+    """Test a bad cellSize gets 400 from the view rather than failing the scheduler's estimate"""
+    app.config['SCHEDULER_ENABLED'] = True
+    assert client.get(f'{url}?pattern=penrose&cellSize={cell_size}').status_code == 400
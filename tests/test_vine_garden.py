@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from app import app
+from blueprints.patterns.vine_garden import VineGarden
+from blueprints.patterns.vine_pattern import GrowthPattern, adjust_growth_angle
+
+CONFIG = {
+    'vines': [
+        {'growth_pattern': pattern.value, 'max_length': 8, 'start_pos': (i * 50.0, 0.0)}
+        for i, pattern in enumerate(GrowthPattern)
+    ]
+}
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def test_each_step_grows_one_segment_per_vine():
+    """Test every vine with growth tips gains exactly one segment per step"""
+    garden = VineGarden(CONFIG, seed=1)
+    garden.init_growth()
+    garden.grow_step()
+    assert sorted(garden.segment_chunks[0]['vine'].tolist()) == [0, 1, 2, 3]
+
+def test_growth_rules_are_vectorized():
+    """Test the shared growth rule gives the same answer for arrays and scalars"""
+    angles = np.array([0.0, 90.0, 200.0])
+    depths = np.array([0, 1, 2])
+    for pattern in GrowthPattern:
+        batched = adjust_growth_angle(angles, depths, pattern, 5.0)
+        single = [adjust_growth_angle(a, d, pattern, 5.0) for a, d in zip(angles, depths)]
+        assert np.allclose(batched, single)
+
+def test_garden_replay_is_deterministic():
+    """Test a garden is rebuilt exactly from its seed and step count"""
+    a = VineGarden.replay(CONFIG, seed=5, steps=12).get_state()
+    b = VineGarden.replay(CONFIG, seed=5, steps=12).get_state()
+    assert list(a['segments']) == list(b['segments'])
+    assert list(a['flowers']) == list(b['flowers'])
+
+def test_garden_routes_return_new_elements(client):
+    """Test garden grow calls return only the elements added since the last call"""
+    rv = client.get('/vine/garden/init?count=50&seed=2')
+    assert rv.status_code == 200
+    garden_id = rv.json['id']
+    first = client.get(f'/vine/garden/grow/{garden_id}').json
+    assert first['step'] == 1
+    assert len(first['pattern']['segments']) == 50
+    second = client.get(f'/vine/garden/grow/{garden_id}?steps=3').json
+    assert second['step'] == 4
+    assert client.get(f'/vine/grow/{garden_id}').status_code == 404
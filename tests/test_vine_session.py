@@ -0,0 +1,92 @@
+import json
+import pytest
+from app import app
+from blueprints.patterns.vine_pattern import VinePattern
+from blueprints.patterns.vine_session import FileVineSessionStore, MemoryVineSessionStore, VineReplayCache, VineSession
+
+CONFIG = {
+    'growth_pattern': 'spiral',
+    'max_length': 12,
+    'start_pos': (0.0, 0.0)
+}
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def test_replay_is_deterministic():
+    """Test replaying the same seed and step count rebuilds the same vine"""
+    a = VinePattern.replay(CONFIG, seed=7, steps=40)
+    b = VinePattern.replay(CONFIG, seed=7, steps=40)
+    assert a.segments == b.segments
+    assert a.leaves == b.leaves
+    assert a.flowers == b.flowers
+
+def test_checkpoints_match_full_replay():
+    """Test restoring from a checkpoint gives the same state as replaying from the seed"""
+    cache = VineReplayCache(checkpoint_interval=8)
+    cache.materialize('v', VineSession(CONFIG, 7, 30))
+    rewound = cache.materialize('v', VineSession(CONFIG, 7, 20))
+    assert rewound.segments == VinePattern.replay(CONFIG, seed=7, steps=20).segments
+
+def test_checkpoints_are_thinned():
+    """Test a long replay keeps a bounded number of evenly spaced checkpoints"""
+    cache = VineReplayCache(checkpoint_interval=2, max_checkpoints=4)
+    cache.materialize('v', VineSession(CONFIG, 7, 40))
+    entry = cache._entries['v']
+    assert sorted(entry.checkpoints) == [16, 32]
+    rewound = cache.materialize('v', VineSession(CONFIG, 7, 20))
+    assert rewound.segments == VinePattern.replay(CONFIG, seed=7, steps=20).segments
+
+def test_file_store_is_shared_between_workers(tmp_path):
+    """Test a session written by one worker can be grown by another"""
+    FileVineSessionStore(str(tmp_path)).put('abc', VineSession(CONFIG, 7, 5))
+    session = FileVineSessionStore(str(tmp_path)).get('abc')
+    assert session.step == 5
+    assert session.config['start_pos'] == (0.0, 0.0)
+    assert FileVineSessionStore(str(tmp_path)).get('../abc') is None
+
+@pytest.mark.parametrize('make_store', [
+    lambda tmp_path: MemoryVineSessionStore(sweep_interval=0),
+    lambda tmp_path: FileVineSessionStore(str(tmp_path), sweep_interval=0),
+])
+def test_stores_sweep_expired_sessions(tmp_path, make_store):
+    """Test expired sessions nobody reads again are deleted by a later put"""
+    store = make_store(tmp_path)
+    store.put('old', VineSession(CONFIG, 1, expires=0))
+    store.put('new', VineSession(CONFIG, 2))
+    assert list(store._session_ids()) == ['new']
+    assert store.get('new').seed == 2
+
+def test_grow_route_jumps_to_step(client):
+    """Test a client can grow step by step or jump to any step"""
+    rv = client.get('/vine/init?seed=3&max_length=12&growth_pattern=spiral')
+    vine_id = rv.json['id']
+    for step in (1, 2):
+        rv = client.get(f'/vine/grow/{vine_id}')
+        assert rv.json['step'] == step
+    jumped = client.get(f'/vine/grow/{vine_id}?step=10').json
+    again = client.get(f'/vine/grow/{vine_id}?step=10').json
+    assert jumped['pattern'] == again['pattern']
+    assert client.get('/vine/grow/missing').status_code == 404
+
+def test_streamed_body_is_cut_at_its_step(client):
+    """Test a body still streaming is not changed by a later grow of the same vine"""
+    vine_id = client.get('/vine/init?seed=6&max_length=20&growth_pattern=spreading').json['id']
+    first = client.get(f'/vine/grow/{vine_id}?step=400', buffered=False)
+    client.get(f'/vine/grow/{vine_id}?step=3000')
+    body = json.loads(b''.join(first.response))
+    first.close()
+    assert body['step'] == 400
+    expected = VinePattern.replay({**CONFIG, 'growth_pattern': 'spreading', 'max_length': 20}, seed=6, steps=400)
+    assert len(body['pattern']['segments']) == len(expected.segments)
+
+def test_replay_stops_at_completion(client):
+    """Test jumping past the end stops at the completion step and huge steps are refused"""
+    vine_id = client.get('/vine/init?seed=1&max_length=6').json['id']
+    grown = client.get(f'/vine/grow/{vine_id}?step=5000').json
+    assert grown['completed'] and grown['step'] < 5000
+    assert client.get(f'/vine/grow/{vine_id}?step=5000').json['step'] == grown['step']
+    assert client.get(f'/vine/grow/{vine_id}?step=1000000000').status_code == 400
@@ -0,0 +1,117 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+from app import app
+from blueprints.patterns.vine_index import KINDS, LEAF_REACH, VineIndex, element_bbox, merge_segments
+from blueprints.patterns.vine_pattern import LeafType, VinePattern, generate_leaf_shape
+from blueprints.patterns.vine_session import VineReplayCache, VineSession
+
+CONFIG = {
+    'growth_pattern': 'spreading',
+    'max_length': 20,
+    'start_pos': (0.0, 0.0)
+}
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def _brute_force(vine, box):
+    x0, y0, x1, y1 = box
+    visible = {}
+    for kind in KINDS:
+        boxes = [element_bbox(kind, element) for element in getattr(vine, kind)]
+        visible[kind] = [i for i, (a, b, c, d) in enumerate(boxes) if a <= x1 and c >= x0 and b <= y1 and d >= y0]
+    return visible
+
+@pytest.mark.parametrize('box', [(-60, -60, 60, 60), (20, -200, 300, 10), (-1e6, -1e6, 1e6, 1e6), (500, 500, 600, 600)])
+def test_index_matches_brute_force(box):
+    """Test viewport queries find exactly the elements whose bounds meet the box"""
+    vine = VinePattern.replay(CONFIG, seed=6, steps=400)
+    visible = vine.index.query(box)
+    assert {kind: indices.tolist() for kind, indices in visible.items()} == _brute_force(vine, box)
+
+@pytest.mark.parametrize('leaf_type', list(LeafType))
+def test_leaf_outline_crossing_into_view_is_found(leaf_type):
+    """Test a leaf anchored just outside the viewport is found when its outline reaches into it"""
+    reach = max(math.hypot(x, y) for x, y in generate_leaf_shape(leaf_type, 1))
+    assert reach <= LEAF_REACH
+    # Anchored left of the box, with the outline's farthest point 0.5 units inside it once turned towards it
+    leaf = {'pos': (0.5 - 10 * reach, 50.0), 'size': 10.0, 'angle': 0, 'type': leaf_type,
+            'shape': generate_leaf_shape(leaf_type, 10.0)}
+    index = VineIndex()
+    index.update(SimpleNamespace(segments=[], leaves=[leaf], flowers=[]))
+    assert index.query((0, 0, 100, 100))['leaves'].tolist() == [0]
+
+def test_index_rebuilt_on_restore():
+    """Test a vine rewound to a checkpoint answers queries for the rewound state"""
+    cache = VineReplayCache(checkpoint_interval=16)
+    cache.materialize('v', VineSession(CONFIG, 6, 300))
+    rewound = cache.materialize('v', VineSession(CONFIG, 6, 100))
+    box = (-80, -80, 80, 80)
+    visible = rewound.index.query(box)
+    assert {kind: indices.tolist() for kind, indices in visible.items()} == _brute_force(rewound, box)
+
+def test_merge_segments_joins_short_chains():
+    """Test merged segments follow the chains and shrink the count when zoomed out"""
+    vine = VinePattern.replay(CONFIG, seed=6, steps=400)
+    indices = range(len(vine.segments))
+    assert merge_segments(vine.segments, indices, 0) == vine.segments
+
+    merged = merge_segments(vine.segments, indices, 60)
+    assert len(merged) < len(vine.segments) / 2
+    starts = {tuple(s['start']) for s in vine.segments}
+    ends = {tuple(s['end']) for s in vine.segments}
+    for segment in merged:
+        assert tuple(segment['start']) in starts and tuple(segment['end']) in ends
+
+def test_view_route(client):
+    """Test /vine/view returns only the elements in the viewport, with less detail when zoomed out"""
+    vine_id = client.get('/vine/init?seed=6&max_length=20&growth_pattern=spreading').json['id']
+    grown = client.get(f'/vine/grow/{vine_id}?step=400').json
+    assert not grown['completed']
+
+    close = client.get(f'/vine/view/{vine_id}?bbox=-40,-40,40,40&zoom=4').json
+    assert close['step'] == 400
+    assert 0 < len(close['pattern']['segments']) < len(grown['pattern']['segments'])
+    for segment in close['pattern']['segments']:
+        (x0, y0), (x1, y1) = segment['start'], segment['end']
+        reach = segment['thickness'] / 2
+        assert min(x0, x1) - reach <= 40 and max(x0, x1) + reach >= -40
+        assert min(y0, y1) - reach <= 40 and max(y0, y1) + reach >= -40
+
+    everything = client.get(f'/vine/view/{vine_id}?bbox=-1000,-1000,1000,1000&zoom=1').json['pattern']
+    assert len(everything['segments']) == len(grown['pattern']['segments'])
+    far = client.get(f'/vine/view/{vine_id}?bbox=-1000,-1000,1000,1000&zoom=0.05').json['pattern']
+    assert len(far['segments']) < len(everything['segments'])
+    assert len(far['leaves']) < len(everything['leaves'])
+
+    assert client.get(f'/vine/view/{vine_id}?bbox=1,2').status_code == 400
+    assert client.get(f'/vine/view/{vine_id}?bbox=0,0,1,1&zoom=0').status_code == 400
+    assert client.get('/vine/view/missing?bbox=0,0,1,1').status_code == 404
+
+def test_completed_vine_stays_viewable(client):
+    """Test a fully grown vine can still be viewed until its session expires"""
+    vine_id = client.get('/vine/init?seed=1&max_length=6').json['id']
+    grown = client.get(f'/vine/grow/{vine_id}?step=500').json
+    assert grown['completed']
+
+    view = client.get(f'/vine/view/{vine_id}?bbox=-1000,-1000,1000,1000').json
+    assert view['completed'] and view['step'] == grown['step'] < 500
+    assert len(view['pattern']['segments']) == len(grown['pattern']['segments'])
+
+    sessions = app.extensions['vine_sessions']
+    session = sessions.get(vine_id)
+    session.expires = 0
+    sessions.put(vine_id, session)
+    assert client.get(f'/vine/view/{vine_id}?bbox=0,0,1,1').status_code == 404
+
+@pytest.mark.parametrize('query', ['bbox=0,0,inf,inf', 'bbox=nan,0,1,1', 'bbox=0,0,1,1&zoom=nan', 'bbox=0,0,1,1&zoom=inf'])
+def test_view_rejects_non_finite_values(client, query):
+    """Test infinite or NaN viewports get 400 rather than an error or an empty view"""
+    vine_id = client.get('/vine/init?seed=6&max_length=20&growth_pattern=spreading').json['id']
+    client.get(f'/vine/grow/{vine_id}?step=10')
+    assert client.get(f'/vine/view/{vine_id}?{query}').status_code == 400